@@ -225,7 +225,7 @@ app.MapGet("/api/categories", async (AppDbContext db) =>
 );
 
 // LISTINGS
-app.MapGet("/api/listings", async (AppDbContext db, GeoClient geo, int? categoryId, string? q, string? location, decimal? minBudget, decimal? maxBudget) =>
+app.MapGet("/api/listings", async (HttpContext http, AppDbContext db, GeoClient geo, int? categoryId, string? q, string? location, decimal? minBudget, decimal? maxBudget, int? page, int? pageSize, long? asOf) =>
 {
     var query = db.EventListings
         .Include(l => l.Items).ThenInclude(i => i.ServiceCategory)
@@ -239,10 +239,29 @@ app.MapGet("/api/listings", async (AppDbContext db, GeoClient geo, int? category
     if (minBudget.HasValue) query = query.Where(l => l.Items.Sum(i => i.Budget) >= minBudget.Value);
     if (maxBudget.HasValue) query = query.Where(l => l.Items.Sum(i => i.Budget) <= maxBudget.Value);
     
-    var list = await query
+    // Sayfalı istekte ilk sayfanın anı X-Snapshot başlığında döner; sonraki sayfalar onu asOf olarak
+    // geri gönderir, böylece bu arada eklenen ilanlar sayfaları kaydırmaz
+    var snapshot = new DateTime(Math.Clamp(asOf ?? DateTime.UtcNow.Ticks, 0, DateTime.MaxValue.Ticks), DateTimeKind.Utc);
+    if (page.HasValue) query = query.Where(l => l.CreatedAtUtc <= snapshot);
+
+    // Id ile sıralama eşit tarihlerde sayfaların sabit kalmasını sağlar
+    var ordered = query
         .OrderByDescending(l => l.CreatedAtUtc)
-        .Take(200)
-        .ToListAsync();
+        .ThenBy(l => l.Id);
+
+    List<EventListing> list;
+    if (page.HasValue)
+    {
+        // Sayfalı istek: toplam ilan sayısı X-Total-Count başlığında döner
+        var size = Math.Clamp(pageSize ?? 100, 1, 500);
+        http.Response.Headers["X-Total-Count"] = (await query.CountAsync()).ToString();
+        http.Response.Headers["X-Snapshot"] = snapshot.Ticks.ToString();
+        list = await ordered.Skip((Math.Max(page.Value, 1) - 1) * size).Take(size).ToListAsync();
+    }
+    else
+    {
+        list = await ordered.Take(200).ToListAsync();
+    }
 
     // Her ilan için geo bilgilerini çek
     var data = new List<ListingResponse>();
@@ -1,3 +1,4 @@
+using Microsoft.AspNetCore.StaticFiles;
 using Microsoft.Extensions.FileProviders;
 
 var builder = WebApplication.CreateBuilder(args);
@@ -12,7 +13,55 @@ if (!app.Environment.IsDevelopment())
     app.UseHsts();
 }
 
-app.UseStaticFiles();
+// tools/manifest_publish.py writes .br/.gz siblings next to the published photo manifest
+// files; serve those to clients that accept the encoding.
+var precompressed = new[] { (Encoding: "br", Extension: ".br"), (Encoding: "gzip", Extension: ".gz") };
+app.Use(async (context, next) =>
+{
+    var path = context.Request.Path.Value;
+    if (HttpMethods.IsGet(context.Request.Method) && path is not null
+        && path.Contains("/manifest/", StringComparison.OrdinalIgnoreCase)
+        && path.EndsWith(".json", StringComparison.OrdinalIgnoreCase))
+    {
+        var accepted = context.Request.Headers.AcceptEncoding.ToString();
+        foreach (var (encoding, extension) in precompressed)
+        {
+            if (accepted.Contains(encoding, StringComparison.OrdinalIgnoreCase)
+                && app.Environment.WebRootFileProvider.GetFileInfo(path + extension).Exists)
+            {
+                context.Request.Path = path + extension;
+                context.Response.Headers.ContentEncoding = encoding;
+                break;
+            }
+        }
+        context.Response.Headers.Vary = "Accept-Encoding";
+    }
+    await next();
+});
+
+var contentTypes = new FileExtensionContentTypeProvider();
+contentTypes.Mappings[".br"] = "application/octet-stream";
+app.UseStaticFiles(new StaticFileOptions
+{
+    ContentTypeProvider = contentTypes,
+    OnPrepareResponse = ctx =>
+    {
+        var headers = ctx.Context.Response.Headers;
+        if (!string.IsNullOrEmpty(headers.ContentEncoding))
+        {
+            headers.ContentType = "application/json; charset=utf-8";
+        }
+        // Photo and manifest URLs with ?v= are content-versioned: cache them for good.
+        if (ctx.Context.Request.Path.StartsWithSegments("/img") && ctx.Context.Request.Query.ContainsKey("v"))
+        {
+            headers.CacheControl = "public, max-age=31536000, immutable";
+        }
+        else if (ctx.Context.Request.Path.Value?.EndsWith("/manifest/index.json", StringComparison.OrdinalIgnoreCase) == true)
+        {
+            headers.CacheControl = "no-cache";
+        }
+    }
+});
 
 // public klasöründeki dosyaları da sun
 var publicPath = Path.Combine(builder.Environment.ContentRootPath, "public");
@@ -84,7 +84,23 @@
     return s;
   }
 
+  // tools/manifest_publish.py publishes the place photo manifest as a tiny index (always
+  // revalidated) pointing at minified per-category shards whose URLs carry a content hash,
+  // so the browser can keep them cached until they actually change.
+  const PLACE_PHOTOS_MANIFEST_DIR = '/img/place-photos/manifest/';
+  let placePhotosIndexPromise = null;
   let placePhotosManifestPromise = null;
+  const placePhotosShardPromises = {};
+
+  function getPlacePhotosIndex() {
+    if (placePhotosIndexPromise) return placePhotosIndexPromise;
+    placePhotosIndexPromise = fetch(PLACE_PHOTOS_MANIFEST_DIR + 'index.json', { cache: 'no-store' })
+      .then(r => r.ok ? r.json() : null)
+      .catch(() => null);
+    return placePhotosIndexPromise;
+  }
+
+  // Sites without a published index yet: the whole manifest, as before.
   function getPlacePhotosManifest() {
     if (placePhotosManifestPromise) return placePhotosManifestPromise;
     placePhotosManifestPromise = fetch('/img/place-photos/manifest.json', { cache: 'no-store' })
@@ -93,6 +109,33 @@
     return placePhotosManifestPromise;
   }
 
+  function getPlacePhotosShard(index, shard) {
+    const path = String(shard.path || '');
+    if (!placePhotosShardPromises[path]) {
+      const url = PLACE_PHOTOS_MANIFEST_DIR + path + '?v=' + encodeURIComponent(String(shard.v || ''));
+      placePhotosShardPromises[path] = fetch(url)
+        .then(r => r.ok ? r.json() : null)
+        .then(data => data ? { generatedAtUtc: index.generatedAtUtc, items: data.items || {} } : null)
+        .catch(() => null);
+    }
+    return placePhotosShardPromises[path];
+  }
+
+  // Resolves to { manifest, entry } for a place. Catalog places are found in their
+  // category's shard; anything else falls back to all.json.
+  function getPlacePhotoEntry(category, placeKey) {
+    const lookup = manifestPromise => manifestPromise.then(manifest => ({
+      manifest,
+      entry: manifest && manifest.items ? manifest.items[placeKey] : null
+    }));
+    return getPlacePhotosIndex().then(index => {
+      if (!index || !index.all) return lookup(getPlacePhotosManifest());
+      const shard = index.shards && index.shards[normalizePlaceKey(category)];
+      const fromShard = shard ? lookup(getPlacePhotosShard(index, shard)) : Promise.resolve(null);
+      return fromShard.then(found => (found && found.entry) ? found : lookup(getPlacePhotosShard(index, index.all)));
+    });
+  }
+
   function googlePlacePhotoUrl(photoReference, maxWidth) {
     const ref = String(photoReference || '').trim();
     if (!ref) return '';
@@ -145,13 +188,32 @@
 
     // Prefer local cached place photo when available (no external API).
     if (placeKey) {
-      getPlacePhotosManifest().then(manifest => {
-        const path = manifest && manifest.items && manifest.items[placeKey] && manifest.items[placeKey].path;
+      getPlacePhotoEntry(category, placeKey).then(({ manifest, entry }) => {
+        const path = entry && entry.path;
         if (path) {
-          // Cache-bust on replacements: manifest is fetched with `no-store` and `generatedAtUtc`
-          // changes after each upload, so use it as a stable version key.
-          const v = (manifest && manifest.generatedAtUtc) ? String(manifest.generatedAtUtc) : String(Date.now());
-          img.src = path + (String(path).includes('?') ? '&' : '?') + 'v=' + encodeURIComponent(v);
+          // Cache-bust on replacements: the photo's own hash when the manifest has one, so
+          // unrelated uploads don't change its URL; otherwise `generatedAtUtc`.
+          const v = entry.sha256 || entry.lqipSourceSha256 ||
+            ((manifest && manifest.generatedAtUtc) ? String(manifest.generatedAtUtc) : String(Date.now()));
+          const photoUrl = path + (String(path).includes('?') ? '&' : '?') + 'v=' + encodeURIComponent(v);
+
+          // Reserve the photo's aspect ratio where CSS leaves one side auto.
+          if (entry.width > 0 && entry.height > 0) {
+            img.style.aspectRatio = `${entry.width} / ${entry.height}`;
+          }
+
+          // Paint the inline blurred preview first, then swap in the photo. Chaining on the
+          // preview's load keeps `loading="lazy"` in charge of when the photo is fetched.
+          const lqip = typeof entry.lqip === 'string' && entry.lqip.startsWith('data:image/') ? entry.lqip : '';
+          if (lqip) {
+            img.onload = () => {
+              img.onload = null;
+              img.src = photoUrl;
+            };
+            img.src = lqip;
+          } else {
+            img.src = photoUrl;
+          }
         }
       });
     }
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Benchmark: per-item `glob(f"{key}.*")` vs one `DirIndex` scan.
+
+Creates N empty files in a temp directory and measures the cost of looking up
+every key both ways. A full glob-per-item pass is quadratic, so for large N it
+is timed on a sample of keys and extrapolated.
+
+Usage:
+  python tools/bench_dir_index.py            (10k and 100k files)
+  python tools/bench_dir_index.py 1000 5000
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from dir_index import DirIndex
+
+GLOB_SAMPLE = 200
+
+
+def make_files(root: Path, n: int) -> list[str]:
+    keys = [f"place-{i:06d}" for i in range(n)]
+    exts = (".jpg", ".png", ".webp")
+    for i, key in enumerate(keys):
+        (root / f"{key}{exts[i % len(exts)]}").touch()
+    return keys
+
+
+def bench(n: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        keys = make_files(root, n)
+
+        step = max(1, len(keys) // GLOB_SAMPLE)
+        sample = keys[::step][:GLOB_SAMPLE]
+        t0 = time.perf_counter()
+        for key in sample:
+            next(iter(root.glob(f"{key}.*")), None)
+        per_glob = (time.perf_counter() - t0) / len(sample)
+        glob_total = per_glob * n
+
+        t0 = time.perf_counter()
+        index = DirIndex(root)
+        index.refresh()
+        build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        missing = sum(1 for key in keys if index.find(key) is None)
+        lookups = time.perf_counter() - t0
+        assert missing == 0
+
+        print(f"{n:>8} files | glob per item: {per_glob * 1000:8.3f} ms -> {glob_total:9.2f} s total (extrapolated)"
+              f" | index build {build:7.3f} s + {n} lookups {lookups:7.3f} s"
+              f" | speedup x{glob_total / max(build + lookups, 1e-9):,.0f}")
+
+
+def main() -> int:
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    print(f"python {sys.version.split()[0]} on {sys.platform}, {os.cpu_count()} CPUs")
+    for n in sizes:
+        bench(n)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Benchmark: old chained-replace normalization vs `text_norm`.
+
+Scores a synthetic candidate workload the way the place fetcher does: every
+catalog place name against the titles a search returns for it (titles repeat
+across queries, as Commons/Openverse results do). Reports the old inline
+implementation, `text_norm` with a cold cache and with a warm cache.
+
+Usage:
+  python tools/bench_text_norm.py            (20k scored titles)
+  python tools/bench_text_norm.py 100000
+
+Env vars:
+  APP_JS=src/Web/wwwroot/js/app.js
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import text_norm
+from text_norm import STOP_TOKENS
+
+APP_JS = Path(os.environ.get("APP_JS", "src/Web/wwwroot/js/app.js")).resolve()
+
+WORDS = ["Düğün", "Salonu", "Gölbaşı", "Ankara", "Kır", "Bahçesi", "Çiçekçi", "Pastanesi", "Fotoğraf",
+         "wedding", "hall", "2019", "File:", ".jpg", "Türkiye", "Mogan", "Gölü", "Eymir", "İncek", "view"]
+
+
+# The implementation text_norm replaced, kept here as the baseline.
+def legacy_normalize_text_for_match(s: str) -> str:
+    s = (s or "").strip().lower()
+    s = (s
+         .replace("ı", "i")
+         .replace("ş", "s")
+         .replace("ğ", "g")
+         .replace("ü", "u")
+         .replace("ö", "o")
+         .replace("ç", "c"))
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    s = re.sub(r"[^a-z0-9]+", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+
+def legacy_tokenize_for_match(s: str) -> list[str]:
+    s2 = legacy_normalize_text_for_match(s)
+    return [t for t in s2.split(" ") if t and len(t) > 1 and t not in STOP_TOKENS]
+
+
+def legacy_token_overlap_score(query_name: str, candidate_title: str) -> float:
+    q = set(legacy_tokenize_for_match(query_name))
+    c = set(legacy_tokenize_for_match(candidate_title))
+    if not q or not c:
+        return 0.0
+    return len(q & c) / len(q | c)
+
+
+def workload(n: int) -> List[Tuple[str, str]]:
+    names = re.findall(r"\bname\s*:\s*\"([^\"]+)\"", APP_JS.read_text(encoding="utf-8")) or ["Kronos Düğün Salonu"]
+    rnd = random.Random(42)
+    # About 10 distinct titles per place, each seen several times across queries.
+    titles = {name: [f"File:{name} {' '.join(rnd.sample(WORDS, 3))} {i}.jpg" for i in range(10)] for name in names}
+    pairs = []
+    for _ in range(n):
+        name = rnd.choice(names)
+        pairs.append((name, rnd.choice(titles[name])))
+    return pairs
+
+
+def timed(score: Callable[[str, str], float], pairs: List[Tuple[str, str]]) -> float:
+    t0 = time.perf_counter()
+    for name, title in pairs:
+        score(name, title)
+    return time.perf_counter() - t0
+
+
+def clear_caches() -> None:
+    for fn in (text_norm.normalize_place_key, text_norm.normalize_text_for_match,
+               text_norm.tokenize_for_match, text_norm.token_set):
+        fn.cache_clear()
+
+
+def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    pairs = workload(n)
+    print(f"python {sys.version.split()[0]}, {n} scored titles, "
+          f"{len(set(t for _, t in pairs))} distinct titles")
+
+    legacy = timed(legacy_token_overlap_score, pairs)
+    clear_caches()
+    cold = timed(text_norm.token_overlap_score, pairs)
+    warm = timed(text_norm.token_overlap_score, pairs)
+
+    clear_caches()
+    t0 = time.perf_counter()
+    for _, title in pairs:
+        text_norm.normalize_text_for_match.__wrapped__(title)
+    uncached = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _, title in pairs:
+        legacy_normalize_text_for_match(title)
+    legacy_norm = time.perf_counter() - t0
+
+    print(f"normalize only : legacy {legacy_norm * 1e6 / n:7.2f} us/call | text_norm uncached {uncached * 1e6 / n:7.2f} us/call"
+          f" (x{legacy_norm / uncached:.1f})")
+    print(f"score (Jaccard): legacy {legacy:7.3f} s | text_norm cold {cold:7.3f} s (x{legacy / cold:.1f})"
+          f" | warm {warm:7.3f} s (x{legacy / warm:.1f})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
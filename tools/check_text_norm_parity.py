@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Check that `text_norm.normalize_place_key` matches `normalizePlaceKey` in app.js.
+
+The site finds a place's photo by the key app.js computes, so any difference
+between the two implementations is a photo that silently never shows. This
+script pulls the JS function out of app.js, runs it under node on every place
+name in the catalog, a set of hand-picked edge cases and seeded random
+strings, and compares the results with the Python module.
+
+Usage:
+  python tools/check_text_norm_parity.py
+  python tools/check_text_norm_parity.py 20000     (number of random strings)
+
+Env vars:
+  APP_JS=src/Web/wwwroot/js/app.js
+  NODE=node
+
+Exits 1 on any mismatch, 2 if node is not available. The same comparison runs
+as a test in tools/test_text_norm_parity.py (skipped without node).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+from text_norm import normalize_place_key
+
+APP_JS = Path(os.environ.get("APP_JS", "src/Web/wwwroot/js/app.js")).resolve()
+NODE = os.environ.get("NODE", "node")
+
+EDGE_CASES = [
+    "", "   ", "Kronos Gölbaşı Düğün Salonu", "ŞEKER PASTANESİ", "İstanbul", "IĞDIR", "ıi İI",
+    "Çiçekçi -- Orkide!!", "  -Lead-and-trail-  ", "Café Noël", "ﬁne ﬂowers", "ＡＢＣ１２３",
+    "½ Çay", "x²", "Straße", "ΣΑΛΟΝΙ", "𝚤𝚥", "Kelvin K", "a⃗b", "aّb", "é",
+    "tab\there", "new\nline", "nbsp space", "zero​width", "bom﻿", "emoji 🎉 hall",
+    "Ǆ ǅ ǆ", "ﾊﾝｶｸ", "Ⅻ", "ℌ ℍ ℎ", "ŉ", "İ̇", "ß ẞ",
+]
+
+# Characters random strings are drawn from: ASCII, Turkish and Latin letters,
+# combining marks inside and outside U+0300-036F, compatibility forms, separators.
+ALPHABET = (
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 -_.,'&/()"
+    "çğıöşüÇĞİÖŞÜâêîôûÂÊÎÔÛàáäåèéëìíïñòóøùúýÿÀÉÑØ"
+    "̧̀́̇̈ͯͰ゙ّ֑҃⃗"
+    "ﬁﬂＡＺ０９½²ⅫℌΣσςßẞǅ𝚤K  ​﻿\t\n"
+)
+
+
+def extract_js_function(text: str) -> str:
+    m = re.search(r"^([ \t]*)function normalizePlaceKey\(name\) \{.*?^\1\}", text, flags=re.DOTALL | re.MULTILINE)
+    if not m:
+        raise SystemExit(f"normalizePlaceKey not found in {APP_JS}")
+    return m.group(0)
+
+
+def js_keys(function_src: str, inputs: List[str]) -> List[str]:
+    script = (
+        function_src
+        + "\nlet data = '';\n"
+        + "process.stdin.on('data', c => data += c);\n"
+        + "process.stdin.on('end', () => process.stdout.write(JSON.stringify(JSON.parse(data).map(normalizePlaceKey))));\n"
+    )
+    out = subprocess.run([NODE, "-e", script], input=json.dumps(inputs), capture_output=True, text=True,
+                         encoding="utf-8", check=True)
+    return json.loads(out.stdout)
+
+
+def catalog_names(text: str) -> List[str]:
+    return re.findall(r"\bname\s*:\s*\"([^\"]+)\"", text)
+
+
+def find_mismatches(app_js: Path = APP_JS, n_random: int = 5000) -> Tuple[int, List[Tuple[str, str, str]]]:
+    """(number of inputs, [(input, js key, python key)] for every input the two disagree on)."""
+    text = app_js.read_text(encoding="utf-8")
+    rnd = random.Random(1234)
+    inputs = catalog_names(text) + EDGE_CASES
+    inputs += ["".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(1, 24))) for _ in range(n_random)]
+
+    expected = js_keys(extract_js_function(text), inputs)
+    return len(inputs), [(s, js, normalize_place_key(s)) for s, js in zip(inputs, expected) if normalize_place_key(s) != js]
+
+
+def main(argv: List[str]) -> int:
+    if shutil.which(NODE) is None:
+        print(f"node not found ({NODE}); cannot compare with app.js.")
+        return 2
+
+    total, mismatches = find_mismatches(APP_JS, int(argv[0]) if argv else 5000)
+    for s, js, py in mismatches[:20]:
+        print(f"MISMATCH {s!r}: js={js!r} py={py!r}")
+    print(f"{total} inputs, {len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,125 @@
+"""In-memory index of an image output directory.
+
+The tools used to call `OUT_DIR.glob(f"{key}.*")` once per item, which rescans
+the whole directory every time (O(N^2) per run). `DirIndex` lists the directory
+once with `os.scandir`, maps each key (file name up to the first dot) to its
+files, and is updated by the tools as they write or delete files.
+
+Hidden files (temp/part files, journals) are never indexed.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+@dataclass(frozen=True)
+class IndexedFile:
+    path: Path
+    ext: str
+    size: int
+    mtime: float
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+
+def key_of(filename: str) -> Optional[str]:
+    # Same files `glob(f"{key}.*")` would match: "<key>.<anything>".
+    if filename.startswith(".") or "." not in filename:
+        return None
+    return filename.split(".", 1)[0]
+
+
+class DirIndex:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._files: Dict[str, List[IndexedFile]] = {}
+        self._scanned = False
+        self._lock = threading.Lock()
+
+    def _scan(self) -> None:
+        files: Dict[str, List[IndexedFile]] = {}
+        try:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    key = key_of(entry.name)
+                    if key is None:
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    files.setdefault(key, []).append(_indexed(Path(entry.path), st))
+        except FileNotFoundError:
+            pass
+        self._files = files
+        self._scanned = True
+
+    def _ensure(self) -> None:
+        if not self._scanned:
+            self._scan()
+
+    def refresh(self) -> None:
+        with self._lock:
+            self._scan()
+
+    def find(self, key: str, allowed_exts: Optional[Iterable[str]] = None) -> Optional[IndexedFile]:
+        with self._lock:
+            self._ensure()
+            entries = self._files.get(key) or []
+        if allowed_exts is None:
+            return entries[0] if entries else None
+        allowed = {e.lower() for e in allowed_exts}
+        return next((f for f in entries if f.ext in allowed), None)
+
+    def record(self, path: Path) -> Optional[IndexedFile]:
+        """Add or refresh `path` after it has been written."""
+        key = key_of(path.name)
+        if key is None:
+            return None
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self.discard(path)
+            return None
+        indexed = _indexed(path, st)
+        with self._lock:
+            self._ensure()
+            entries = [f for f in self._files.get(key, []) if f.path.name != path.name]
+            entries.insert(0, indexed)
+            self._files[key] = entries
+        return indexed
+
+    def discard(self, path: Path) -> None:
+        key = key_of(path.name)
+        if key is None:
+            return
+        with self._lock:
+            self._ensure()
+            entries = [f for f in self._files.get(key, []) if f.path.name != path.name]
+            if entries:
+                self._files[key] = entries
+            else:
+                self._files.pop(key, None)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            self._ensure()
+            return list(self._files.keys())
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure()
+            return sum(len(v) for v in self._files.values())
+
+
+def _indexed(path: Path, st: os.stat_result) -> IndexedFile:
+    return IndexedFile(path=path, ext=path.suffix.lower(), size=st.st_size, mtime=st.st_mtime)
@@ -0,0 +1,209 @@
+"""Streaming, resumable image downloads for the tools/ fetchers.
+
+Images are streamed in chunks to a hidden `.<key>.part` file next to the
+destination, checked against a size cap and the Content-Length, and only then
+moved into place with an atomic rename. Memory use per download stays constant
+and the output directory never contains a partially written `<key>.<ext>`.
+
+When a download fails halfway and the server advertised `Accept-Ranges: bytes`,
+the `.part` file is kept together with a small `.part.json` sidecar (URL and
+validators). The next attempt for the same key and URL asks only for the
+missing bytes with `Range:`/`If-Range:`. If the server answers with the full
+body instead, the part is discarded and the download restarts cleanly.
+
+Env vars:
+  MAX_IMAGE_BYTES=26214400  (25 MiB)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.error import HTTPError
+
+from http_client import HttpClient, HttpResponse
+
+MAX_IMAGE_BYTES = int(os.environ.get("MAX_IMAGE_BYTES", str(25 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+PART_SUFFIX = ".part"
+PART_META_SUFFIX = ".part.json"
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+class DownloadError(Exception):
+    pass
+
+
+class DownloadTooLarge(DownloadError):
+    pass
+
+
+@dataclass
+class Download:
+    temp_path: Path
+    content_type: str
+    size: int
+    sha256: str
+    resumed_from: int = 0
+
+    def move_to(self, dest: Path) -> Path:
+        os.replace(self.temp_path, dest)
+        _unlink(_meta_path(self.temp_path))
+        return dest
+
+    def discard(self) -> None:
+        _unlink(self.temp_path)
+        _unlink(_meta_path(self.temp_path))
+
+
+def _unlink(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def part_path_for(out_dir: Path, key: str) -> Path:
+    # Leading dot: never matches the `<key>.*` lookups used to detect existing images.
+    return out_dir / f".{key}{PART_SUFFIX}"
+
+
+def _meta_path(part: Path) -> Path:
+    return part.with_name(part.name[: -len(PART_SUFFIX)] + PART_META_SUFFIX)
+
+
+def _read_meta(part: Path) -> Dict[str, Any]:
+    try:
+        data = json.loads(_meta_path(part).read_text(encoding="utf-8"))
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def _write_meta(part: Path, meta: Dict[str, Any]) -> None:
+    _meta_path(part).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+
+def _resume_offset(part: Path, url: str) -> tuple[int, Dict[str, Any]]:
+    """Bytes already on disk for this URL, or 0 if the part cannot be resumed."""
+    if not part.exists():
+        return 0, {}
+    meta = _read_meta(part)
+    if meta.get("url") != url or not meta.get("acceptRanges"):
+        _unlink(part)
+        _unlink(_meta_path(part))
+        return 0, {}
+    return part.stat().st_size, meta
+
+
+def _hash_existing(part: Path, size: int) -> Any:
+    digest = hashlib.sha256()
+    with open(part, "rb") as fh:
+        remaining = size
+        while remaining > 0:
+            chunk = fh.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest
+
+
+def _open(client: HttpClient, url: str, offset: int, meta: Dict[str, Any], timeout_sec: float) -> HttpResponse:
+    headers: Dict[str, str] = {}
+    if offset > 0:
+        headers["Range"] = f"bytes={offset}-"
+        validator = meta.get("etag") or meta.get("lastModified")
+        if validator:
+            headers["If-Range"] = validator
+    # identity: byte counts must line up with Content-Length / Content-Range
+    return client.open(url, headers=headers, timeout=timeout_sec, accept_encoding="identity")
+
+
+def download_to_temp(client: HttpClient, url: str, out_dir: Path, key: str,
+                     timeout_sec: float = 40, max_bytes: Optional[int] = None) -> Download:
+    limit = MAX_IMAGE_BYTES if max_bytes is None else max_bytes
+    part = part_path_for(out_dir, key)
+    offset, meta = _resume_offset(part, url)
+
+    try:
+        resp = _open(client, url, offset, meta, timeout_sec)
+    except HTTPError as ex:
+        if ex.code != 416 or offset == 0:
+            raise
+        # Range not satisfiable: the remote file changed size. Start over.
+        _unlink(part)
+        _unlink(_meta_path(part))
+        offset, meta = 0, {}
+        resp = _open(client, url, 0, meta, timeout_sec)
+
+    keep_part = False
+    size = offset
+    try:
+        with resp:
+            content_type = resp.headers.get("Content-Type") or meta.get("contentType") or "application/octet-stream"
+            declared = resp.headers.get("Content-Length")
+            body_len = int(declared) if declared and declared.isdigit() else None
+
+            if offset > 0 and resp.status == 206:
+                m = _CONTENT_RANGE_RE.match(resp.headers.get("Content-Range") or "")
+                if not m or int(m.group(1)) != offset:
+                    raise DownloadError(f"unexpected Content-Range: {resp.headers.get('Content-Range')}")
+                expected = int(m.group(3)) if m.group(3) != "*" else None
+                digest = _hash_existing(part, offset)
+                mode = "ab"
+            else:
+                # Full body (first attempt, or the server ignored/refused the range).
+                offset = size = 0
+                expected = body_len
+                digest = hashlib.sha256()
+                mode = "wb"
+
+            if expected is not None and expected > limit:
+                raise DownloadTooLarge(f"image too large: {expected} bytes > {limit}")
+
+            accept_ranges = (resp.headers.get("Accept-Ranges") or "").strip().lower() == "bytes"
+            if accept_ranges or resp.status == 206:
+                _write_meta(part, {
+                    "url": url,
+                    "acceptRanges": True,
+                    "etag": resp.headers.get("ETag") or meta.get("etag"),
+                    "lastModified": resp.headers.get("Last-Modified") or meta.get("lastModified"),
+                    "contentType": content_type,
+                })
+                keep_part = True
+
+            with open(part, mode) as fh:
+                try:
+                    for chunk in resp.iter_chunks(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > limit:
+                            keep_part = False
+                            raise DownloadTooLarge(f"image too large: more than {limit} bytes")
+                        digest.update(chunk)
+                        fh.write(chunk)
+                finally:
+                    fh.flush()
+                    os.fsync(fh.fileno())
+
+        if expected is not None and size != expected:
+            if size > expected:
+                keep_part = False
+            raise DownloadError(f"truncated download: got {size} of {expected} bytes")
+        if size == 0:
+            keep_part = False
+            raise DownloadError("empty response body")
+    except BaseException:
+        if not keep_part:
+            _unlink(part)
+            _unlink(_meta_path(part))
+        raise
+
+    return Download(temp_path=part, content_type=content_type, size=size, sha256=digest.hexdigest(),
+                    resumed_from=offset)
@@ -8,7 +8,8 @@ Why this exists:
   them without any API keys.
 
 What it does:
-1) Calls the local API to get /api/listings (real listing titles/locations)
+1) Calls the local API to get /api/listings (real listing titles/locations),
+   page by page (see listing_source.py)
 2) For each listing, searches for an open image
 3) Downloads 1 image, saves it as <listingId>.<ext>
 4) Writes manifest.json mapping listingId -> relativePath + attribution
@@ -19,64 +20,115 @@ Usage (PowerShell):
 Optional env vars:
   API_BASE=http://localhost:8081
   WEB_WWWROOT=src/Web/wwwroot
-  LIMIT=200
+  LIMIT=200  (0 = every listing)
   FORCE=0  (set to 1 to re-download even if already present)
+  SEARCH_CACHE=1  (search responses cached under tools/.cache, see search_cache.py)
+  MAX_IMAGE_BYTES=26214400  (downloads above this size are rejected)
+  TARGET_WIDTH=0  (e.g. 800: download a pre-scaled rendition instead of the original)
+  CAS=0  (1 = store images once by SHA-256 under objects/, see image_store.py)
+  DERIVATIVES=0  (1 = write resized WebP/AVIF variants, see image_derivatives.py)
+  RANKING=bm25  (pool every query's results and rank by BM25; first = first query with a hit, see ranking.py)
+  TRIGRAMS=1  (also match titles by character trigrams, see trigram_index.py)
+  PLACEHOLDERS=1  (add width/height and an inline blurred preview per photo, see image_placeholders.py)
+  HOST_RATES / DEFAULT_HOST_RATE  (per-host request rates, see rate_limit.py; API_BASE's host too)
+  OPTIMIZE=0  (1 = shrink each download before storing it: lossless PNG, near-lossless JPEG re-encode, see optimize_images.py)
+  MANIFEST_SHARDS=1  (also write minified shards, .gz/.br and an index under manifest/, see manifest_publish.py)
+  STREAM=0  (1 = bounded memory: parse /api/listings incrementally and write the manifest item by item)
+  STREAM_BATCH=500  (STREAM=1: listings searched, downloaded and written per batch)
+  LISTING_PAGE_SIZE=100  (0 = one unpaged /api/listings request; the Api serves at most 500 per page)
+  LISTING_PAGE_WORKERS=4  (pages fetched concurrently)
+  DELTA=0  (1 = only search listings that are new or changed since the last run; removed ones are recorded for cleanup)
 """
 
 from __future__ import annotations
 
-import json
 import os
 import re
-import sys
 import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
 from urllib.parse import urlencode
-from urllib.request import Request, urlopen
+
+from dir_index import DirIndex
+from downloads import Download, download_to_temp
+from http_client import HttpClient
+from image_derivatives import DERIVATIVES, build_derivatives
+from image_placeholders import PLACEHOLDERS, build_placeholders
+from image_store import describe_existing, store_image
+from listing_source import ListingPages, ListingSyncState, listing_fingerprint
+from manifest_io import read_manifest
+from manifest_publish import ManifestStream, write_manifest
+from optimize_images import OPTIMIZE, OptimizeStats, optimize_download
+from ranking import RANK_POOL_SIZE, RANKING, pool_is_enough, rank
+from rate_limit import limiter_from_env
+from search_cache import search_cache_from_env
+from text_norm import collapse_whitespace, strip_html
+from trigram_index import TRIGRAMS, TrigramIndex
 
 
 API_BASE = os.environ.get("API_BASE", "http://localhost:8081").rstrip("/")
 WEB_WWWROOT = Path(os.environ.get("WEB_WWWROOT", "src/Web/wwwroot")).resolve()
+TARGET_WIDTH = int(os.environ.get("TARGET_WIDTH", "0"))
+# Openverse serves its `thumbnail` rendition at (at most) this width.
+OPENVERSE_THUMBNAIL_WIDTH = 600
 OUT_DIR = WEB_WWWROOT / "img" / "listing-photos"
 MANIFEST_PATH = OUT_DIR / "manifest.json"
+# One directory scan per run instead of a glob per item.
+OUT_INDEX = DirIndex(OUT_DIR)
 LIMIT = int(os.environ.get("LIMIT", "200"))
 FORCE = os.environ.get("FORCE", "0") == "1"
+# Bounded-memory mode for very large catalogs (see stream_manifest).
+STREAM = os.environ.get("STREAM", "0") == "1"
+STREAM_BATCH = max(1, int(os.environ.get("STREAM_BATCH", "500")))
+# Reuse the entries of listings unchanged since the last run (see listing_source.py).
+DELTA = os.environ.get("DELTA", "0") == "1"
+# Extensions guess_extension can produce.
+LISTING_EXTS = (".jpg", ".png", ".webp", ".gif")
 
 USER_AGENT = "MekanBudurImageFetcher/1.0 (+local dev script)"
 
+# One pooled client for the API, Commons, Openverse and the image hosts.
+HTTP = HttpClient(USER_AGENT, limiter=limiter_from_env())
+SEARCH_CACHE = search_cache_from_env()
+OPTIMIZE_STATS = OptimizeStats()
+
 
 @dataclass
 class ImageCandidate:
     url: str
     attribution: str
     source: str
+    # Pre-scaled rendition (Commons thumburl / Openverse thumbnail) when TARGET_WIDTH is set.
+    rendition_url: Optional[str] = None
+
+    @property
+    def download_url(self) -> str:
+        return self.rendition_url or self.url
 
 
 def http_get_json(url: str, timeout_sec: int = 20) -> Any:
-    req = Request(url, headers={"User-Agent": USER_AGENT, "Accept": "application/json"})
-    with urlopen(req, timeout=timeout_sec) as resp:
-        data = resp.read()
-    return json.loads(data.decode("utf-8"))
+    return HTTP.get_json(url, timeout=timeout_sec)
 
 
-def http_get_bytes(url: str, timeout_sec: int = 30) -> Tuple[bytes, str]:
-    req = Request(url, headers={"User-Agent": USER_AGENT})
-    with urlopen(req, timeout=timeout_sec) as resp:
-        content_type = resp.headers.get("Content-Type", "application/octet-stream")
-        return resp.read(), content_type
+def download_image(url: str, key: str, timeout_sec: int = 30) -> Download:
+    dl = download_to_temp(HTTP, url, OUT_DIR, key, timeout_sec=timeout_sec)
+    if OPTIMIZE:
+        optimize_download(dl, OPTIMIZE_STATS)
+    return dl
 
 
-def safe_slug(text: str) -> str:
-    text = (text or "").strip()
-    text = re.sub(r"\s+", " ", text)
-    return text
+COMMONS_API = "https://commons.wikimedia.org/w/api.php"
+# MediaWiki accepts up to 50 titles per query for anonymous clients.
+COMMONS_TITLES_PER_REQUEST = 50
+# RANKING=bm25: best-ranked titles per listing resolved to imageinfo.
+RANK_RESOLVE = 3
+# Every result title seen this run, for fuzzy name matching.
+TITLE_TRIGRAMS = TrigramIndex()
 
 
-def commons_search_first_image(query: str) -> Optional[ImageCandidate]:
+def commons_search_top_title(query: str) -> Optional[str]:
     # Search in File namespace (6) on Wikimedia Commons
-    base = "https://commons.wikimedia.org/w/api.php"
     params = {
         "action": "query",
         "format": "json",
@@ -85,33 +137,77 @@ def commons_search_first_image(query: str) -> Optional[ImageCandidate]:
         "srlimit": "1",
         "srsearch": query,
     }
-    search = http_get_json(f"{base}?{urlencode(params)}")
+    search = SEARCH_CACHE.get_or_fetch(
+        "commons", query, params,
+        fetch=lambda: http_get_json(f"{COMMONS_API}?{urlencode(params)}"),
+        is_empty=lambda d: not (d.get("query") or {}).get("search"),
+        query_param="srsearch",
+    )
     items = (search.get("query") or {}).get("search") or []
     if not items:
         return None
+    return items[0].get("title") or None
+
+
+def commons_imageinfo_batch(titles: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Resolve imageinfo for many File: titles with multi-title requests.
+
+    Returns title -> first imageinfo entry (None when the page is missing or has none).
+    """
+    iiprop = "url|mime|extmetadata"
+    variant = {"iiprop": iiprop, "iiurlwidth": str(TARGET_WIDTH)}
+    out: Dict[str, Optional[Dict[str, Any]]] = {}
+    todo: list[str] = []
+    for title in dict.fromkeys(titles):
+        cached = SEARCH_CACHE.get(SEARCH_CACHE.make_key("commons-imageinfo", title, variant))
+        if cached is not None:
+            out[title] = cached.get("imageinfo")
+        else:
+            todo.append(title)
+
+    for start in range(0, len(todo), COMMONS_TITLES_PER_REQUEST):
+        chunk = todo[start:start + COMMONS_TITLES_PER_REQUEST]
+        params: Dict[str, str] = {
+            "action": "query",
+            "format": "json",
+            "prop": "imageinfo",
+            "iiprop": iiprop,
+            "titles": "|".join(chunk),
+        }
+        if TARGET_WIDTH:
+            params["iiurlwidth"] = str(TARGET_WIDTH)
+        by_title: Dict[str, Dict[str, Any]] = {}
+        renamed: Dict[str, str] = {}
+        cont: Dict[str, str] = {}
+        while True:
+            data = http_get_json(f"{COMMONS_API}?{urlencode({**params, **cont})}")
+            query = data.get("query") or {}
+            for n in query.get("normalized") or []:
+                renamed[n.get("from")] = n.get("to")
+            for page in (query.get("pages") or {}).values():
+                t = page.get("title")
+                if not t:
+                    continue
+                merged = by_title.setdefault(t, page)
+                if merged is not page and page.get("imageinfo"):
+                    merged.setdefault("imageinfo", page["imageinfo"])
+            # Large extmetadata blobs can make the API split the answer across continuations.
+            if "continue" not in data:
+                break
+            cont = {k: str(v) for k, v in data["continue"].items()}
+
+        for title in chunk:
+            page = by_title.get(renamed.get(title, title)) or {}
+            ii = (page.get("imageinfo") or [None])[0]
+            out[title] = ii
+            SEARCH_CACHE.put(SEARCH_CACHE.make_key("commons-imageinfo", title, variant),
+                             "commons-imageinfo", {"imageinfo": ii}, empty=ii is None)
+    return out
 
-    title = items[0].get("title")
-    if not title:
-        return None
-
-    params2 = {
-        "action": "query",
-        "format": "json",
-        "prop": "imageinfo",
-        "iiprop": "url|mime|extmetadata",
-        "titles": title,
-    }
-    info = http_get_json(f"{base}?{urlencode(params2)}")
-    pages = (info.get("query") or {}).get("pages") or {}
-    page = next(iter(pages.values()), None)
-    if not page:
-        return None
 
-    imageinfo = (page.get("imageinfo") or [])
-    if not imageinfo:
+def commons_candidate(title: str, ii: Optional[Dict[str, Any]]) -> Optional[ImageCandidate]:
+    if not ii:
         return None
-
-    ii = imageinfo[0]
     url = ii.get("url")
     if not url:
         return None
@@ -129,29 +225,152 @@ def commons_search_first_image(query: str) -> Optional[ImageCandidate]:
             parts.append(f"License: {strip_html(license_short)}")
         attribution = " | ".join(parts)
 
-    return ImageCandidate(url=url, attribution=attribution, source="commons")
+    return ImageCandidate(url=url, attribution=attribution, source="commons", rendition_url=commons_rendition_url(ii))
 
 
-def openverse_search_first_image(query: str) -> Optional[ImageCandidate]:
+def commons_first_images(query_lists: Dict[str, list[str]], log_prefix: Dict[str, str]) -> Dict[str, ImageCandidate]:
+    """Batched equivalent of trying commons_search_first_image over each key's queries in order.
+
+    Each round runs the next pending query of every key, then resolves all hit titles
+    with a few multi-title imageinfo requests. Keys whose hit has no usable image move
+    on to their next query, exactly like the one-at-a-time loop did.
+    """
+    found: Dict[str, ImageCandidate] = {}
+    pending: Dict[str, int] = {k: 0 for k, qs in query_lists.items() if qs}
+
+    while pending:
+        hits: Dict[str, str] = {}
+        for k, qi in pending.items():
+            q = query_lists[k][qi]
+            try:
+                title = commons_search_top_title(q)
+                if title:
+                    hits[k] = title
+            except Exception as ex:
+                print(f"{log_prefix.get(k, '')} commons search failed for '{q}': {ex}")
+
+        infos: Dict[str, Optional[Dict[str, Any]]] = {}
+        if hits:
+            try:
+                infos = commons_imageinfo_batch(hits.values())
+            except Exception as ex:
+                print(f"commons imageinfo lookup failed for {len(hits)} titles: {ex}")
+
+        next_pending: Dict[str, int] = {}
+        for k, qi in pending.items():
+            title = hits.get(k)
+            candidate = commons_candidate(title, infos.get(title)) if title else None
+            if candidate:
+                found[k] = candidate
+            elif qi + 1 < len(query_lists[k]):
+                next_pending[k] = qi + 1
+        pending = next_pending
+
+    return found
+
+
+def commons_search_first_image(query: str) -> Optional[ImageCandidate]:
+    return commons_first_images({query: [query]}, {}).get(query)
+
+
+def commons_search_results(query: str, limit: int = RANK_POOL_SIZE) -> list[Dict[str, Any]]:
+    """Top File: search hits with their snippets (the text BM25 ranks on besides the title)."""
+    params = {
+        "action": "query",
+        "format": "json",
+        "list": "search",
+        "srnamespace": "6",
+        "srlimit": str(limit),
+        "srprop": "snippet",
+        "srsearch": query,
+    }
+    search = SEARCH_CACHE.get_or_fetch(
+        "commons", query, params,
+        fetch=lambda: http_get_json(f"{COMMONS_API}?{urlencode(params)}"),
+        is_empty=lambda d: not (d.get("query") or {}).get("search"),
+        query_param="srsearch",
+    )
+    return (search.get("query") or {}).get("search") or []
+
+
+def fuzzy_titles(name: str, pool: list[Tuple[Any, Dict[str, str]]]) -> Optional[Dict[str, float]]:
+    """Trigram similarity of `name` to the pooled titles (see trigram_index.py)."""
+    if not TRIGRAMS or not pool:
+        return None
+    TITLE_TRIGRAMS.add(fields["title"] for _, fields in pool)
+    return TITLE_TRIGRAMS.similarities(name)
+
+
+def commons_ranked_images(names: Dict[str, str], query_lists: Dict[str, list[str]],
+                          log_prefix: Dict[str, str]) -> Dict[str, ImageCandidate]:
+    """RANKING=bm25 counterpart of commons_first_images.
+
+    Pools the search hits of each key's queries, ranks them against the listing
+    title, and resolves the best few titles of every key in shared multi-title
+    imageinfo requests; the best title with a usable image wins.
+    """
+    shortlist: Dict[str, list[str]] = {}
+    for k, queries in query_lists.items():
+        pool: list[Tuple[str, Dict[str, str]]] = []
+        seen: set[str] = set()
+        for q in queries:
+            try:
+                hits = commons_search_results(q)
+            except Exception as ex:
+                print(f"{log_prefix.get(k, '')} commons search failed for '{q}': {ex}")
+                continue
+            for hit in hits:
+                title = hit.get("title")
+                if not title or title in seen:
+                    continue
+                seen.add(title)
+                pool.append((title, {"title": title, "description": strip_html(hit.get("snippet") or "")}))
+            if pool_is_enough(names[k], [t for t, _ in pool]):
+                break
+        shortlist[k] = [r.item for r in rank(names[k], pool, fuzzy=fuzzy_titles(names[k], pool))][:RANK_RESOLVE]
+
+    infos: Dict[str, Optional[Dict[str, Any]]] = {}
+    titles = [t for ts in shortlist.values() for t in ts]
+    if titles:
+        try:
+            infos = commons_imageinfo_batch(titles)
+        except Exception as ex:
+            print(f"commons imageinfo lookup failed for {len(titles)} titles: {ex}")
+
+    found: Dict[str, ImageCandidate] = {}
+    for k, ts in shortlist.items():
+        for title in ts:
+            candidate = commons_candidate(title, infos.get(title))
+            if candidate:
+                found[k] = candidate
+                break
+    return found
+
+
+def openverse_search(query: str, page_size: int) -> list[Dict[str, Any]]:
     base = "https://api.openverse.engineering/v1/images/"
     params = {
         "q": query,
-        "page_size": "1",
+        "page_size": str(page_size),
         "license_type": "commercial",  # safest default for app usage
     }
-    data = http_get_json(f"{base}?{urlencode(params)}")
-    results = data.get("results") or []
-    if not results:
-        return None
+    data = SEARCH_CACHE.get_or_fetch(
+        "openverse", query, params,
+        fetch=lambda: http_get_json(f"{base}?{urlencode(params)}"),
+        is_empty=lambda d: not d.get("results"),
+        query_param="q",
+    )
+    return data.get("results") or []
 
-    r0 = results[0]
-    url = r0.get("url") or r0.get("thumbnail")
+
+def openverse_candidate(r: Dict[str, Any]) -> Optional[ImageCandidate]:
+    url = r.get("url") or r.get("thumbnail")
     if not url:
         return None
 
-    creator = r0.get("creator")
-    license_ = r0.get("license")
-    source = r0.get("source") or "Openverse"
+    creator = r.get("creator")
+    license_ = r.get("license")
+    source = r.get("source") or "Openverse"
     attribution = f"Openverse | {source}"
     if creator or license_:
         parts = ["Openverse", source]
@@ -161,12 +380,57 @@ def openverse_search_first_image(query: str) -> Optional[ImageCandidate]:
             parts.append(f"License: {license_}")
         attribution = " | ".join(parts)
 
-    return ImageCandidate(url=url, attribution=attribution, source="openverse")
+    return ImageCandidate(url=url, attribution=attribution, source="openverse",
+                          rendition_url=openverse_rendition_url(r))
+
+
+def openverse_search_first_image(query: str) -> Optional[ImageCandidate]:
+    results = openverse_search(query, page_size=1)
+    return openverse_candidate(results[0]) if results else None
+
+
+def openverse_ranked_image(name: str, queries: list[str], log_prefix: str = "") -> Optional[ImageCandidate]:
+    """RANKING=bm25: pool the results of `queries`, return the best-ranked usable one."""
+    pool: list[Tuple[Dict[str, Any], Dict[str, str]]] = []
+    seen: set[str] = set()
+    for q in queries:
+        try:
+            results = openverse_search(q, page_size=RANK_POOL_SIZE)
+        except Exception as ex:
+            print(f"{log_prefix} openverse search failed for '{q}': {ex}")
+            continue
+        for r in results:
+            url = r.get("url") or r.get("thumbnail")
+            if not url or url in seen:
+                continue
+            seen.add(url)
+            tags = " ".join(str(t.get("name") or "") for t in (r.get("tags") or []) if isinstance(t, dict))
+            pool.append((r, {"title": str(r.get("title") or ""), "description": tags}))
+        if pool_is_enough(name, [fields["title"] for _, fields in pool]):
+            break
+    for ranked in rank(name, pool, fuzzy=fuzzy_titles(name, pool)):
+        candidate = openverse_candidate(ranked.item)
+        if candidate:
+            return candidate
+    return None
+
+
+def commons_rendition_url(ii: Dict[str, Any]) -> Optional[str]:
+    thumb = ii.get("thumburl")
+    if not TARGET_WIDTH or not thumb or thumb == ii.get("url"):
+        return None
+    return thumb
 
 
-def strip_html(s: str) -> str:
-    # Minimal HTML strip; Commons returns values containing tags.
-    return re.sub(r"<[^>]+>", "", s or "").strip()
+def openverse_rendition_url(r: Dict[str, Any]) -> Optional[str]:
+    thumb = r.get("thumbnail")
+    if not TARGET_WIDTH or not thumb or TARGET_WIDTH > OPENVERSE_THUMBNAIL_WIDTH:
+        return None
+    width = r.get("width")
+    if isinstance(width, int) and 0 < width <= TARGET_WIDTH:
+        # The original is already small enough; avoid a needless re-encode.
+        return None
+    return thumb
 
 
 def guess_extension(content_type: str, url: str) -> str:
@@ -190,8 +454,8 @@ def guess_extension(content_type: str, url: str) -> str:
 
 
 def build_queries(title: str, location: Optional[str]) -> list[str]:
-    t = safe_slug(title)
-    loc = safe_slug(location or "")
+    t = collapse_whitespace(title)
+    loc = collapse_whitespace(location or "")
 
     # A couple of variants; simplest-first.
     q1 = f"{t} {loc}".strip()
@@ -206,74 +470,111 @@ def build_queries(title: str, location: Optional[str]) -> list[str]:
     return out
 
 
-def fetch_listings() -> list[Dict[str, Any]]:
-    url = f"{API_BASE}/api/listings"
-    data = http_get_json(url)
-    if not isinstance(data, list):
-        raise RuntimeError(f"Unexpected /api/listings response: {type(data)}")
-    return data[:LIMIT]
+def fetch_listings() -> Tuple[list[Dict[str, Any]], bool]:
+    """The listings, and whether they are provably the whole catalog (see listing_source)."""
+    source = ListingPages(HTTP, API_BASE, limit=LIMIT)
+    listings = list(source)
+    return listings, source.complete
 
 
-def main() -> int:
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
+def iter_listings() -> Iterator[Dict[str, Any]]:
+    """STREAM=1 counterpart of fetch_listings: a page, or an unpaged response, at a time."""
+    return iter(ListingPages(HTTP, API_BASE, limit=LIMIT))
 
-    print(f"API_BASE={API_BASE}")
-    print(f"WEB_WWWROOT={WEB_WWWROOT}")
-    print(f"OUT_DIR={OUT_DIR}")
 
-    listings = fetch_listings()
-    print(f"Found {len(listings)} listings")
+class ListingRef(NamedTuple):
+    """The fields of one /api/listings entry this script uses, instead of the whole dict."""
+    idx: int
+    listing_id: str
+    title: str
+    location: Any
 
-    manifest: Dict[str, Any] = {
-        "generatedAtUtc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-        "apiBase": API_BASE,
-        "items": {}
-    }
 
+def listing_refs(listings: Iterable[Any]) -> Iterator[ListingRef]:
     for idx, l in enumerate(listings, start=1):
+        if not isinstance(l, dict):
+            continue
         listing_id = str(l.get("id") or l.get("Id") or "").strip()
         title = str(l.get("title") or l.get("Title") or "").strip()
-        location = l.get("location") or l.get("Location")
-
-        if not listing_id or not title:
-            continue
-
+        if listing_id and title:
+            yield ListingRef(idx, listing_id, title, l.get("location") or l.get("Location"))
+
+
+def batched(refs: Iterable[ListingRef], size: int) -> Iterator[list[ListingRef]]:
+    batch: list[ListingRef] = []
+    for ref in refs:
+        batch.append(ref)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def find_existing(listing_id: str) -> Optional[Path]:
+    if not STREAM:
+        found = OUT_INDEX.find(listing_id)
+        return found.path if found else None
+    # Bounded memory: probe the names this script writes instead of indexing the whole directory.
+    # os.path, not Path: pathlib interns every name it parses, and most probes miss.
+    for ext in LISTING_EXTS:
+        path = os.path.join(OUT_DIR, f"{listing_id}{ext}")
+        if os.path.isfile(path):
+            return Path(path)
+    return None
+
+
+def fetch_batch(batch: list[ListingRef], total: Any) -> Dict[str, Any]:
+    """Manifest items for `batch`, in batch (API) order."""
+    items: Dict[str, Any] = {}
+    todo: Dict[str, ListingRef] = {}
+    query_lists: Dict[str, list[str]] = {}
+
+    for ref in batch:
         # Skip if already present (any extension)
-        existing = next(iter(OUT_DIR.glob(f"{listing_id}.*")), None)
+        existing = find_existing(ref.listing_id)
         if existing and not FORCE:
-            rel = existing.relative_to(WEB_WWWROOT).as_posix()
-            manifest["items"][listing_id] = {
+            stored = describe_existing(existing, OUT_DIR)
+            rel = stored.path.relative_to(WEB_WWWROOT).as_posix()
+            items[ref.listing_id] = {
                 "path": "/" + rel,
-                "title": title,
-                "location": location,
+                "title": ref.title,
+                "location": ref.location,
                 "source": "local",
                 "attribution": None,
+                **stored.manifest_fields(),
             }
             continue
 
-        queries = build_queries(title, str(location) if location is not None else None)
-
-        candidate: Optional[ImageCandidate] = None
-        for q in queries:
-            try:
-                candidate = commons_search_first_image(q)
-                if candidate:
-                    break
-            except Exception as ex:
-                print(f"[{idx}/{len(listings)}] commons search failed for '{q}': {ex}")
-
-        if not candidate:
-            for q in queries:
+        # Reserve the slot so the manifest keeps the API order.
+        items[ref.listing_id] = None
+        todo[ref.listing_id] = ref
+        query_lists[ref.listing_id] = build_queries(ref.title, str(ref.location) if ref.location is not None else None)
+
+    # Commons: search every pending listing, then resolve the hits in multi-title batches.
+    prefixes = {k: f"[{ref.idx}/{total}]" for k, ref in todo.items()}
+    if RANKING == "first":
+        candidates: Dict[str, ImageCandidate] = commons_first_images(query_lists, prefixes)
+    else:
+        candidates = commons_ranked_images({k: ref.title for k, ref in todo.items()}, query_lists, prefixes)
+
+    for listing_id, (idx, _, title, location) in todo.items():
+        candidate = candidates.get(listing_id)
+
+        if not candidate and RANKING != "first":
+            candidate = openverse_ranked_image(title, query_lists[listing_id], f"[{idx}/{total}]")
+        elif not candidate:
+            for q in query_lists[listing_id]:
                 try:
                     candidate = openverse_search_first_image(q)
                     if candidate:
                         break
                 except Exception as ex:
-                    print(f"[{idx}/{len(listings)}] openverse search failed for '{q}': {ex}")
+                    print(f"[{idx}/{total}] openverse search failed for '{q}': {ex}")
 
         if not candidate:
-            print(f"[{idx}/{len(listings)}] No image found for '{title}'")
-            manifest["items"][listing_id] = {
+            print(f"[{idx}/{total}] No image found for '{title}'")
+            items[listing_id] = {
                 "path": None,
                 "title": title,
                 "location": location,
@@ -283,14 +584,15 @@ def main() -> int:
             continue
 
         try:
-            img_bytes, content_type = http_get_bytes(candidate.url)
-            ext = guess_extension(content_type, candidate.url)
-
-            out_path = OUT_DIR / f"{listing_id}{ext}"
-            out_path.write_bytes(img_bytes)
-
-            rel = out_path.relative_to(WEB_WWWROOT).as_posix()
-            manifest["items"][listing_id] = {
+            dl = download_image(candidate.download_url, listing_id)
+            content_type = dl.content_type
+            ext = guess_extension(content_type, candidate.download_url)
+            stored = store_image(dl, OUT_DIR, listing_id, ext)
+            if stored.key_path and not STREAM:
+                OUT_INDEX.record(stored.key_path)
+
+            rel = stored.path.relative_to(WEB_WWWROOT).as_posix()
+            item: Dict[str, Any] = {
                 "path": "/" + rel,
                 "title": title,
                 "location": location,
@@ -299,11 +601,16 @@ def main() -> int:
                 "contentType": content_type,
                 "url": candidate.url,
             }
+            if candidate.rendition_url:
+                item["renditionUrl"] = candidate.rendition_url
+            item.update(stored.manifest_fields())
+            items[listing_id] = item
 
-            print(f"[{idx}/{len(listings)}] Saved {title} -> {out_path.name} ({candidate.source})")
+            dedup = ", deduplicated" if stored.deduplicated else ""
+            print(f"[{idx}/{total}] Saved {title} -> {stored.path.name} ({candidate.source}{dedup})")
         except Exception as ex:
-            print(f"[{idx}/{len(listings)}] Download failed for '{title}': {ex}")
-            manifest["items"][listing_id] = {
+            print(f"[{idx}/{total}] Download failed for '{title}': {ex}")
+            items[listing_id] = {
                 "path": None,
                 "title": title,
                 "location": location,
@@ -315,8 +622,131 @@ def main() -> int:
         # Be polite to public APIs
         time.sleep(0.2)
 
-    MANIFEST_PATH.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return items
+
+
+def reusable(item: Any) -> bool:
+    """A finished entry whose image is still on disk; failed and empty ones are searched again."""
+    if not isinstance(item, dict) or "error" in item or not item.get("path"):
+        return False
+    return (WEB_WWWROOT / str(item["path"]).lstrip("/")).is_file()
+
+
+def delta_sync(refs: list[ListingRef], total: int, now: str, complete: bool) -> Tuple[Dict[str, Any], ListingSyncState]:
+    """DELTA=1: keep the manifest entries of unchanged listings, search only new or changed ones.
+
+    Returns the items in API order and the updated sync state, to be saved
+    once the manifest is written. Removals are only recorded when `complete`;
+    otherwise the previous entries of listings this run did not see are kept.
+    """
+    state = ListingSyncState.load(OUT_DIR)
+    previous = read_manifest(MANIFEST_PATH) if MANIFEST_PATH.exists() else None
+    previous_items = previous["items"] if isinstance(previous, dict) and isinstance(previous.get("items"), dict) else {}
+
+    seen = {ref.listing_id: listing_fingerprint(ref.title, ref.location) for ref in refs}
+    reused: Dict[str, Any] = {}
+    for ref in refs:
+        item = previous_items.get(ref.listing_id)
+        if not FORCE and state.unchanged(ref.listing_id, seen[ref.listing_id]) and reusable(item):
+            reused[ref.listing_id] = item
+    fetched = fetch_batch([ref for ref in refs if ref.listing_id not in reused], total)
+    items = {ref.listing_id: reused.get(ref.listing_id) or fetched.get(ref.listing_id) for ref in refs}
+    if not complete:
+        # The rest of the catalog was not read; keep its entries instead of dropping them from the site.
+        for listing_id, item in previous_items.items():
+            if listing_id not in items and listing_id not in state.removed:
+                items[listing_id] = item
+
+    since = state.last_run_utc or "never"
+    gone = state.update(seen, previous_items, now, complete)
+    print(f"Delta since {since}: {len(reused)} unchanged, {len(seen) - len(reused)} new or changed, "
+          f"{len(gone)} removed" + ("" if complete else " (catalog not read completely, removals not checked)"))
+    return items, state
+
+
+def add_counts(total: Dict[str, int], counts: Dict[str, int]) -> None:
+    for name, n in counts.items():
+        total[name] = total.get(name, 0) + n
+
+
+def stream_manifest(head: Dict[str, Any]) -> int:
+    """STREAM=1: fetch, post-process and write STREAM_BATCH listings at a time.
+
+    Only one batch of listings and manifest items is in memory at once. Listing
+    ids are database GUIDs, so batches never repeat a key. The placeholder and
+    derivative caches are not pruned in this mode (their entries of other
+    batches are still live).
+    """
+    derivatives: Dict[str, int] = {}
+    placeholders: Dict[str, int] = {}
+    stream = ManifestStream(MANIFEST_PATH, head)
+    try:
+        for batch in batched(listing_refs(iter_listings()), STREAM_BATCH):
+            items = fetch_batch(batch, "?")
+            if DERIVATIVES:
+                add_counts(derivatives, build_derivatives(items, WEB_WWWROOT, OUT_DIR, prune=False))
+            if PLACEHOLDERS:
+                add_counts(placeholders, build_placeholders(items, WEB_WWWROOT, OUT_DIR, prune=False))
+            for listing_id, item in items.items():
+                stream.add(listing_id, item)
+            # Similarities are per title pair, so the next batch does not need these titles.
+            TITLE_TRIGRAMS.clear()
+            print(f"Batch done: {stream.count} listings written")
+    except BaseException:
+        stream.abort()
+        raise
+    stream.close()
+    if DERIVATIVES:
+        print(f"Derivatives: {derivatives}")
+    if PLACEHOLDERS:
+        print(f"Placeholders: {placeholders}")
+    return stream.count
+
+
+def main() -> int:
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    print(f"API_BASE={API_BASE}")
+    print(f"WEB_WWWROOT={WEB_WWWROOT}")
+    print(f"OUT_DIR={OUT_DIR}")
+
+    head: Dict[str, Any] = {
+        "generatedAtUtc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "apiBase": API_BASE,
+    }
+
+    if STREAM:
+        if DELTA:
+            print("DELTA=1 needs the previous manifest in memory; STREAM=1 runs a full sync.")
+        print(f"Streaming listings in batches of {STREAM_BATCH}")
+        print(f"Found {stream_manifest(head)} listings")
+    else:
+        listings, complete = fetch_listings()
+        print(f"Found {len(listings)} listings" + ("" if complete else " (not the whole catalog)"))
+        refs = list(listing_refs(listings))
+        state: Optional[ListingSyncState] = None
+        if DELTA:
+            items, state = delta_sync(refs, len(listings), head["generatedAtUtc"], complete)
+        else:
+            items = fetch_batch(refs, len(listings))
+        manifest: Dict[str, Any] = {**head, "items": items}
+
+        if DERIVATIVES:
+            print(f"Derivatives: {build_derivatives(manifest['items'], WEB_WWWROOT, OUT_DIR)}")
+        if PLACEHOLDERS:
+            print(f"Placeholders: {build_placeholders(manifest['items'], WEB_WWWROOT, OUT_DIR)}")
+
+        write_manifest(MANIFEST_PATH, manifest)
+        if state is not None:
+            state.save()
+
     print(f"Wrote manifest: {MANIFEST_PATH}")
+    print(f"HTTP: {HTTP.stats.summary()}")
+    if OPTIMIZE:
+        print(f"Optimize: {OPTIMIZE_STATS.summary()}")
+    print(f"Search cache: {SEARCH_CACHE.summary()}")
+    HTTP.close()
+    SEARCH_CACHE.close()
     return 0
 
 
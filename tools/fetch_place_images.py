@@ -2,7 +2,7 @@
 """Fetch and cache images for the hardcoded Gölbaşı place lists in app.js.
 
 This is the "get me out of the API" path:
-- Reads place names from src/Web/wwwroot/js/app.js (GOLBASI_PLACES, PHOTOGRAPHERS, etc.)
+- Reads places from src/Web/wwwroot/js/app.js (GOLBASI_PLACES, PHOTOGRAPHERS, etc., see place_catalog.py)
 - Finds a best-effort open-licensed image (Wikimedia Commons then Openverse)
 - Downloads one image per place
 - Writes a manifest used by the website at /img/place-photos/manifest.json
@@ -19,6 +19,23 @@ Env vars:
   WEB_WWWROOT=src/Web/wwwroot
   FORCE=0  (1 re-download)
   LIMIT=999
+  CONCURRENCY=4  (places processed in parallel; 1 = sequential)
+  MAX_IMAGE_BYTES=26214400  (downloads above this size are rejected)
+  TARGET_WIDTH=0  (e.g. 800: download a pre-scaled rendition instead of the original)
+  CAS=0  (1 = store images once by SHA-256 under objects/, see image_store.py)
+  DERIVATIVES=0  (1 = write resized WebP/AVIF variants, see image_derivatives.py)
+  PLACEHOLDERS=1  (add width/height and an inline blurred preview per photo, see image_placeholders.py)
+  OPTIMIZE=0  (1 = shrink each download before storing it: lossless PNG, near-lossless JPEG re-encode, see optimize_images.py)
+  HOST_RATES / DEFAULT_HOST_RATE  (per-host request rates, see rate_limit.py)
+  SEARCH_CACHE=1  (search responses cached under tools/.cache, see search_cache.py)
+  CHECKPOINT_EVERY=25 / CHECKPOINT_SEC=30  (flush the manifest during long runs)
+  RESUME=0  (1 = skip places already finished by an interrupted run)
+  RANKING=bm25  (pool a fixed query set and rank by BM25; first = first query with a hit, see ranking.py)
+  PLACE_QUERY_BUDGET=6 / PLANNER=1  (search requests per place and provider; template order learned across runs, see query_planner.py)
+  GEOSEARCH=1  (also search Commons around each place's lat/lng and rank nearby photos higher, see geo_search.py)
+  TRIGRAMS=1  (also match names by character trigrams, e.g. "balosalonlari", see trigram_index.py)
+  MANIFEST_SHARDS=1  (also write minified per-category shards, .gz/.br and an index under manifest/, see manifest_publish.py)
+  PHASH_DEDUP=1  (reject photos that are near-duplicates of another place's, see perceptual_hash.py)
 """
 
 from __future__ import annotations
@@ -26,31 +43,65 @@ from __future__ import annotations
 import json
 import os
 import re
+import threading
 import time
-import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional, Tuple
+from typing import Any, Dict, Iterator, Optional, Tuple
 from urllib.parse import urlencode
-from urllib.request import Request, urlopen
 from urllib.error import HTTPError
 
+from dir_index import DirIndex
+from downloads import Download, DownloadTooLarge, download_to_temp
+from http_client import HttpClient
+from geo_search import GEO_CLOSE_M, GEO_RADIUS_M, GEOSEARCH, coord_query, geosearch_params, page_distance_m, proximity
+from image_derivatives import DERIVATIVES, build_derivatives
+from image_placeholders import PLACEHOLDERS, build_placeholders
+from image_store import describe_existing, store_image
+from manifest_io import ProgressJournal, read_manifest
+from manifest_publish import write_manifest
+from optimize_images import OPTIMIZE, OptimizeStats, optimize_download
+from perceptual_hash import PHASH_DEDUP, PHASH_MAX_CANDIDATES, PerceptualIndex, dhash
+from place_catalog import Place, load_places
+from query_planner import PlannedQuery, QueryBudget, QueryPlanner
+from ranking import RANK_POOL_SIZE, RANKING, pool_is_enough, rank
+from rate_limit import limiter_from_env
+from search_cache import search_cache_from_env
+from text_norm import collapse_whitespace, normalize_place_key, normalize_text_for_match, strip_html, token_overlap_score
+from trigram_index import TRIGRAMS, TrigramIndex
+
 USER_AGENT = "MekanBudurPlaceImageFetcher/1.0 (+local dev script)"
 
 APP_JS = Path(os.environ.get("APP_JS", "src/Web/wwwroot/js/app.js")).resolve()
 WEB_WWWROOT = Path(os.environ.get("WEB_WWWROOT", "src/Web/wwwroot")).resolve()
+TARGET_WIDTH = int(os.environ.get("TARGET_WIDTH", "0"))
+# Openverse serves its `thumbnail` rendition at (at most) this width.
+OPENVERSE_THUMBNAIL_WIDTH = 600
 OUT_DIR = WEB_WWWROOT / "img" / "place-photos"
 MANIFEST_PATH = OUT_DIR / "manifest.json"
+# One directory scan per run instead of a glob per item.
+OUT_INDEX = DirIndex(OUT_DIR)
+PHASH_INDEX = PerceptualIndex(OUT_DIR)
+# Every result title seen this run, for fuzzy name matching.
+TITLE_TRIGRAMS = TrigramIndex()
+PLANNER = QueryPlanner()
+# Planner template id of the Commons geosearch (see geo_search.py).
+GEO_TEMPLATE = "geo"
 FORCE = os.environ.get("FORCE", "0") == "1"
 LIMIT = int(os.environ.get("LIMIT", "999"))
 OVERRIDES_PATH = Path(os.environ.get("OVERRIDES", "tools/place_image_overrides.json")).resolve()
-SLEEP_SEC = float(os.environ.get("SLEEP_SEC", "0.8"))
-
+CONCURRENCY = max(1, int(os.environ.get("CONCURRENCY", "4")))
+CHECKPOINT_EVERY = max(1, int(os.environ.get("CHECKPOINT_EVERY", "25")))
+CHECKPOINT_SEC = float(os.environ.get("CHECKPOINT_SEC", "30"))
+RESUME = os.environ.get("RESUME", "0") == "1"
+PROGRESS_PATH = OUT_DIR / ".fetch_progress.jsonl"
 
-@dataclass
-class Place:
-    name: str
-    category: str
+# Politeness comes from per-host token buckets shared by all workers.
+RATE_LIMITER = limiter_from_env()
+HTTP = HttpClient(USER_AGENT, limiter=RATE_LIMITER)
+SEARCH_CACHE = search_cache_from_env()
+OPTIMIZE_STATS = OptimizeStats()
 
 
 @dataclass
@@ -58,29 +109,41 @@ class ImageCandidate:
     url: str
     attribution: str
     source: str
+    # Pre-scaled rendition (Commons thumburl / Openverse thumbnail) when TARGET_WIDTH is set.
+    rendition_url: Optional[str] = None
+    # Text the result is ranked on (see ranking.py).
+    title: str = ""
+    description: str = ""
+    # build_queries template id of the search that returned it.
+    query_template: str = ""
+    # Metres from the place, when both have coordinates (see geo_search.py).
+    distance_m: Optional[float] = None
+
+    @property
+    def download_url(self) -> str:
+        return self.rendition_url or self.url
 
 
 def http_get_json(url: str, timeout_sec: int = 25) -> Any:
-    req = Request(url, headers={"User-Agent": USER_AGENT, "Accept": "application/json"})
-    with urlopen(req, timeout=timeout_sec) as resp:
-        data = resp.read()
-    return json.loads(data.decode("utf-8"))
+    return HTTP.get_json(url, timeout=timeout_sec)
 
 
-def http_get_bytes(url: str, timeout_sec: int = 40) -> Tuple[bytes, str]:
-    req = Request(url, headers={"User-Agent": USER_AGENT})
-    with urlopen(req, timeout=timeout_sec) as resp:
-        content_type = resp.headers.get("Content-Type", "application/octet-stream")
-        return resp.read(), content_type
+def download_image(url: str, key: str, timeout_sec: int = 40) -> Download:
+    dl = download_to_temp(HTTP, url, OUT_DIR, key, timeout_sec=timeout_sec)
+    if OPTIMIZE:
+        optimize_download(dl, OPTIMIZE_STATS)
+    return dl
 
 
-def http_get_bytes_with_retry(url: str, timeout_sec: int = 40, retries: int = 3) -> Tuple[bytes, str]:
+def download_image_with_retry(url: str, key: str, timeout_sec: int = 40, retries: int = 3) -> Download:
     # Be polite to public services (Commons/Openverse). Handle 429 with backoff.
     backoff = [2.0, 6.0, 12.0]
     last_ex: Exception | None = None
     for attempt in range(retries + 1):
         try:
-            return http_get_bytes(url, timeout_sec=timeout_sec)
+            return download_image(url, key, timeout_sec=timeout_sec)
+        except DownloadTooLarge:
+            raise
         except HTTPError as ex:
             last_ex = ex
             if getattr(ex, "code", None) == 429 and attempt < retries:
@@ -98,83 +161,22 @@ def http_get_bytes_with_retry(url: str, timeout_sec: int = 40, retries: int = 3)
     raise last_ex
 
 
-def strip_html(s: str) -> str:
-    return re.sub(r"<[^>]+>", "", s or "").strip()
-
-
-def normalize_text_for_match(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = (s
-         .replace("ı", "i")
-         .replace("ş", "s")
-         .replace("ğ", "g")
-         .replace("ü", "u")
-         .replace("ö", "o")
-         .replace("ç", "c"))
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = re.sub(r"[^a-z0-9]+", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-
-STOP_TOKENS: set[str] = {
-    # generic business words
-    "dugun", "dugunu", "dugun-salonu", "salon", "salonu", "salonlari", "balo", "kir", "bahcesi", "bahcesi",
-    "wedding", "hall", "event", "events", "plaza", "park", "life", "elite", "lux", "luxe",
-    "cafe", "pastane", "pastanesi", "firin", "pasta", "ekler", "ekleristan",
-    "cicek", "cicekcilik", "cicekci", "orkide",
-    "foto", "fotograf", "fotografcilik", "studyo", "stüdyo", "studio", "medya", "film",
-    # location words
-    "golbasi", "golbasi", "ankara",
-}
-
-
-def tokenize_for_match(s: str) -> list[str]:
-    s2 = normalize_text_for_match(s)
-    tokens = [t for t in s2.split(" ") if t and len(t) > 1]
-    out: list[str] = []
-    for t in tokens:
-        if t in STOP_TOKENS:
-            continue
-        out.append(t)
-    return out
-
-
-def token_overlap_score(query_name: str, candidate_title: str) -> float:
-    q = set(tokenize_for_match(query_name))
-    c = set(tokenize_for_match(candidate_title))
-    if not q or not c:
-        return 0.0
-    inter = len(q & c)
-    union = len(q | c)
-    if union == 0:
-        return 0.0
-    return inter / union
-
-
-def normalize_place_key(name: str) -> str:
-    # Must match the JS-side normalization
-    s = (name or "").strip().lower()
-
-    # Turkish specific
-    s = (s
-         .replace("ı", "i")
-         .replace("İ".lower(), "i")
-         .replace("ş", "s")
-         .replace("ğ", "g")
-         .replace("ü", "u")
-         .replace("ö", "o")
-         .replace("ç", "c"))
+def commons_rendition_url(ii: Dict[str, Any]) -> Optional[str]:
+    thumb = ii.get("thumburl")
+    if not TARGET_WIDTH or not thumb or thumb == ii.get("url"):
+        return None
+    return thumb
 
-    # Remove diacritics (just in case)
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
 
-    # Keep alnum, collapse others
-    s = re.sub(r"[^a-z0-9]+", "-", s)
-    s = re.sub(r"-+", "-", s).strip("-")
-    return s
+def openverse_rendition_url(r: Dict[str, Any]) -> Optional[str]:
+    thumb = r.get("thumbnail")
+    if not TARGET_WIDTH or not thumb or TARGET_WIDTH > OPENVERSE_THUMBNAIL_WIDTH:
+        return None
+    width = r.get("width")
+    if isinstance(width, int) and 0 < width <= TARGET_WIDTH:
+        # The original is already small enough; avoid a needless re-encode.
+        return None
+    return thumb
 
 
 def guess_extension(content_type: str, url: str) -> str:
@@ -196,55 +198,126 @@ def guess_extension(content_type: str, url: str) -> str:
     return ".jpg"
 
 
-def commons_search_best_image(query_name: str, query: str) -> Optional[ImageCandidate]:
-    base = "https://commons.wikimedia.org/w/api.php"
+def rank_candidates(query_name: str, scored: list[tuple[float, ImageCandidate]]) -> list[ImageCandidate]:
+    if TRIGRAMS and scored:
+        # Glued/split spellings score 0 on word tokens; let trigram similarity stand in.
+        TITLE_TRIGRAMS.add(cand.title for _, cand in scored)
+        fuzzy = TITLE_TRIGRAMS.similarities(query_name)
+        scored = [(max(score, fuzzy.get(cand.title, 0.0)), cand) for score, cand in scored]
+    # Stable sort: equal scores keep the API's order, so the first entry is the
+    # same one the old "keep the first best" loop picked.
+    return [cand for _, cand in sorted(scored, key=lambda sc: -sc[0])]
+
 
+COMMONS_API = "https://commons.wikimedia.org/w/api.php"
+
+
+def commons_page_candidate(page: Dict[str, Any]) -> Optional[ImageCandidate]:
+    """Candidate for one page of a Commons generator + prop=imageinfo response."""
+    title = page.get("title")
+    if not title:
+        return None
+    imageinfo = (page.get("imageinfo") or [])
+    if not imageinfo:
+        return None
+    ii = imageinfo[0]
+    url = ii.get("url")
+    if not url:
+        return None
+
+    meta = ii.get("extmetadata") or {}
+    artist = (meta.get("Artist") or {}).get("value")
+    license_short = (meta.get("LicenseShortName") or {}).get("value")
+
+    parts = ["Wikimedia Commons", title]
+    if artist:
+        parts.append(f"Artist: {strip_html(artist)}")
+    if license_short:
+        parts.append(f"License: {strip_html(license_short)}")
+
+    description = " ".join(
+        strip_html(str((meta.get(name) or {}).get("value") or ""))
+        for name in ("ObjectName", "ImageDescription", "Categories")
+    )
+    return ImageCandidate(url=url, attribution=" | ".join(parts), source="commons",
+                          rendition_url=commons_rendition_url(ii),
+                          title=title, description=description.replace("|", " "))
+
+
+def commons_search_candidates(query_name: str, query: str, near: Optional[Place] = None) -> list[ImageCandidate]:
+    """All usable results for `query`, best match first.
+
+    With `near` (a place with coordinates) each result Commons has a location
+    for gets its `distance_m` from the place.
+    """
     # Single API call: generator=search + prop=imageinfo
     params = {
         "action": "query",
         "format": "json",
         "generator": "search",
         "gsrnamespace": "6",
-        "gsrlimit": "10",
+        "gsrlimit": "10" if RANKING == "first" else str(RANK_POOL_SIZE),
         "gsrsearch": query,
         "prop": "imageinfo",
         "iiprop": "url|mime|extmetadata",
     }
-    data = http_get_json(f"{base}?{urlencode(params)}")
+    if near is not None:
+        params["prop"] = "imageinfo|coordinates"
+        params["colimit"] = "max"
+    if TARGET_WIDTH:
+        params["iiurlwidth"] = str(TARGET_WIDTH)
+    data = SEARCH_CACHE.get_or_fetch(
+        "commons", query, params,
+        fetch=lambda: http_get_json(f"{COMMONS_API}?{urlencode(params)}"),
+        is_empty=lambda d: not (d.get("query") or {}).get("pages"),
+        query_param="gsrsearch",
+    )
     pages = (data.get("query") or {}).get("pages") or {}
 
-    best: tuple[float, ImageCandidate] | None = None
+    scored: list[tuple[float, ImageCandidate]] = []
     for page in pages.values():
-        title = page.get("title")
-        if not title:
-            continue
-        imageinfo = (page.get("imageinfo") or [])
-        if not imageinfo:
+        cand = commons_page_candidate(page)
+        if cand is None:
             continue
-        ii = imageinfo[0]
-        url = ii.get("url")
-        if not url:
-            continue
-
-        meta = ii.get("extmetadata") or {}
-        artist = (meta.get("Artist") or {}).get("value")
-        license_short = (meta.get("LicenseShortName") or {}).get("value")
+        if near is not None:
+            cand.distance_m = page_distance_m(page, near.lat, near.lng)
+        scored.append((token_overlap_score(query_name, cand.title), cand))
+
+    return rank_candidates(query_name, scored)
+
+
+def commons_geosearch_candidates(p: Place) -> list[ImageCandidate]:
+    """Files Commons has located within GEO_RADIUS_M of `p`, nearest first."""
+    params = geosearch_params(p.lat, p.lng)
+    if TARGET_WIDTH:
+        params["iiurlwidth"] = str(TARGET_WIDTH)
+    data = SEARCH_CACHE.get_or_fetch(
+        "commons-geo", params["ggscoord"], params,
+        fetch=lambda: http_get_json(f"{COMMONS_API}?{urlencode(params)}"),
+        is_empty=lambda d: not (d.get("query") or {}).get("pages"),
+        query_param="ggscoord",
+    )
+    pages = (data.get("query") or {}).get("pages") or {}
 
-        parts = ["Wikimedia Commons", title]
-        if artist:
-            parts.append(f"Artist: {strip_html(artist)}")
-        if license_short:
-            parts.append(f"License: {strip_html(license_short)}")
+    found: list[ImageCandidate] = []
+    for page in sorted(pages.values(), key=lambda pg: pg.get("index", 0)):
+        cand = commons_page_candidate(page)
+        if cand is None:
+            continue
+        cand.distance_m = page_distance_m(page, p.lat, p.lng)
+        found.append(cand)
+    found.sort(key=lambda c: GEO_RADIUS_M if c.distance_m is None else c.distance_m)
+    if TRIGRAMS:
+        TITLE_TRIGRAMS.add(c.title for c in found)
+    return found
 
-        score = token_overlap_score(query_name, title)
-        cand = ImageCandidate(url=url, attribution=" | ".join(parts), source="commons")
-        if best is None or score > best[0]:
-            best = (score, cand)
 
-    return best[1] if best else None
+def commons_search_best_image(query_name: str, query: str) -> Optional[ImageCandidate]:
+    return next(iter(commons_search_candidates(query_name, query)), None)
 
 
-def openverse_search_best_image(query_name: str, query: str) -> Optional[ImageCandidate]:
+def openverse_search_candidates(query_name: str, query: str) -> list[ImageCandidate]:
+    """All usable results for `query`, best match first."""
     base = "https://api.openverse.engineering/v1/images/"
     params = {
         "q": query,
@@ -252,12 +325,15 @@ def openverse_search_best_image(query_name: str, query: str) -> Optional[ImageCa
         # broaden to increase hit rate; still open-licensed/attributed by Openverse
         "license_type": "all",
     }
-    data = http_get_json(f"{base}?{urlencode(params)}")
+    data = SEARCH_CACHE.get_or_fetch(
+        "openverse", query, params,
+        fetch=lambda: http_get_json(f"{base}?{urlencode(params)}"),
+        is_empty=lambda d: not d.get("results"),
+        query_param="q",
+    )
     results = data.get("results") or []
-    if not results:
-        return None
 
-    best: tuple[float, ImageCandidate] | None = None
+    scored: list[tuple[float, ImageCandidate]] = []
     for r in results:
         url = r.get("url") or r.get("thumbnail")
         if not url:
@@ -276,47 +352,21 @@ def openverse_search_best_image(query_name: str, query: str) -> Optional[ImageCa
         if license_:
             parts.append(f"License: {license_}")
 
+        tags = " ".join(str(t.get("name") or "") for t in (r.get("tags") or []) if isinstance(t, dict))
         score = token_overlap_score(query_name, title)
-        cand = ImageCandidate(url=url, attribution=" | ".join(parts), source="openverse")
-        if best is None or score > best[0]:
-            best = (score, cand)
-
-    return best[1] if best else None
-
-
-def parse_places_from_appjs(text: str) -> list[Place]:
-    # Extract all occurrences of: { name: "...", ... category: "..." }
-    # within the known const lists.
-    blocks: list[str] = []
-    for const_name in ["GOLBASI_PLACES", "PHOTOGRAPHERS", "BAKERIES", "FLORISTS"]:
-        m = re.search(rf"const\s+{re.escape(const_name)}\s*=\s*\[(.*?)\];", text, flags=re.DOTALL)
-        if m:
-            blocks.append(m.group(1))
-
-    places: list[Place] = []
-    for b in blocks:
-        for mm in re.finditer(r"\{[^\}]*?name\s*:\s*\"([^\"]+)\"[^\}]*?category\s*:\s*\"([^\"]+)\"[^\}]*?\}", b, flags=re.DOTALL):
-            name = mm.group(1).strip()
-            cat = mm.group(2).strip()
-            if name and cat:
-                places.append(Place(name=name, category=cat))
-
-    # de-dup by normalized key
-    seen: set[str] = set()
-    uniq: list[Place] = []
-    for p in places:
-        k = normalize_place_key(p.name)
-        if k and k not in seen:
-            seen.add(k)
-            uniq.append(p)
+        cand = ImageCandidate(url=url, attribution=" | ".join(parts), source="openverse",
+                              rendition_url=openverse_rendition_url(r),
+                              title=title, description=tags)
+        scored.append((score, cand))
 
-    return uniq
+    return rank_candidates(query_name, scored)
 
 
-def build_queries(name: str, category: str) -> list[str]:
-    base = name.strip()
-    base_norm = normalize_text_for_match(base)
+def openverse_search_best_image(query_name: str, query: str) -> Optional[ImageCandidate]:
+    return next(iter(openverse_search_candidates(query_name, query)), None)
 
+
+def simplify_name(base_norm: str) -> str:
     # remove very common suffixes/prefixes to widen search
     simplified = base_norm
     for w in [
@@ -325,30 +375,314 @@ def build_queries(name: str, category: str) -> list[str]:
         "golbasi", "ankara",
     ]:
         simplified = simplified.replace(w, " ")
-    simplified = re.sub(r"\s+", " ", simplified).strip()
+    return collapse_whitespace(simplified)
+
+
+def _dedup_queries(candidates: list[PlannedQuery]) -> list[PlannedQuery]:
+    out: list[PlannedQuery] = []
+    seen: set[str] = set()
+    for template, q in candidates:
+        q = (q or "").strip()
+        if q and q not in seen:
+            seen.add(q)
+            out.append((template, q))
+    return out
+
+
+def build_queries(name: str, category: str) -> list[PlannedQuery]:
+    """(template id, query) pairs; the ids key the planner's stats (see query_planner.py)."""
+    base = name.strip()
+    base_norm = normalize_text_for_match(base)
+    simplified = simplify_name(base_norm)
 
     # Queries: start specific, then broaden
-    out: list[str] = []
     candidates = [
-        f"intitle:{base}",
-        f'"{base}"',
-        f"{base} Gölbaşı Ankara",
-        f"{base} Golbasi Ankara",
-        f"{base} {category}",
-        f"{base} mekan",
+        ("intitle", f"intitle:{base}"),
+        ("quoted", f'"{base}"'),
+        ("golbasi_tr", f"{base} Gölbaşı Ankara"),
+        ("golbasi_ascii", f"{base} Golbasi Ankara"),
+        ("category", f"{base} {category}"),
+        ("mekan", f"{base} mekan"),
     ]
     if simplified and simplified != base_norm and simplified.lower() != base.lower():
         candidates.extend([
-            f"intitle:{simplified}",
-            f'"{simplified}"',
-            f"{simplified} Golbasi Ankara",
+            ("simplified_intitle", f"intitle:{simplified}"),
+            ("simplified_quoted", f'"{simplified}"'),
+            ("simplified_golbasi", f"{simplified} Golbasi Ankara"),
         ])
+    return _dedup_queries(candidates)
 
-    for q in candidates:
-        q = (q or "").strip()
-        if q and q not in out:
-            out.append(q)
-    return out
+
+def build_rank_queries(name: str) -> list[PlannedQuery]:
+    """The fixed query set pooled for BM25 ranking: the name, the name near Gölbaşı,
+    and the simplified name near Gölbaşı when it differs."""
+    base = name.strip()
+    base_norm = normalize_text_for_match(base)
+    simplified = simplify_name(base_norm)
+    candidates = [("plain", base), ("golbasi_tr", f"{base} Gölbaşı Ankara")]
+    if simplified and simplified != base_norm:
+        candidates.append(("simplified_golbasi", f"{simplified} Golbasi Ankara"))
+    return _dedup_queries(candidates)
+
+
+def iter_candidates(idx: int, total: int, p: Place) -> Iterator[ImageCandidate]:
+    """Candidates for a place in preference order: Commons first, then Openverse.
+
+    RANKING=bm25 pools every result of the fixed query set per provider and
+    yields it best-first (see ranking.pool_is_enough for when pooling stops);
+    RANKING=first yields each query's results in turn. Searches run lazily
+    either way, so Openverse is only queried when no Commons result was accepted.
+    Templates are tried in the planner's order until the provider's QueryBudget
+    runs out; each provider has its own, so Commons misses never use up the
+    Openverse fallback.
+
+    With GEOSEARCH and coordinates on the place, a Commons geosearch around it
+    ("geo" template) joins the Commons pool and nearby photos rank higher.
+    """
+    queries = build_queries(p.name, p.category) if RANKING == "first" else build_rank_queries(p.name)
+    near = p if RANKING != "first" and GEOSEARCH and p.lat is not None and p.lng is not None else None
+    seen: set[str] = set()
+    for provider, search in (("commons", commons_search_candidates), ("openverse", openverse_search_candidates)):
+        pool: list[Tuple[ImageCandidate, Dict[str, str]]] = []
+        budget = QueryBudget()
+        planned = list(queries)
+        if provider == "commons" and near is not None:
+            planned.insert(0, (GEO_TEMPLATE, coord_query(near.lat, near.lng)))
+        for template, q in PLANNER.plan(provider, p.category, planned):
+            if not budget.take():
+                if budget.refused == 1:
+                    print(f"[{idx}/{total}] {provider} query budget ({budget.limit}) used up for '{p.name}'")
+                break
+            try:
+                if template == GEO_TEMPLATE:
+                    found = commons_geosearch_candidates(p)
+                elif provider == "commons":
+                    found = search(p.name, q, near=near)
+                else:
+                    found = search(p.name, q)
+            except Exception as ex:
+                print(f"[{idx}/{total}] {provider} search failed for '{q}': {ex}")
+                continue
+            PLANNER.record_sent(provider, p.category, template, hit=bool(found))
+            for cand in found:
+                if cand.url in seen:
+                    continue
+                seen.add(cand.url)
+                cand.query_template = template
+                if RANKING == "first":
+                    yield cand
+                else:
+                    pool.append((cand, {"title": cand.title, "description": cand.description}))
+            if RANKING != "first" and (pool_is_enough(p.name, [cand.title for cand, _ in pool]) or any(
+                    cand.distance_m is not None and cand.distance_m <= GEO_CLOSE_M for cand, _ in pool)):
+                break
+        fuzzy = TITLE_TRIGRAMS.similarities(p.name) if TRIGRAMS else None
+        near_titles = {cand.title: proximity(cand.distance_m) for cand, _ in pool if cand.distance_m is not None}
+        for ranked in rank(p.name, pool, fuzzy=fuzzy, proximity=near_titles or None):
+            yield ranked.item
+
+
+class CatalogTurns:
+    """Lets each place take its turn in catalog order, however the workers are scheduled.
+
+    `wait(idx)` returns once every place before `idx` has called `done`, so the
+    perceptual-hash claims (which decide who keeps a shared photo) happen in the
+    same order as in a sequential run while searches and downloads still overlap.
+    Places start in catalog order (pool.map), so an earlier place never waits on a later one.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._next = 1
+        self._finished: set[int] = set()
+
+    def wait(self, idx: int) -> None:
+        with self._cond:
+            self._cond.wait_for(lambda: self._next >= idx)
+
+    def done(self, idx: int) -> None:
+        with self._cond:
+            self._finished.add(idx)
+            while self._next in self._finished:
+                self._finished.discard(self._next)
+                self._next += 1
+            self._cond.notify_all()
+
+
+PHASH_TURNS = CatalogTurns()
+
+
+def process_place(idx: int, total: int, p: Place, overrides: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    key = normalize_place_key(p.name)
+    if not key:
+        return None
+
+    if isinstance(overrides, dict) and key in overrides and overrides[key]:
+        override_url = str(overrides[key]).strip()
+        if override_url:
+            try:
+                dl = download_image(override_url, key)
+                content_type = dl.content_type
+                ext = guess_extension(content_type, override_url)
+                stored = store_image(dl, OUT_DIR, key, ext)
+                if stored.key_path:
+                    OUT_INDEX.record(stored.key_path)
+                if PHASH_DEDUP:
+                    PHASH_TURNS.wait(idx)
+                PHASH_INDEX.record(key, stored.key_path or stored.path)
+                rel = stored.path.relative_to(WEB_WWWROOT).as_posix()
+                print(f"[{idx}/{total}] Saved (override) {p.name} -> {stored.path.name}")
+                return key, {
+                    "path": "/" + rel,
+                    "name": p.name,
+                    "category": p.category,
+                    "source": "override",
+                    "attribution": "Provided by overrides",
+                    "contentType": content_type,
+                    "url": override_url,
+                    **stored.manifest_fields(),
+                }
+            except Exception as ex:
+                print(f"[{idx}/{total}] Override download failed for '{p.name}': {ex}")
+
+    existing = OUT_INDEX.find(key)
+    if existing and not FORCE:
+        stored = describe_existing(existing.path, OUT_DIR)
+        rel = stored.path.relative_to(WEB_WWWROOT).as_posix()
+        return key, {
+            "path": "/" + rel,
+            "name": p.name,
+            "category": p.category,
+            "source": "local",
+            "attribution": None,
+            **stored.manifest_fields(),
+        }
+
+    candidate: Optional[ImageCandidate] = None
+    duplicates: list[str] = []
+    for cand in iter_candidates(idx, total, p):
+        candidate = cand
+        phash: Optional[int] = None
+        try:
+            dl = download_image_with_retry(candidate.download_url, key)
+            if PHASH_DEDUP:
+                phash = dhash(dl.temp_path)
+            if phash is not None:
+                PHASH_TURNS.wait(idx)
+                hit = PHASH_INDEX.claim(key, phash)
+                if hit is not None:
+                    dl.discard()
+                    print(f"[{idx}/{total}] Skipped near-duplicate for {p.name}: same photo as '{hit[0]}' (distance {hit[1]})")
+                    duplicates.append(hit[0])
+                    candidate = None
+                    if len(duplicates) >= PHASH_MAX_CANDIDATES:
+                        break
+                    continue
+
+            content_type = dl.content_type
+            ext = guess_extension(content_type, candidate.download_url)
+            stored = store_image(dl, OUT_DIR, key, ext)
+            if stored.key_path:
+                OUT_INDEX.record(stored.key_path)
+            PHASH_INDEX.record(key, stored.key_path or stored.path, phash)
+            PLANNER.record_chosen(candidate.source, p.category, candidate.query_template)
+
+            rel = stored.path.relative_to(WEB_WWWROOT).as_posix()
+            dedup = ", deduplicated" if stored.deduplicated else ""
+            print(f"[{idx}/{total}] Saved {p.name} -> {stored.path.name} ({candidate.source}{dedup})")
+            item: Dict[str, Any] = {
+                "path": "/" + rel,
+                "name": p.name,
+                "category": p.category,
+                "source": candidate.source,
+                "attribution": candidate.attribution,
+                "contentType": content_type,
+                "url": candidate.url,
+            }
+            if candidate.rendition_url:
+                item["renditionUrl"] = candidate.rendition_url
+            item.update(stored.manifest_fields())
+            return key, item
+        except Exception as ex:
+            if phash is not None:
+                PHASH_INDEX.release(key)
+            print(f"[{idx}/{total}] Download failed for '{p.name}': {ex}")
+            return key, {
+                "path": None,
+                "name": p.name,
+                "category": p.category,
+                "source": candidate.source,
+                "attribution": candidate.attribution,
+                "error": str(ex),
+            }
+
+    print(f"[{idx}/{total}] No image found for '{p.name}'")
+    item = {
+        "path": None,
+        "name": p.name,
+        "category": p.category,
+        "source": None,
+        "attribution": None,
+    }
+    if duplicates:
+        item["duplicateOf"] = duplicates
+    return key, item
+
+
+class Checkpointer:
+    """Journals finished places and periodically flushes a partial manifest.
+
+    Checkpoint manifests contain the finished items plus, for places not yet
+    processed, whatever the previous manifest had, so the website keeps showing
+    existing photos while a long run is in progress.
+    """
+
+    def __init__(self, places: list[Place], base_manifest: Dict[str, Any], generated_at: str) -> None:
+        self.places = places
+        self.generated_at = generated_at
+        previous = base_manifest.get("items") if isinstance(base_manifest, dict) else None
+        self.previous: Dict[str, Any] = previous if isinstance(previous, dict) else {}
+        self.journal = ProgressJournal(PROGRESS_PATH)
+        self.resumed: Dict[str, Dict[str, Any]] = {}
+        self.done: Dict[str, Dict[str, Any]] = {}
+        self._since_flush = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if RESUME:
+            # Failed downloads are retried; searches that found nothing are not.
+            self.resumed = {k: v for k, v in self.journal.load().items() if "error" not in v}
+            print(f"Resuming: {len(self.resumed)} places already done")
+        self.journal.open(truncate=not RESUME)
+
+    def record(self, key: str, item: Dict[str, Any]) -> None:
+        self.journal.append(key, item)
+        with self._lock:
+            self.done[key] = item
+            self._since_flush += 1
+            due = (self._since_flush >= CHECKPOINT_EVERY
+                   or time.monotonic() - self._last_flush >= CHECKPOINT_SEC)
+            if not due:
+                return
+            self._since_flush = 0
+            self._last_flush = time.monotonic()
+            self.journal.sync()
+            write_manifest(MANIFEST_PATH, self.snapshot())
+
+    def snapshot(self) -> Dict[str, Any]:
+        items: Dict[str, Any] = {}
+        for p in self.places:
+            key = normalize_place_key(p.name)
+            if not key:
+                continue
+            item = self.done.get(key) or self.previous.get(key)
+            if item is not None:
+                items[key] = item
+        return {"generatedAtUtc": self.generated_at, "items": items}
+
+    def finish(self) -> None:
+        self.journal.close(remove=True)
 
 
 def main() -> int:
@@ -357,11 +691,11 @@ def main() -> int:
     if not APP_JS.exists():
         raise SystemExit(f"app.js not found: {APP_JS}")
 
-    text = APP_JS.read_text(encoding="utf-8")
-    places = parse_places_from_appjs(text)[:LIMIT]
+    places = load_places(APP_JS)[:LIMIT]
 
     print(f"APP_JS={APP_JS}")
     print(f"OUT_DIR={OUT_DIR}")
+    print(f"CONCURRENCY={CONCURRENCY}")
     print(f"Found {len(places)} places")
 
     overrides: Dict[str, Any] = {}
@@ -377,112 +711,58 @@ def main() -> int:
         "items": {}
     }
 
-    for idx, p in enumerate(places, start=1):
-        key = normalize_place_key(p.name)
-        if not key:
-            continue
-
-        if isinstance(overrides, dict) and key in overrides and overrides[key]:
-            override_url = str(overrides[key]).strip()
-            if override_url:
-                try:
-                    img_bytes, content_type = http_get_bytes(override_url)
-                    ext = guess_extension(content_type, override_url)
-                    out_path = OUT_DIR / f"{key}{ext}"
-                    out_path.write_bytes(img_bytes)
-                    rel = out_path.relative_to(WEB_WWWROOT).as_posix()
-                    manifest["items"][key] = {
-                        "path": "/" + rel,
-                        "name": p.name,
-                        "category": p.category,
-                        "source": "override",
-                        "attribution": "Provided by overrides",
-                        "contentType": content_type,
-                        "url": override_url,
-                    }
-                    print(f"[{idx}/{len(places)}] Saved (override) {p.name} -> {out_path.name}")
-                    time.sleep(0.1)
-                    continue
-                except Exception as ex:
-                    print(f"[{idx}/{len(places)}] Override download failed for '{p.name}': {ex}")
+    checkpoints = Checkpointer(places, read_manifest(MANIFEST_PATH) or {}, manifest["generatedAtUtc"])
+    checkpoints.start()
 
-        existing = next(iter(OUT_DIR.glob(f"{key}.*")), None)
-        if existing and not FORCE:
-            rel = existing.relative_to(WEB_WWWROOT).as_posix()
-            manifest["items"][key] = {
-                "path": "/" + rel,
-                "name": p.name,
-                "category": p.category,
-                "source": "local",
-                "attribution": None,
-            }
-            continue
+    if PHASH_DEDUP:
+        print(f"Perceptual index: {PHASH_INDEX.load(OUT_INDEX)}")
 
-        queries = build_queries(p.name, p.category)
-        candidate: Optional[ImageCandidate] = None
-
-        for q in queries:
-            try:
-                candidate = commons_search_best_image(p.name, q)
-                if candidate:
-                    break
-            except Exception as ex:
-                print(f"[{idx}/{len(places)}] commons search failed for '{q}': {ex}")
-
-        if not candidate:
-            for q in queries:
-                try:
-                    candidate = openverse_search_best_image(p.name, q)
-                    if candidate:
-                        break
-                except Exception as ex:
-                    print(f"[{idx}/{len(places)}] openverse search failed for '{q}': {ex}")
-
-        if not candidate:
-            print(f"[{idx}/{len(places)}] No image found for '{p.name}'")
-            manifest["items"][key] = {
-                "path": None,
-                "name": p.name,
-                "category": p.category,
-                "source": None,
-                "attribution": None,
-            }
-            continue
+    total = len(places)
 
+    def run_one(idx: int, p: Place) -> Optional[Tuple[str, Dict[str, Any]]]:
         try:
-            img_bytes, content_type = http_get_bytes_with_retry(candidate.url)
-            ext = guess_extension(content_type, candidate.url)
-
-            out_path = OUT_DIR / f"{key}{ext}"
-            out_path.write_bytes(img_bytes)
-
-            rel = out_path.relative_to(WEB_WWWROOT).as_posix()
-            manifest["items"][key] = {
-                "path": "/" + rel,
-                "name": p.name,
-                "category": p.category,
-                "source": candidate.source,
-                "attribution": candidate.attribution,
-                "contentType": content_type,
-                "url": candidate.url,
-            }
-
-            print(f"[{idx}/{len(places)}] Saved {p.name} -> {out_path.name} ({candidate.source})")
-        except Exception as ex:
-            print(f"[{idx}/{len(places)}] Download failed for '{p.name}': {ex}")
-            manifest["items"][key] = {
-                "path": None,
-                "name": p.name,
-                "category": p.category,
-                "source": candidate.source,
-                "attribution": candidate.attribution,
-                "error": str(ex),
-            }
-
-        time.sleep(SLEEP_SEC)
-
-    MANIFEST_PATH.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+            key = normalize_place_key(p.name)
+            if key in checkpoints.resumed:
+                return key, checkpoints.resumed[key]
+            result = process_place(idx, total, p, overrides)
+            if result is not None:
+                checkpoints.record(*result)
+            return result
+        finally:
+            PHASH_TURNS.done(idx)
+
+    if CONCURRENCY == 1:
+        results = [run_one(idx, p) for idx, p in enumerate(places, start=1)]
+    else:
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            # map() yields in submission order, so the manifest keeps the catalog order
+            # regardless of which worker finishes first.
+            results = list(pool.map(lambda args: run_one(*args), enumerate(places, start=1)))
+
+    for result in results:
+        if result is None:
+            continue
+        key, item = result
+        manifest["items"][key] = item
+
+    if DERIVATIVES:
+        print(f"Derivatives: {build_derivatives(manifest['items'], WEB_WWWROOT, OUT_DIR)}")
+    if PLACEHOLDERS:
+        print(f"Placeholders: {build_placeholders(manifest['items'], WEB_WWWROOT, OUT_DIR)}")
+
+    write_manifest(MANIFEST_PATH, manifest)
+    checkpoints.finish()
+    if PHASH_DEDUP:
+        PHASH_INDEX.save()
+    PLANNER.save()
     print(f"Wrote manifest: {MANIFEST_PATH}")
+    print(f"HTTP: {HTTP.stats.summary()}")
+    if OPTIMIZE:
+        print(f"Optimize: {OPTIMIZE_STATS.summary()}")
+    print(f"Search cache: {SEARCH_CACHE.summary()}")
+    print(f"Query planner: {PLANNER.summary()}")
+    HTTP.close()
+    SEARCH_CACHE.close()
     return 0
 
 
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Find (and with --delete, remove) what the photo directories no longer need.
+
+Live keys:
+  img/place-photos     normalize_place_key of every place in the app.js catalog
+  img/listing-photos   every listing id /api/listings returns. When the Api
+                       cannot be read completely, the ids in the manifest are
+                       used instead, minus the ones .listing_sync.json
+                       records as removed.
+
+Findings:
+  orphan   files nothing live refers to:
+           - `<key>.<ext>` of a key that is not live
+           - objects/ files that are not a live manifest path and not hardlinked
+             to a live key file
+           - variants/ files that are not listed by a live manifest entry
+  temp     leftovers of interrupted writes: `.*.part`, `.*.part.json`, `.*.tmp`,
+           `.*.link`, `.*.opt`, older than GC_MIN_AGE_SEC (so a running fetcher's
+           files are left alone)
+  stale    manifest entries whose key is not live
+  broken   live manifest entries whose `path` file is missing
+
+Reclaimable bytes count a hardlinked file only when every link to it goes.
+The manifest, its published manifest/ files and the tools' hidden state
+files are never deleted.
+
+--delete removes the orphan and temp files, drops stale entries, clears
+the `path` of broken ones (so the fetchers look for a new photo) and forgets
+removed listings in .listing_sync.json. A manifest with an uncompacted
+upload journal is left as is; run the uploader first.
+
+Directories are scanned with os.scandir, GC_WORKERS of them at a time
+(objects/ and variants/ are spread over many subdirectories).
+
+Usage:
+  python tools/gc_images.py             (report only)
+  python tools/gc_images.py --delete
+
+Env vars:
+  WEB_WWWROOT=src/Web/wwwroot
+  API_BASE=http://localhost:8081
+  APP_JS=src/Web/wwwroot/js/app.js
+  GC_MIN_AGE_SEC=3600
+  GC_WORKERS=8
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from http_client import HttpClient
+from image_derivatives import CACHE_NAME as DERIVATIVE_CACHE_NAME, VARIANTS_DIRNAME
+from image_placeholders import CACHE_NAME as PLACEHOLDER_CACHE_NAME
+from image_store import OBJECTS_DIRNAME
+from listing_source import SYNC_STATE_NAME, ListingPages, ListingSyncState
+from manifest_io import manifest_journal_path, read_manifest
+from manifest_publish import PUBLISH_DIRNAME, write_manifest
+from optimize_images import STATE_NAME as OPTIMIZE_STATE_NAME
+from perceptual_hash import INDEX_NAME as PHASH_INDEX_NAME
+from place_catalog import load_places
+from text_norm import normalize_place_key
+
+WEB_WWWROOT = Path(os.environ.get("WEB_WWWROOT", "src/Web/wwwroot")).resolve()
+API_BASE = os.environ.get("API_BASE", "http://localhost:8081").rstrip("/")
+GC_MIN_AGE_SEC = float(os.environ.get("GC_MIN_AGE_SEC", "3600"))
+GC_WORKERS = max(1, int(os.environ.get("GC_WORKERS", "8")))
+
+PLACE_DIR = WEB_WWWROOT / "img" / "place-photos"
+LISTING_DIR = WEB_WWWROOT / "img" / "listing-photos"
+
+TEMP_RE = re.compile(r"^\..+\.(part|part\.json|tmp|link|opt)$")
+STATE_FILES = {
+    "manifest.json", "manifest.json.corrupt", PLACEHOLDER_CACHE_NAME, DERIVATIVE_CACHE_NAME, OPTIMIZE_STATE_NAME,
+    PHASH_INDEX_NAME, SYNC_STATE_NAME,
+}
+
+
+@dataclass(frozen=True)
+class ScannedFile:
+    path: str
+    # Relative to the scanned root, "/"-separated.
+    rel: str
+    size: int
+    mtime: float
+    inode: Tuple[int, int]
+    nlink: int
+
+
+@dataclass
+class GcReport:
+    root: Path
+    orphans: List[ScannedFile] = field(default_factory=list)
+    temp: List[ScannedFile] = field(default_factory=list)
+    stale: List[str] = field(default_factory=list)
+    broken: List[str] = field(default_factory=list)
+    reclaimable: int = 0
+
+    def summary(self) -> str:
+        return (f"{len(self.orphans)} orphan files, {len(self.temp)} temp files, "
+                f"{len(self.stale)} stale entries, {len(self.broken)} broken entries, "
+                f"{self.reclaimable} bytes reclaimable")
+
+
+def _scan_dir(root: str, rel: str) -> Tuple[List[ScannedFile], List[Tuple[str, str]]]:
+    files: List[ScannedFile] = []
+    subdirs: List[Tuple[str, str]] = []
+    try:
+        with os.scandir(os.path.join(root, rel) if rel else root) as it:
+            for entry in it:
+                entry_rel = f"{rel}/{entry.name}" if rel else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append((root, entry_rel))
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        files.append(ScannedFile(entry.path, entry_rel, st.st_size, st.st_mtime,
+                                                 (st.st_dev, st.st_ino), st.st_nlink))
+                except OSError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return files, subdirs
+
+
+def scan_tree(root: Path, workers: int = GC_WORKERS) -> List[ScannedFile]:
+    """Every regular file under `root`, scanning up to `workers` directories at once."""
+    out: List[ScannedFile] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = [pool.submit(_scan_dir, str(root), "")]
+        while pending:
+            files, subdirs = pending.pop().result()
+            out.extend(files)
+            pending.extend(pool.submit(_scan_dir, *d) for d in subdirs)
+    out.sort(key=lambda f: f.rel)
+    return out
+
+
+def place_keys() -> Set[str]:
+    return {k for k in (normalize_place_key(p.name) for p in load_places()) if k}
+
+
+def api_listing_ids(http: HttpClient) -> Optional[Set[str]]:
+    """Every listing id, or None when the Api cannot show it sent the whole catalog."""
+    try:
+        source = ListingPages(http, API_BASE)
+        ids = {str(l.get("id") or l.get("Id") or "").strip() for l in source if isinstance(l, dict)} - {""}
+    except Exception as ex:
+        print(f"/api/listings unavailable ({ex})")
+        return None
+    return ids if source.complete else None
+
+
+def _manifest_items(manifest_path: Path) -> Optional[Dict[str, Any]]:
+    """The manifest's items; {} without a manifest, None when it cannot be read."""
+    if not manifest_path.exists() and not manifest_journal_path(manifest_path).exists():
+        return {}
+    manifest = read_manifest(manifest_path)
+    if isinstance(manifest, dict) and isinstance(manifest.get("items"), dict):
+        return manifest["items"]
+    return None
+
+
+def _web_path(src: Any) -> Optional[str]:
+    """Absolute file path of a `/img/...` manifest URL."""
+    if not isinstance(src, str) or not src.startswith("/"):
+        return None
+    return os.path.normpath(os.path.join(WEB_WWWROOT, src.lstrip("/")))
+
+
+def collect(root: Path, live_keys: Set[str], items: Dict[str, Any], now: Optional[float] = None) -> GcReport:
+    report = GcReport(root)
+    now = time.time() if now is None else now
+    files = scan_tree(root)
+
+    referenced: Set[str] = set()
+    for key, item in items.items():
+        if not isinstance(item, dict):
+            continue
+        if key not in live_keys:
+            report.stale.append(key)
+            continue
+        path = _web_path(item.get("path"))
+        if path is not None:
+            referenced.add(path)
+            if not os.path.isfile(path):
+                report.broken.append(key)
+        for v in item.get("variants") or []:
+            src = _web_path(v.get("src")) if isinstance(v, dict) else None
+            if src is not None:
+                referenced.add(src)
+
+    def is_key_file(f: ScannedFile) -> bool:
+        return "/" not in f.rel and not f.rel.startswith(".") and "." in f.rel
+
+    live_inodes = {f.inode for f in files if is_key_file(f) and f.rel.split(".", 1)[0] in live_keys}
+    for f in files:
+        name = f.rel.rsplit("/", 1)[-1]
+        if TEMP_RE.match(name):
+            if now - f.mtime >= GC_MIN_AGE_SEC:
+                report.temp.append(f)
+            continue
+        top = f.rel.split("/", 1)[0]
+        if name in STATE_FILES or top == PUBLISH_DIRNAME or name.startswith("."):
+            continue
+        if f.path in referenced or f.inode in live_inodes:
+            continue
+        if is_key_file(f) or top in (OBJECTS_DIRNAME, VARIANTS_DIRNAME):
+            report.orphans.append(f)
+
+    # Bytes come back only when the last link to an inode is deleted.
+    doomed: Dict[Tuple[int, int], List[ScannedFile]] = {}
+    for f in report.orphans + report.temp:
+        doomed.setdefault(f.inode, []).append(f)
+    report.reclaimable = sum(fs[0].size for fs in doomed.values() if len(fs) >= fs[0].nlink)
+    return report
+
+
+def apply(report: GcReport, manifest_path: Path, live_keys: Set[str]) -> None:
+    for f in report.orphans + report.temp:
+        try:
+            os.unlink(f.path)
+        except FileNotFoundError:
+            pass
+        except OSError as ex:
+            print(f"  could not delete {f.rel}: {ex}")
+    for sub in (OBJECTS_DIRNAME, VARIANTS_DIRNAME):
+        base = report.root / sub
+        if base.is_dir():
+            for d in sorted((p for p in base.rglob("*") if p.is_dir()), reverse=True):
+                try:
+                    d.rmdir()
+                except OSError:
+                    pass
+
+    if report.stale or report.broken:
+        if manifest_journal_path(manifest_path).exists():
+            print(f"  {manifest_path.name}: upload journal pending, entries left as is")
+        else:
+            manifest = read_manifest(manifest_path)
+            for key in report.stale:
+                manifest["items"].pop(key, None)
+            for key in report.broken:
+                item = manifest["items"].get(key)
+                if isinstance(item, dict):
+                    item["path"] = None
+            write_manifest(manifest_path, manifest)
+
+    if (report.root / SYNC_STATE_NAME).exists():
+        state = ListingSyncState.load(report.root)
+        # Their files went with the orphans; ids that came back are live again.
+        if state.removed:
+            state.removed = {k: v for k, v in state.removed.items() if k in live_keys}
+            state.save()
+
+
+def main(argv: List[str]) -> int:
+    delete = "--delete" in argv
+    unknown = [a for a in argv if a != "--delete"]
+    if unknown:
+        print(f"Unknown arguments: {' '.join(unknown)}")
+        return 2
+
+    targets: List[Tuple[Path, Set[str]]] = []
+    if PLACE_DIR.is_dir():
+        targets.append((PLACE_DIR, place_keys()))
+    if LISTING_DIR.is_dir():
+        http = HttpClient("MekanBudurImageGc/1.0 (+local dev script)")
+        ids = api_listing_ids(http)
+        http.close()
+        if ids is None:
+            state = ListingSyncState.load(LISTING_DIR)
+            ids = set(_manifest_items(LISTING_DIR / "manifest.json") or {}) - set(state.removed)
+            print(f"Listing ids taken from the manifest ({len(ids)})")
+        targets.append((LISTING_DIR, ids))
+
+    total = 0
+    for root, live in targets:
+        manifest_path = root / "manifest.json"
+        items = _manifest_items(manifest_path)
+        if items is None:
+            # Every object and variant would look unreferenced.
+            print(f"{root}: manifest.json cannot be read, skipped")
+            continue
+        report = collect(root, live, items)
+        print(f"{root}: {report.summary()}")
+        for f in report.orphans:
+            print(f"  orphan  {f.rel} ({f.size} bytes)")
+        for f in report.temp:
+            print(f"  temp    {f.rel} ({f.size} bytes)")
+        for key in report.stale:
+            print(f"  stale   {key}")
+        for key in report.broken:
+            print(f"  broken  {key} -> {items[key].get('path')}")
+        total += report.reclaimable
+        if delete:
+            apply(report, manifest_path, live)
+
+    print(f"{'Reclaimed' if delete else 'Reclaimable'}: {total} bytes" + ("" if delete else " (run with --delete)"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
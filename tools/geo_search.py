@@ -0,0 +1,78 @@
+"""Coordinate-based image lookup for places with a known location.
+
+Most catalog entries in app.js carry `lat`/`lng`. Commons can list the files
+taken (or showing something) around a point: `generator=geosearch` in the
+File namespace. For a venue with any photo on Commons that is one request,
+where name queries often take a chain of them.
+
+Geosearch results are pooled with the Commons text results and ranked
+together (ranking.py). A result's distance from the venue adds
+`RANK_GEO_WEIGHT * proximity` to its score. Proximity falls linearly from 1
+at the venue to 0 at GEO_RADIUS_M. Text results get the same boost when
+Commons knows where they were taken. A geosearch result within GEO_CLOSE_M
+of the venue ends pooling by itself, so close matches cost no name queries.
+
+Only used with RANKING=bm25; RANKING=first keeps the name queries alone.
+
+Env vars:
+  GEOSEARCH=1           (0 = name queries only)
+  GEO_RADIUS_M=300      (search radius; Commons allows 10..10000)
+  GEO_CLOSE_M=50        (a result this close stops further queries)
+  GEO_LIMIT=20          (results per geosearch)
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Any, Dict, Optional
+
+GEOSEARCH = os.environ.get("GEOSEARCH", "1") == "1"
+GEO_RADIUS_M = min(10000, max(10, int(os.environ.get("GEO_RADIUS_M", "300"))))
+GEO_CLOSE_M = float(os.environ.get("GEO_CLOSE_M", "50"))
+GEO_LIMIT = int(os.environ.get("GEO_LIMIT", "20"))
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def proximity(distance_m: float, radius_m: float = GEO_RADIUS_M) -> float:
+    """1 at the venue, 0 at `radius_m` and beyond."""
+    return max(0.0, 1.0 - distance_m / radius_m)
+
+
+def coord_query(lat: float, lng: float) -> str:
+    # ~10 cm resolution; keeps cache keys stable across float formatting.
+    return f"{lat:.6f}|{lng:.6f}"
+
+
+def geosearch_params(lat: float, lng: float, radius_m: int = GEO_RADIUS_M, limit: int = GEO_LIMIT) -> Dict[str, str]:
+    return {
+        "action": "query",
+        "format": "json",
+        "generator": "geosearch",
+        "ggsnamespace": "6",
+        "ggscoord": coord_query(lat, lng),
+        "ggsradius": str(radius_m),
+        "ggslimit": str(limit),
+        "prop": "imageinfo|coordinates",
+        # Without it Commons returns coordinates for only the first 10 pages.
+        "colimit": "max",
+        "iiprop": "url|mime|extmetadata",
+    }
+
+
+def page_distance_m(page: Dict[str, Any], lat: float, lng: float) -> Optional[float]:
+    """Distance from (lat, lng) to a Commons page's primary coordinates, if it has any."""
+    for c in page.get("coordinates") or []:
+        try:
+            return haversine_m(lat, lng, float(c["lat"]), float(c["lon"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
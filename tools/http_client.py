@@ -0,0 +1,256 @@
+"""Small pooled HTTP client shared by the tools/ scripts.
+
+`urllib.request.urlopen` opens a new TCP+TLS connection for every call. The
+fetchers issue hundreds of Commons/Openverse API calls against the same two or
+three hosts, so this client keeps idle keep-alive connections per
+(scheme, host, port) and hands them back out for the next request.
+
+- GET only (that is all the tools need), redirects followed manually
+- gzip/deflate responses are decoded transparently
+- HTTP errors are raised as urllib.error.HTTPError so existing retry code keeps working
+- `stats` counts connections opened vs reused
+
+System proxy settings are not honoured (unlike urlopen).
+"""
+
+from __future__ import annotations
+
+import http.client
+import io
+import json
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlsplit
+
+REDIRECT_CODES = {301, 302, 303, 307, 308}
+
+# Errors that mean an idle keep-alive connection was closed by the server.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+    ConnectionAbortedError,
+)
+
+PoolKey = Tuple[str, str, int]
+
+
+@dataclass
+class HttpStats:
+    requests: int = 0
+    opened: int = 0
+    reused: int = 0
+    redirects: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def bump(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def summary(self) -> str:
+        return f"requests={self.requests} connections opened={self.opened} reused={self.reused} redirects={self.redirects}"
+
+
+class HttpResponse:
+    """A response bound to a pooled connection.
+
+    The connection goes back to the pool once the body has been read to the end
+    and closed; a response closed early discards its connection instead.
+    """
+
+    def __init__(self, client: "HttpClient", key: PoolKey, conn: http.client.HTTPConnection,
+                 resp: http.client.HTTPResponse, url: str) -> None:
+        self._client = client
+        self._key = key
+        self._conn: Optional[http.client.HTTPConnection] = conn
+        self._resp = resp
+        self.url = url
+        self.status = resp.status
+        self.reason = resp.reason
+        self.headers = resp.headers
+
+        encoding = (resp.headers.get("Content-Encoding") or "").strip().lower()
+        self._decoder = None
+        if encoding in ("gzip", "x-gzip"):
+            self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self._decoder = _DeflateDecoder()
+        self._buffer = b""
+        self._eof = False
+
+    def _read_raw(self, amt: Optional[int]) -> bytes:
+        if self._eof:
+            return b""
+        data = self._resp.read(amt) if amt is not None else self._resp.read()
+        if not data or amt is None:
+            self._eof = True
+        return data
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        if self._decoder is None:
+            return self._read_raw(amt)
+
+        if amt is None:
+            out = self._buffer + self._decoder.decompress(self._read_raw(None)) + self._decoder.flush()
+            self._buffer = b""
+            return out
+
+        while len(self._buffer) < amt and not self._eof:
+            raw = self._read_raw(amt)
+            self._buffer += self._decoder.decompress(raw) if raw else self._decoder.flush()
+        out, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return out
+
+    def iter_chunks(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        reusable = self._resp.isclosed() and not self._resp.will_close
+        if not reusable:
+            self._resp.close()
+        self._client._release(self._key, conn, reusable)
+
+    def __enter__(self) -> "HttpResponse":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class _DeflateDecoder:
+    # "deflate" is supposed to be zlib-wrapped, but some servers send raw deflate.
+    def __init__(self) -> None:
+        self._obj = zlib.decompressobj(zlib.MAX_WBITS)
+        self._started = False
+
+    def decompress(self, data: bytes) -> bytes:
+        if not self._started and data:
+            self._started = True
+            try:
+                return self._obj.decompress(data)
+            except zlib.error:
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._obj.decompress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+class HttpClient:
+    def __init__(self, user_agent: str, limiter: Any = None, max_idle_per_host: int = 8,
+                 max_redirects: int = 5) -> None:
+        self.user_agent = user_agent
+        self.limiter = limiter
+        self.max_idle_per_host = max_idle_per_host
+        self.max_redirects = max_redirects
+        self.stats = HttpStats()
+        self._idle: Dict[PoolKey, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key: PoolKey, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return conn, False
+
+    def _release(self, key: PoolKey, conn: http.client.HTTPConnection, reusable: bool) -> None:
+        if reusable:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle_per_host:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._idle = self._idle, {}
+        for conns in pools.values():
+            for conn in conns:
+                conn.close()
+
+    def _send_once(self, url: str, headers: Dict[str, str], timeout: float) -> HttpResponse:
+        parts = urlsplit(url)
+        scheme = (parts.scheme or "http").lower()
+        if scheme not in ("http", "https"):
+            raise URLError(f"unsupported URL scheme: {url}")
+        port = parts.port or (443 if scheme == "https" else 80)
+        key: PoolKey = (scheme, parts.hostname or "", port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        if self.limiter is not None:
+            self.limiter.acquire(url)
+
+        for attempt in range(2):
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                # A reused idle connection may have been closed by the server; retry once on a fresh one.
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            self.stats.bump("reused" if reused else "opened")
+            self.stats.bump("requests")
+            return HttpResponse(self, key, conn, resp, url)
+        raise AssertionError("unreachable")
+
+    def open(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 30,
+             accept_encoding: str = "gzip, deflate") -> HttpResponse:
+        """GET `url` and return the (not yet read) response. Use as a context manager."""
+        all_headers = {"User-Agent": self.user_agent, "Accept-Encoding": accept_encoding}
+        all_headers.update(headers or {})
+
+        for _ in range(self.max_redirects + 1):
+            resp = self._send_once(url, all_headers, timeout)
+            if resp.status in REDIRECT_CODES and resp.headers.get("Location"):
+                location = urljoin(url, resp.headers["Location"])
+                resp.read()
+                resp.close()
+                self.stats.bump("redirects")
+                url = location
+                continue
+            if resp.status >= 400:
+                body = resp.read()
+                resp.close()
+                raise HTTPError(url, resp.status, resp.reason, resp.headers, io.BytesIO(body))
+            return resp
+        raise URLError(f"too many redirects: {url}")
+
+    def get_bytes(self, url: str, timeout: float = 30, headers: Optional[Dict[str, str]] = None) -> Tuple[bytes, str]:
+        with self.open(url, headers=headers, timeout=timeout) as resp:
+            content_type = resp.headers.get("Content-Type", "application/octet-stream")
+            return resp.read(), content_type
+
+    def get_json(self, url: str, timeout: float = 30) -> Any:
+        data, _ = self.get_bytes(url, timeout=timeout, headers={"Accept": "application/json"})
+        return json.loads(data.decode("utf-8"))
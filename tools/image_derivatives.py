@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Resized, modern-format derivatives for the stored place/listing photos.
+
+The site shows the fetched photos as small cards, but the files on disk are
+whatever the source served (often multi-megabyte JPEG/PNG). This stage writes
+resized variants next to them and lists them in the manifest:
+
+  img/place-photos/variants/<sha16>-<width>.webp   (+ .avif when supported)
+
+and adds to every manifest item that has a photo:
+
+  "variants": [{"src": "/img/place-photos/variants/...", "width": 640, "height": 360, "type": "image/webp"}, ...]
+  "variantsSourceSha256": "<sha256 of the source file>", "variantsSourceBytes": <size>
+
+Variants are named by the source content hash, so venues sharing one photo
+share its variants. Which variants a hash has is cached in a hidden
+`.variants.json` next to the photos (like `.placeholders.json`, with per-file
+size/mtime so unchanged files are not re-hashed); the fetchers rebuild their
+items on every run, so this cache, not the manifest, is what lets unchanged
+sources be skipped. Work runs on a ProcessPoolExecutor sized to the CPU count.
+Requires Pillow; AVIF output needs a Pillow build with AVIF support (or the
+pillow-avif-plugin package).
+
+Usage:
+  python tools/image_derivatives.py                 (both manifests)
+  python tools/image_derivatives.py path/to/manifest.json
+
+Env vars:
+  WEB_WWWROOT=src/Web/wwwroot
+  DERIVATIVE_WIDTHS=320,640,1024
+  DERIVATIVE_QUALITY=80
+  DERIVATIVES=0   (fetchers/uploader: 1 = run this stage before writing the manifest)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # optional dependency
+    Image = None  # type: ignore[assignment]
+
+try:
+    import pillow_avif  # registers the AVIF plugin on older Pillow
+except ImportError:  # optional dependency
+    pillow_avif = None
+
+from manifest_io import ContentHashCache, discard_manifest_journal, item_source_file, manifest_journal_path, read_manifest
+from manifest_publish import write_manifest
+
+WEB_WWWROOT = Path(os.environ.get("WEB_WWWROOT", "src/Web/wwwroot")).resolve()
+DERIVATIVES = os.environ.get("DERIVATIVES", "0") == "1"
+DERIVATIVE_WIDTHS = [int(w) for w in os.environ.get("DERIVATIVE_WIDTHS", "320,640,1024").split(",") if w.strip()]
+DERIVATIVE_QUALITY = int(os.environ.get("DERIVATIVE_QUALITY", "80"))
+VARIANTS_DIRNAME = "variants"
+CACHE_NAME = ".variants.json"
+VARIANT_FIELDS = ("variants", "variantsSourceSha256", "variantsSourceBytes")
+
+MIME_BY_FORMAT = {"webp": "image/webp", "avif": "image/avif"}
+
+
+def available_formats() -> List[str]:
+    if Image is None:
+        return []
+    formats = []
+    if features.check("webp"):
+        formats.append("webp")
+    if _avif_supported():
+        formats.append("avif")
+    return formats
+
+
+def _avif_supported() -> bool:
+    # Recent Pillow builds can include AVIF themselves; older ones only have it through pillow_avif.
+    return pillow_avif is not None or ".avif" in Image.registered_extensions()
+
+
+def target_widths(source_width: int, widths: List[int]) -> List[int]:
+    # Never upscale; a source smaller than every width still gets one variant at its own size.
+    out = sorted({w for w in widths if w < source_width})
+    if not out or max(widths) >= source_width:
+        out.append(source_width)
+    return sorted(set(out))
+
+
+def render_variants(src: str, sha: str, variants_dir: str, widths: List[int], formats: List[str],
+                    quality: int) -> List[Dict[str, Any]]:
+    """Worker: the variants of one source file with content hash `sha`. Existing variant files are reused."""
+    src_path = Path(src)
+    out_dir = Path(variants_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    variants: List[Dict[str, Any]] = []
+    with Image.open(src_path) as im:
+        im = ImageOps.exif_transpose(im)
+        src_w, src_h = im.size
+        for w in target_widths(src_w, widths):
+            h = max(1, round(src_h * w / src_w))
+            resized = None
+            for fmt in formats:
+                dest = out_dir / f"{sha[:16]}-{w}.{fmt}"
+                if not dest.exists():
+                    if resized is None:
+                        resized = im.convert("RGBA" if im.mode in ("RGBA", "LA", "P") else "RGB")
+                        if w != src_w:
+                            resized = resized.resize((w, h), Image.LANCZOS)
+                    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+                    resized.save(tmp, format=fmt.upper(), quality=quality)
+                    os.replace(tmp, dest)
+                variants.append({"file": str(dest), "width": w, "height": h, "type": MIME_BY_FORMAT[fmt]})
+    return variants
+
+
+def _variants_present(variants: List[Dict[str, Any]], web_root: Path) -> bool:
+    return bool(variants) and all(
+        isinstance(v, dict) and (web_root / str(v.get("src", "")).lstrip("/")).is_file() for v in variants)
+
+
+def _apply(item: Dict[str, Any], sha: str, src: Path, variants: List[Dict[str, Any]]) -> None:
+    item["variants"] = [dict(v) for v in variants]
+    item["variantsSourceSha256"] = sha
+    item["variantsSourceBytes"] = src.stat().st_size
+
+
+class DerivativeCache(ContentHashCache):
+    """sha256 -> {"widths", "formats", "quality", "variants"}, in `.variants.json`."""
+
+    def __init__(self, out_dir: Path) -> None:
+        super().__init__(out_dir, CACHE_NAME, "sources")
+
+    def variants_for(self, sha: str, settings: Dict[str, Any], web_root: Path) -> Optional[List[Dict[str, Any]]]:
+        """Cached variants of `sha`, when made with the same settings and all still on disk."""
+        entry = self.entries.get(sha)
+        if not isinstance(entry, dict) or any(entry.get(k) != v for k, v in settings.items()):
+            return None
+        variants = entry.get("variants")
+        return variants if isinstance(variants, list) and _variants_present(variants, web_root) else None
+
+
+def build_derivatives(items: Dict[str, Any], web_root: Path, out_dir: Path, widths: Optional[List[int]] = None,
+                      workers: Optional[int] = None, prune: bool = True) -> Dict[str, int]:
+    """Add `variants` to every item with a photo. Mutates `items`; returns counters."""
+    stats = {"rendered": 0, "skipped": 0, "failed": 0}
+    formats = available_formats()
+    if not formats:
+        print("Derivatives: Pillow with WebP support is not installed; skipping (pip install Pillow).")
+        return stats
+
+    widths = widths or DERIVATIVE_WIDTHS
+    settings = {"widths": sorted(widths), "formats": formats, "quality": DERIVATIVE_QUALITY}
+    variants_dir = out_dir / VARIANTS_DIRNAME
+    cache = DerivativeCache(out_dir)
+    live: set = set()
+    # sha256 -> (source file, keys of the items showing it)
+    jobs: Dict[str, Tuple[Path, List[str]]] = {}
+    for key, item in items.items():
+        if not isinstance(item, dict):
+            continue
+        src = item_source_file(item, web_root)
+        if src is None:
+            for field in VARIANT_FIELDS:
+                item.pop(field, None)
+            continue
+        try:
+            sha = cache.sha256_of(src)
+        except OSError as ex:
+            print(f"Derivatives failed for '{key}': {ex}")
+            stats["failed"] += 1
+            continue
+        live.add(sha)
+        if sha in jobs:
+            jobs[sha][1].append(key)
+            continue
+        variants = cache.variants_for(sha, settings, web_root)
+        if variants is not None:
+            _apply(item, sha, src, variants)
+            stats["skipped"] += 1
+            continue
+        jobs[sha] = (src, [key])
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            futures = {
+                sha: pool.submit(render_variants, str(src), sha, str(variants_dir), widths, formats, DERIVATIVE_QUALITY)
+                for sha, (src, _) in jobs.items()
+            }
+            for sha, fut in futures.items():
+                src, keys = jobs[sha]
+                try:
+                    rendered = fut.result()
+                except Exception as ex:
+                    print(f"Derivatives failed for '{keys[0]}': {ex}")
+                    stats["failed"] += len(keys)
+                    continue
+                variants = [
+                    {
+                        "src": "/" + Path(v["file"]).relative_to(web_root).as_posix(),
+                        "width": v["width"],
+                        "height": v["height"],
+                        "type": v["type"],
+                    }
+                    for v in rendered
+                ]
+                cache.entries[sha] = {**settings, "variants": variants}
+                cache.dirty = True
+                for key in keys:
+                    _apply(items[key], sha, src, variants)
+                stats["rendered"] += len(keys)
+
+    cache.save(live if prune else None)
+    return stats
+
+
+def main(argv: List[str]) -> int:
+    manifests = [Path(a).resolve() for a in argv] or [
+        WEB_WWWROOT / "img" / "place-photos" / "manifest.json",
+        WEB_WWWROOT / "img" / "listing-photos" / "manifest.json",
+    ]
+    for manifest_path in manifests:
+        if not manifest_path.exists() and not manifest_journal_path(manifest_path).exists():
+            continue
+        # Only a journal so far: ManifestJournal writes a trailing newline.
+        raw = manifest_path.read_text(encoding="utf-8") if manifest_path.exists() else "\n"
+        # Uploads still in the uploader's journal are items too; the rewrite must keep them.
+        manifest = read_manifest(manifest_path)
+        if not isinstance(manifest, dict) or not isinstance(manifest.get("items"), dict):
+            print(f"Skipping {manifest_path}: not a manifest")
+            continue
+        stats = build_derivatives(manifest["items"], WEB_WWWROOT, manifest_path.parent)
+        write_manifest(manifest_path, manifest, trailing_newline=raw.endswith("\n"))
+        discard_manifest_journal(manifest_path)
+        print(f"{manifest_path}: {stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Inline placeholders (LQIP) and intrinsic sizes for the stored place/listing photos.
+
+For every manifest item with a photo this adds:
+
+  "width": 1600, "height": 900,            (display size, EXIF orientation applied)
+  "lqip": "data:image/webp;base64,...",     (~16px wide blurred thumbnail, a few hundred bytes)
+  "lqipSourceSha256": "<sha256 of the photo>"
+
+so the site can paint a blurred preview and reserve the right aspect ratio
+before the photo arrives. A base64 thumbnail is used instead of BlurHash
+because browsers decode it natively (no JS decoder on the page).
+
+Results are cached by content hash in a hidden `.placeholders.json` next to the
+photos; per-file size/mtime are cached too, so unchanged files are neither
+decoded nor re-hashed. A placeholder is only recomputed when the photo's hash
+changes. Requires Pillow; without it items are left unchanged.
+
+Usage:
+  python tools/image_placeholders.py                 (both manifests)
+  python tools/image_placeholders.py path/to/manifest.json
+
+Env vars:
+  WEB_WWWROOT=src/Web/wwwroot
+  PLACEHOLDERS=1   (fetchers/uploader: 0 = do not add placeholders)
+  LQIP_WIDTH=16
+"""
+
+from __future__ import annotations
+
+import base64
+import io
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+try:
+    from PIL import Image, ImageFilter, ImageOps, features
+except ImportError:  # optional dependency
+    Image = None  # type: ignore[assignment]
+
+from manifest_io import ContentHashCache, discard_manifest_journal, item_source_file, manifest_journal_path, read_manifest
+from manifest_publish import write_manifest
+
+WEB_WWWROOT = Path(os.environ.get("WEB_WWWROOT", "src/Web/wwwroot")).resolve()
+PLACEHOLDERS = os.environ.get("PLACEHOLDERS", "1") == "1"
+LQIP_WIDTH = int(os.environ.get("LQIP_WIDTH", "16"))
+CACHE_NAME = ".placeholders.json"
+PLACEHOLDER_FIELDS = ("width", "height", "lqip", "lqipSourceSha256")
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def compute_placeholder(path: Path, lqip_width: int = LQIP_WIDTH) -> Dict[str, Any]:
+    with Image.open(path) as im:
+        # Header size, before draft() lets the JPEG decoder downscale.
+        width, height = im.size
+        if im.getexif().get(0x0112, 1) in (5, 6, 7, 8):  # orientations that swap the axes
+            width, height = height, width
+        im.draft("RGB", (lqip_width * 8, lqip_width * 8))
+        im = ImageOps.exif_transpose(im).convert("RGB")
+        h = max(1, round(lqip_width * height / width))
+        thumb = im.resize((lqip_width, h), Image.BILINEAR).filter(ImageFilter.GaussianBlur(0.6))
+
+    buf = io.BytesIO()
+    if features.check("webp"):
+        thumb.save(buf, format="WEBP", quality=30)
+        mime = "image/webp"
+    else:
+        thumb.save(buf, format="JPEG", quality=40, optimize=True)
+        mime = "image/jpeg"
+    return {
+        "width": width,
+        "height": height,
+        "lqip": f"data:{mime};base64," + base64.b64encode(buf.getvalue()).decode("ascii"),
+    }
+
+
+class PlaceholderCache(ContentHashCache):
+    """sha256 -> {"width", "height", "lqip"}, in `.placeholders.json`."""
+
+    def __init__(self, out_dir: Path) -> None:
+        super().__init__(out_dir, CACHE_NAME, "placeholders")
+
+
+def build_placeholders(items: Dict[str, Any], web_root: Path, out_dir: Path, prune: bool = True) -> Dict[str, int]:
+    """Add width/height/lqip to every item with a photo. Mutates `items`; returns counters."""
+    stats = {"computed": 0, "cached": 0, "failed": 0}
+    if Image is None:
+        print("Placeholders: Pillow is not installed; skipping (pip install Pillow).")
+        return stats
+
+    cache = PlaceholderCache(out_dir)
+    live: set = set()
+    for key, item in items.items():
+        if not isinstance(item, dict):
+            continue
+        src = item_source_file(item, web_root)
+        if src is None:
+            for field in PLACEHOLDER_FIELDS:
+                item.pop(field, None)
+            continue
+        try:
+            sha = cache.sha256_of(src)
+            live.add(sha)
+            placeholder = cache.entries.get(sha)
+            if placeholder is None:
+                placeholder = compute_placeholder(src)
+                cache.entries[sha] = placeholder
+                cache.dirty = True
+                stats["computed"] += 1
+            else:
+                stats["cached"] += 1
+        except Exception as ex:
+            print(f"Placeholder failed for '{key}': {ex}")
+            stats["failed"] += 1
+            continue
+        item.update(placeholder)
+        item["lqipSourceSha256"] = sha
+
+    cache.save(live if prune else None)
+    return stats
+
+
+def main(argv: List[str]) -> int:
+    manifests = [Path(a).resolve() for a in argv] or [
+        WEB_WWWROOT / "img" / "place-photos" / "manifest.json",
+        WEB_WWWROOT / "img" / "listing-photos" / "manifest.json",
+    ]
+    for manifest_path in manifests:
+        if not manifest_path.exists() and not manifest_journal_path(manifest_path).exists():
+            continue
+        # Only a journal so far: ManifestJournal writes a trailing newline.
+        raw = manifest_path.read_text(encoding="utf-8") if manifest_path.exists() else "\n"
+        # Uploads still in the uploader's journal are items too; the rewrite must keep them.
+        manifest = read_manifest(manifest_path)
+        if not isinstance(manifest, dict) or not isinstance(manifest.get("items"), dict):
+            print(f"Skipping {manifest_path}: not a manifest")
+            continue
+        stats = build_placeholders(manifest["items"], WEB_WWWROOT, manifest_path.parent)
+        write_manifest(manifest_path, manifest, trailing_newline=raw.endswith("\n"))
+        discard_manifest_journal(manifest_path)
+        print(f"{manifest_path}: {stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
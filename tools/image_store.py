@@ -0,0 +1,98 @@
+"""Where downloaded images end up: plain `<key>.<ext>` files or a content-addressed store.
+
+Default: the finished download is renamed to `<key>.<ext>`, as before.
+
+CAS=1: every image is stored once under its SHA-256 digest,
+`objects/<aa>/<sha256>.<ext>`, and `<key>.<ext>` becomes a hardlink to that
+object. Venues that got the same photo share one file on disk, and the
+manifest points them at the same object URL so a CDN caches it once. If the
+filesystem cannot hardlink, only the object is kept and the manifest path is
+the only pointer.
+
+Env vars:
+  CAS=0  (1 = content-addressed storage)
+"""
+
+from __future__ import annotations
+
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from downloads import Download
+from manifest_io import file_sha256
+
+CAS = os.environ.get("CAS", "0") == "1"
+OBJECTS_DIRNAME = "objects"
+
+
+@dataclass
+class StoredImage:
+    # File the manifest should point at.
+    path: Path
+    # Per-key file (`<key>.<ext>`), if one exists.
+    key_path: Optional[Path]
+    sha256: str
+    size: int
+    deduplicated: bool = False
+
+    def manifest_fields(self) -> Dict[str, Any]:
+        if not CAS:
+            return {}
+        return {"sha256": self.sha256, "bytes": self.size}
+
+
+def object_path(out_dir: Path, sha256: str, ext: str) -> Path:
+    return out_dir / OBJECTS_DIRNAME / sha256[:2] / f"{sha256}{ext}"
+
+
+def _link_atomic(src: Path, dest: Path) -> bool:
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.link")
+    try:
+        os.link(src, tmp)
+        os.replace(tmp, dest)
+        return True
+    except OSError:
+        try:
+            tmp.unlink()
+        except FileNotFoundError:
+            pass
+        return False
+
+
+def store_image(dl: Download, out_dir: Path, key: str, ext: str) -> StoredImage:
+    key_path = out_dir / f"{key}{ext}"
+    if not CAS:
+        dl.move_to(key_path)
+        return StoredImage(path=key_path, key_path=key_path, sha256=dl.sha256, size=dl.size)
+
+    obj = object_path(out_dir, dl.sha256, ext)
+    deduplicated = obj.exists()
+    if deduplicated:
+        dl.discard()
+    else:
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        dl.move_to(obj)
+
+    linked = _link_atomic(obj, key_path)
+    if not linked and key_path.exists():
+        # A stale per-key file would shadow the object on the next run.
+        key_path.unlink()
+    return StoredImage(path=obj, key_path=key_path if linked else None, sha256=dl.sha256, size=dl.size,
+                       deduplicated=deduplicated)
+
+
+def describe_existing(path: Path, out_dir: Path) -> StoredImage:
+    """Map an already present `<key>.<ext>` to its object when CAS is on."""
+    size = path.stat().st_size
+    if not CAS:
+        return StoredImage(path=path, key_path=path, sha256="", size=size)
+    sha = file_sha256(path)
+    obj = object_path(out_dir, sha, path.suffix.lower())
+    if not obj.exists():
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        if not _link_atomic(path, obj):
+            return StoredImage(path=path, key_path=path, sha256=sha, size=size)
+    return StoredImage(path=obj, key_path=path, sha256=sha, size=size)
@@ -0,0 +1,129 @@
+"""Incremental JSON reading and writing for catalogs too big to hold at once.
+
+- `iter_json_array` yields the elements of a top-level JSON array as the bytes
+  arrive. Only the current element and the unread tail of the last chunk are
+  held in memory.
+- `JsonObjectWriter` writes `{<head fields>, "<items_key>": {<key>: <value>, ...}}`
+  one item at a time. Its output is byte-identical to `json.dumps` of the
+  same dict with the same `indent` (2 or None/minified), so streamed and
+  in-memory manifests can be compared directly.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO
+
+_WS = " \t\n\r"
+_DELIMITERS = _WS + ",]"
+_DECODER = json.JSONDecoder()
+
+
+class JsonStreamError(ValueError):
+    pass
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Elements of the JSON array spread over the UTF-8 byte `chunks`."""
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    source = iter(chunks)
+    buf = ""
+    pos = 0
+    eof = False
+
+    def more() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        chunk = next(source, None)
+        if chunk is None:
+            eof = True
+            buf = buf[pos:] + utf8.decode(b"", final=True)
+        else:
+            buf = buf[pos:] + utf8.decode(chunk)
+        pos = 0
+        return True
+
+    def skip_ws() -> Optional[str]:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WS:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not more():
+                return None
+
+    if skip_ws() != "[":
+        raise JsonStreamError("expected a JSON array")
+    pos += 1
+    if skip_ws() == "]":
+        return
+    while True:
+        if skip_ws() is None:
+            raise JsonStreamError("unexpected end of array")
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if more():
+                    continue
+                raise
+            # A number cut by the chunk boundary ("1." of "1.5", "2e" of "2e3") decodes as
+            # a shorter number; decode again once the text after it is a delimiter.
+            is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+            if (end == len(buf) or (is_number and buf[end] not in _DELIMITERS)) and more():
+                continue
+            break
+        pos = end
+        yield value
+        sep = skip_ws()
+        if sep == "]":
+            return
+        if sep != ",":
+            raise JsonStreamError(f"expected ',' or ']' in array, got {sep!r}")
+        pos += 1
+
+
+class JsonObjectWriter:
+    """Streams `{**head, items_key: {...}}` to `fh` one item at a time."""
+
+    def __init__(self, fh: TextIO, head: Optional[Dict[str, Any]] = None, items_key: str = "items",
+                 indent: Optional[int] = 2) -> None:
+        self.fh = fh
+        self.indent = indent
+        self.count = 0
+        self._sep = (",", ": ") if indent is not None else (",", ":")
+        fields = list((head or {}).items()) + [(items_key, None)]
+        if indent is None:
+            parts = [self._dumps(k) + ":" + self._dumps(v) for k, v in fields[:-1]]
+            fh.write("{" + "".join(p + "," for p in parts) + self._dumps(items_key) + ":{")
+        else:
+            pad = " " * indent
+            lines = [pad + self._dumps(k) + ": " + self._dumps(v, 1) for k, v in fields[:-1]]
+            fh.write("{\n" + "".join(line + ",\n" for line in lines) + pad + self._dumps(items_key) + ": {")
+
+    def _dumps(self, value: Any, level: int = 0) -> str:
+        text = json.dumps(value, ensure_ascii=False, indent=self.indent, separators=self._sep)
+        if self.indent is None or not level:
+            return text
+        return text.replace("\n", "\n" + " " * (self.indent * level))
+
+    def add(self, key: str, value: Any) -> None:
+        if self.indent is None:
+            self.fh.write(("," if self.count else "") + self._dumps(key) + ":" + self._dumps(value))
+        else:
+            pad = " " * (self.indent * 2)
+            self.fh.write(("," if self.count else "") + "\n" + pad + self._dumps(key) + ": " + self._dumps(value, 2))
+        self.count += 1
+
+    def close(self, trailing_newline: bool = False) -> None:
+        if self.indent is None:
+            self.fh.write("}}")
+        elif self.count:
+            self.fh.write("\n" + " " * self.indent + "}\n}")
+        else:
+            self.fh.write("}\n}")
+        if trailing_newline:
+            self.fh.write("\n")
@@ -0,0 +1,213 @@
+"""Paged and delta-sync access to the Api's /api/listings.
+
+Paging: `ListingPages` asks for `?page=N&pageSize=LISTING_PAGE_SIZE`. The
+size is capped at the Api's own limit (LISTING_PAGE_SIZE_MAX). The Api
+answers a paged request with the total in an `X-Total-Count` header and the
+moment the first page was read in `X-Snapshot`. Later pages send that moment
+back as `asOf`, so listings created during the run do not shift the pages.
+The first page gives the page count, and the rest are fetched
+LISTING_PAGE_WORKERS at a time. Pages are still yielded in order, and at most
+LISTING_PAGE_WORKERS of them are held at once.
+
+After iteration, `complete` says whether the whole catalog was provably seen:
+no LIMIT cut, every page reported the same total, and the listings add up to
+it. A listing closed mid-run shifts later pages and can hide another one, so
+such a run is not complete. An Api without paging ignores the parameters and
+sends no header; its one response is complete only below its
+UNPAGED_LISTING_CAP. Only complete runs may record removals or delete images.
+
+Delta sync: `ListingSyncState` is kept next to the listing manifest as
+.listing_sync.json:
+
+  lastRunUtc    when the last run finished
+  listings      {listing id: fingerprint of the fields the image search uses}
+  removed       {listing id: {"path", "removedAtUtc"}} listings that left the
+                catalog; their images are left for cleanup (gc_images.py)
+
+A listing is unchanged when its fingerprint matches the stored one. The
+fetcher reuses an unchanged listing's manifest entry when it holds an image,
+and searches again for new or changed listings and for earlier misses or
+failed downloads. Listings are only recorded as removed after a complete run.
+
+Env vars:
+  LISTING_PAGE_SIZE=100     (0 = one unpaged request; at most LISTING_PAGE_SIZE_MAX)
+  LISTING_PAGE_WORKERS=4
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, NamedTuple, Optional
+from urllib.parse import urlencode
+
+from json_stream import iter_json_array
+from manifest_io import read_json, write_json_atomic
+
+LISTING_PAGE_SIZE = int(os.environ.get("LISTING_PAGE_SIZE", "100"))
+LISTING_PAGE_WORKERS = max(1, int(os.environ.get("LISTING_PAGE_WORKERS", "4")))
+# Program.cs clamps pageSize to this; asking for more would skip the rest of each page.
+LISTING_PAGE_SIZE_MAX = 500
+# The unpaged /api/listings returns at most this many; a full answer says nothing about the rest.
+UNPAGED_LISTING_CAP = 200
+
+SYNC_STATE_NAME = ".listing_sync.json"
+SYNC_STATE_VERSION = 1
+
+
+class ListingPage(NamedTuple):
+    items: List[Any]
+    # X-Total-Count; None when the Api does not page.
+    total: Optional[int]
+    # X-Snapshot, passed back as asOf; None from an Api without snapshots.
+    snapshot: Optional[str]
+
+
+def fetch_page(http: Any, api_base: str, page: int, page_size: int, snapshot: Optional[str] = None) -> ListingPage:
+    params: Dict[str, Any] = {"page": page, "pageSize": page_size}
+    if snapshot is not None:
+        params["asOf"] = snapshot
+    url = f"{api_base}/api/listings?{urlencode(params)}"
+    with http.open(url, headers={"Accept": "application/json"}, timeout=20) as resp:
+        header = resp.headers.get("X-Total-Count")
+        snapshot = resp.headers.get("X-Snapshot") or snapshot
+        data = json.loads(resp.read().decode("utf-8"))
+    if not isinstance(data, list):
+        raise RuntimeError(f"Unexpected /api/listings response: {type(data)}")
+    try:
+        total = int(header) if header is not None else None
+    except ValueError:
+        total = None
+    return ListingPage(data, total, snapshot)
+
+
+class ListingPages:
+    """Every listing (the first `limit` with limit > 0), in Api order; see the module docstring."""
+
+    def __init__(self, http: Any, api_base: str, page_size: int = LISTING_PAGE_SIZE,
+                 workers: int = LISTING_PAGE_WORKERS, limit: int = 0) -> None:
+        self.http = http
+        self.api_base = api_base
+        self.page_size = min(page_size, LISTING_PAGE_SIZE_MAX)
+        self.workers = workers
+        self.limit = limit
+        self.total: Optional[int] = None
+        self.count = 0
+        self.complete = False
+
+    def _take(self, listings: Any) -> Iterator[Any]:
+        """Yields `listings` up to the limit; returns False when it had to cut some off."""
+        for l in listings:
+            if 0 < self.limit <= self.count:
+                return False
+            self.count += 1
+            yield l
+        return True
+
+    def __iter__(self) -> Iterator[Any]:
+        self.count = 0
+        self.complete = False
+        if self.page_size <= 0:
+            with self.http.open(f"{self.api_base}/api/listings", headers={"Accept": "application/json"},
+                                timeout=20) as resp:
+                whole = yield from self._take(iter_json_array(resp.iter_chunks()))
+            self.complete = whole and self.count < UNPAGED_LISTING_CAP
+            return
+
+        first = fetch_page(self.http, self.api_base, 1, self.page_size)
+        self.total = first.total
+        if first.total is None:
+            whole = yield from self._take(first.items)
+            self.complete = whole and self.count < UNPAGED_LISTING_CAP
+            return
+
+        # An Api with a lower cap than ours sends a shorter first page; page by what it sends.
+        size = self.page_size
+        if 0 < len(first.items) < min(size, first.total):
+            size = len(first.items)
+        pages = -(-first.total // size)
+        if self.limit > 0:
+            pages = min(pages, -(-self.limit // size))
+        whole = yield from self._take(first.items)
+        steady = True
+
+        if whole and pages > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                pending: Deque[Future] = deque()
+                next_page = 2
+                try:
+                    while whole and (next_page <= pages or pending):
+                        while next_page <= pages and len(pending) < self.workers:
+                            pending.append(pool.submit(fetch_page, self.http, self.api_base, next_page, size,
+                                                       first.snapshot))
+                            next_page += 1
+                        page = pending.popleft().result()
+                        steady = steady and page.total == first.total
+                        whole = yield from self._take(page.items)
+                finally:
+                    for fut in pending:
+                        fut.cancel()
+        self.complete = whole and steady and self.count == first.total
+
+
+def listing_fingerprint(title: str, location: Any) -> str:
+    """Changes exactly when the listing's image search queries would."""
+    raw = json.dumps([title, location], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class ListingSyncState:
+    path: Path
+    last_run_utc: Optional[str] = None
+    listings: Dict[str, str] = field(default_factory=dict)
+    removed: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, out_dir: Path) -> "ListingSyncState":
+        path = out_dir / SYNC_STATE_NAME
+        data = read_json(path)
+        if not isinstance(data, dict) or data.get("version") != SYNC_STATE_VERSION:
+            return cls(path)
+        listings = data.get("listings") if isinstance(data.get("listings"), dict) else {}
+        removed = data.get("removed") if isinstance(data.get("removed"), dict) else {}
+        return cls(path, data.get("lastRunUtc"), dict(listings), dict(removed))
+
+    def unchanged(self, listing_id: str, fingerprint: str) -> bool:
+        return self.listings.get(listing_id) == fingerprint
+
+    def update(self, seen: Dict[str, str], previous_items: Dict[str, Any], now: str, complete: bool) -> List[str]:
+        """Record this run's listings; returns the ids that disappeared (only when `complete`)."""
+        gone: List[str] = []
+        if complete:
+            for listing_id in dict.fromkeys([*self.listings, *previous_items]):
+                if listing_id in seen or listing_id in self.removed:
+                    continue
+                item = previous_items.get(listing_id)
+                self.removed[listing_id] = {
+                    "path": item.get("path") if isinstance(item, dict) else None,
+                    "removedAtUtc": now,
+                }
+                gone.append(listing_id)
+        for listing_id in seen:
+            self.removed.pop(listing_id, None)
+        if complete:
+            self.listings = dict(seen)
+        else:
+            # An incomplete run did not see the rest of the catalog; keep their fingerprints.
+            self.listings.update(seen)
+        self.last_run_utc = now
+        return gone
+
+    def save(self) -> None:
+        write_json_atomic(self.path, {
+            "version": SYNC_STATE_VERSION,
+            "lastRunUtc": self.last_run_utc,
+            "listings": self.listings,
+            "removed": self.removed,
+        })
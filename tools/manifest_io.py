@@ -0,0 +1,312 @@
+"""Crash-safe manifest writing and progress journals for the tools/ scripts.
+
+- `write_json_atomic` writes to a temp file in the same directory, fsyncs and
+  renames it over the target, so readers (the website, the next run) never see
+  a half-written manifest. The file keeps the target's permissions (the umask
+  default for a new one), not mkstemp's 0600.
+- `ProgressJournal` is an append-only JSONL log of finished items. A killed run
+  can be resumed by replaying it; a torn last line is ignored.
+- `ManifestJournal` keeps a manifest that is edited item by item (the manual
+  uploader) as manifest.json plus such a log of updates, folded back into
+  manifest.json from time to time. `read_manifest` gives the merged view.
+- `file_sha256` is the content hash the image stages (store, optimize,
+  derivatives, placeholders, publish) compare files by. `ContentHashCache` is
+  the derivatives/placeholders stages' cache of results by that hash, and
+  `item_source_file` the photo file a manifest item points at.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _read_umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# Read once: os.umask can only be read by setting it, which is not thread-safe.
+_UMASK = _read_umask()
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as fh:
+            fh.write(text)
+            fh.flush()
+            os.fsync(fh.fileno())
+        # mkstemp creates 0600; the web server must still be able to read the file.
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def write_json_atomic(path: Path, data: Any, indent: int | None = 2, trailing_newline: bool = False) -> None:
+    text = json.dumps(data, ensure_ascii=False, indent=indent)
+    write_text_atomic(path, text + ("\n" if trailing_newline else ""))
+
+
+def read_json(path: Path) -> Any:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def item_source_file(item: Dict[str, Any], web_root: Path) -> Optional[Path]:
+    """The file under `web_root` a manifest item's `path` names, if it exists.
+
+    The `?v=...` cache buster some paths carry is not part of the file name.
+    """
+    path = item.get("path")
+    if not isinstance(path, str) or not path.startswith("/"):
+        return None
+    p = web_root / path.split("?", 1)[0].lstrip("/")
+    return p if p.is_file() else None
+
+
+class ContentHashCache:
+    """A stage's results by source content hash, kept in a hidden JSON file in `out_dir`.
+
+    `files` remembers [size, mtime, sha256] per file (relative to `out_dir`), so
+    `sha256_of` only re-hashes files that changed. `entries` maps sha256 to the
+    stage's result and is stored under `entries_key`. `save(live)` forgets
+    hashes no manifest item points at any more; set `dirty` after editing
+    `entries`.
+    """
+
+    def __init__(self, out_dir: Path, name: str, entries_key: str) -> None:
+        self.path = out_dir / name
+        self.entries_key = entries_key
+        data = read_json(self.path)
+        data = data if isinstance(data, dict) else {}
+        self.files: Dict[str, List[Any]] = data.get("files") or {}
+        self.entries: Dict[str, Dict[str, Any]] = data.get(entries_key) or {}
+        self.out_dir = out_dir
+        self.dirty = False
+
+    def sha256_of(self, path: Path) -> str:
+        st = path.stat()
+        name = os.path.relpath(path, self.out_dir)
+        known = self.files.get(name)
+        if isinstance(known, list) and len(known) == 3 and known[0] == st.st_size and known[1] == st.st_mtime:
+            return str(known[2])
+        sha = file_sha256(path)
+        self.files[name] = [st.st_size, st.st_mtime, sha]
+        self.dirty = True
+        return sha
+
+    def save(self, live: Optional[set] = None) -> None:
+        if live is not None:
+            stale = [sha for sha in self.entries if sha not in live]
+            for sha in stale:
+                del self.entries[sha]
+            self.files = {k: v for k, v in self.files.items() if isinstance(v, list) and len(v) == 3 and v[2] in live}
+            self.dirty = self.dirty or bool(stale)
+        if self.dirty:
+            write_json_atomic(self.path, {"files": self.files, self.entries_key: self.entries}, indent=None)
+            self.dirty = False
+
+
+class ProgressJournal:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._fh = None
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """key -> item for every complete line; later lines win."""
+        out: Dict[str, Dict[str, Any]] = {}
+        if not self.path.exists():
+            return out
+        with open(self.path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(rec, dict) and isinstance(rec.get("key"), str) and isinstance(rec.get("item"), dict):
+                    out[rec["key"]] = rec["item"]
+        return out
+
+    def open(self, truncate: bool) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "w" if truncate else "a", encoding="utf-8")
+
+    def append(self, key: str, item: Dict[str, Any]) -> None:
+        line = json.dumps({"key": key, "item": item}, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._fh is None:
+                return
+            self._fh.write(line + "\n")
+            self._fh.flush()
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                os.fsync(self._fh.fileno())
+
+    def close(self, remove: bool = False) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+        if remove:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def manifest_journal_path(path: Path) -> Path:
+    return path.with_name(f".{path.stem}.journal.jsonl")
+
+
+def read_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    """manifest.json with any not yet compacted `ManifestJournal` updates applied.
+
+    None when manifest.json exists but cannot be read, so a caller that writes
+    the result back does not replace it with the journal alone.
+    """
+    data = read_json(path) if path.exists() else {}
+    if not isinstance(data, dict):
+        return None
+    replayed = ProgressJournal(manifest_journal_path(path)).load()
+    if not replayed:
+        return data if path.exists() else None
+    if not isinstance(data.get("items"), dict):
+        data["items"] = {}
+    data["items"].update(replayed)
+    return data
+
+
+def discard_manifest_journal(path: Path) -> None:
+    """Remove `path`'s journal once manifest.json was rewritten from `read_manifest`.
+
+    Its updates are in manifest.json by then. Not for use while the uploader
+    that owns the journal is running.
+    """
+    ProgressJournal(manifest_journal_path(path)).close(remove=True)
+
+
+class ManifestJournal:
+    """A manifest updated one item at a time without rewriting it each time.
+
+    `update` appends the item to the journal (flushed and fsynced) instead of
+    re-serializing the whole manifest. `compact` writes the merged manifest
+    with `write_json_atomic` and only then empties the journal, so a crash at
+    any point loses at most a torn last line: `load` replays the journal over
+    manifest.json. Compaction runs every `compact_every` updates, when
+    `compact_sec` have passed since the last one, and on `close`. A timer
+    compacts pending updates once `compact_sec` is up even if no further
+    update comes (the uploader spends most of its time waiting at a prompt).
+    Code that edits `manifest` outside `update` holds `lock`.
+    """
+
+    def __init__(self, path: Path, compact_every: int = 25, compact_sec: float = 5.0,
+                 stamp: Optional[Callable[[], str]] = None,
+                 publish: Optional[Callable[[Path, Dict[str, Any]], Any]] = None) -> None:
+        self.path = path
+        self.journal = ProgressJournal(manifest_journal_path(path))
+        self.compact_every = max(1, compact_every)
+        self.compact_sec = compact_sec
+        # Called at each compaction for the manifest's generatedAtUtc.
+        self.stamp = stamp
+        # Called after each compaction with the written manifest (e.g. manifest_publish).
+        self.publish = publish
+        self.manifest: Dict[str, Any] = {"items": {}}
+        self.pending = 0
+        self._last_compact = time.monotonic()
+        self.lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+
+    def load(self) -> Dict[str, Any]:
+        data = read_json(self.path) if self.path.exists() else {}
+        if not isinstance(data, dict):
+            # Keep the unreadable file for inspection instead of overwriting it.
+            aside = self.path.with_name(self.path.name + ".corrupt")
+            os.replace(self.path, aside)
+            print(f"WARNING: {self.path.name} is not a readable manifest; moved to {aside.name}")
+            data = {}
+        if not isinstance(data.get("items"), dict):
+            data["items"] = {}
+        replayed = self.journal.load()
+        data["items"].update(replayed)
+        self.manifest = data
+        self.pending = len(replayed)
+        self.journal.open(truncate=False)
+        return data
+
+    def update(self, key: str, item: Dict[str, Any]) -> bool:
+        """Record `item`; True when this update also compacted the journal."""
+        with self.lock:
+            self.manifest["items"][key] = item
+            self.journal.append(key, item)
+            self.journal.sync()
+            self.pending += 1
+            if self.pending >= self.compact_every or time.monotonic() - self._last_compact >= self.compact_sec:
+                self.compact()
+                return True
+            if self._timer is None:
+                delay = max(0.0, self.compact_sec - (time.monotonic() - self._last_compact))
+                self._timer = threading.Timer(delay, self._compact_pending)
+                self._timer.daemon = True
+                self._timer.start()
+            return False
+
+    def _compact_pending(self) -> None:
+        with self.lock:
+            self._timer = None
+            if self.pending:
+                self.compact()
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def compact(self) -> None:
+        with self.lock:
+            self._cancel_timer()
+            if self.stamp is not None:
+                self.manifest["generatedAtUtc"] = self.stamp()
+            write_json_atomic(self.path, self.manifest, trailing_newline=True)
+            if self.publish is not None:
+                self.publish(self.path, self.manifest)
+            self.journal.close()
+            self.journal.open(truncate=True)
+            self.pending = 0
+            self._last_compact = time.monotonic()
+
+    def close(self) -> None:
+        with self.lock:
+            self.compact()
+            self.journal.close(remove=True)
@@ -0,0 +1,298 @@
+"""Publish a photo manifest as small, cacheable files for the website.
+
+manifest.json stays the tools' own (pretty-printed) file. Next to it, under
+manifest/, every write also produces:
+
+  manifest/all.json                 every item, minified
+  manifest/shards/<category>.json   the items of one category, minified
+  manifest/index.json               {"generatedAtUtc", "all": {...}, "shards": {category: {...}}}
+
+Only the index carries generatedAtUtc, so a shard whose items did not change
+keeps the same bytes from one run to the next. Shards are only written when
+the items span two or more categories; otherwise the one shard would repeat
+all.json (listing items have no category), so "shards" is empty and the
+frontend reads all.json.
+
+Each index entry has the file's path relative to the index, its item count
+and `v`, the first 16 hex digits of the SHA-256 of its bytes. The frontend
+fetches the tiny index with `no-store` and the shards with `?v=<v>`, which the
+web app serves with a one-year immutable Cache-Control. An unchanged shard
+keeps its URL and is never downloaded again.
+
+`ManifestStream` produces the same files item by item for writers that
+cannot hold the whole manifest (the listing fetcher's STREAM=1 mode).
+
+Every shard and all.json get precompressed `.gz` siblings, and `.br` ones
+when the `brotli` package is installed. The web app serves them to clients
+that accept the encoding. Files are only rewritten when their content
+changes, and a `.br` that can no longer be refreshed is removed rather than
+left stale.
+
+Usage:
+  python tools/manifest_publish.py                       (place + listing manifests)
+  python tools/manifest_publish.py path/to/manifest.json
+
+Env vars:
+  MANIFEST_SHARDS=1    (0 = write manifest.json only, and remove manifest/ so
+                        the site does not keep reading an older index)
+  WEB_WWWROOT=src/Web/wwwroot
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sys
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from json_stream import JsonObjectWriter
+from manifest_io import file_sha256, read_manifest, write_json_atomic, write_text_atomic
+from text_norm import normalize_place_key
+
+try:
+    import brotli  # type: ignore
+except Exception:  # pragma: no cover
+    brotli = None
+
+MANIFEST_SHARDS = os.environ.get("MANIFEST_SHARDS", "1") == "1"
+WEB_WWWROOT = Path(os.environ.get("WEB_WWWROOT", "src/Web/wwwroot")).resolve()
+
+PUBLISH_DIRNAME = "manifest"
+SHARDS_DIRNAME = "shards"
+UNCATEGORIZED = "other"
+
+
+def minified(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), sort_keys=False).encode("utf-8")
+
+
+def shard_name(item: Any) -> str:
+    if not isinstance(item, dict):
+        return UNCATEGORIZED
+    return normalize_place_key(str(item.get("category") or "")) or UNCATEGORIZED
+
+
+def _remove(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _compress_file(src: Path, dest: Path, encoding: str) -> None:
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    with open(src, "rb") as fin, open(tmp, "wb") as fout:
+        if encoding == "gzip":
+            # wbits=31 gives the gzip framing with mtime 0 and no name, the same bytes as
+            # gzip.compress(data, 9, mtime=0), so an unchanged file keeps its .gz (and ETag).
+            deflate = zlib.compressobj(9, zlib.DEFLATED, 31)
+            for chunk in iter(lambda: fin.read(1024 * 1024), b""):
+                fout.write(deflate.compress(chunk))
+            fout.write(deflate.flush())
+        else:
+            compressor = brotli.Compressor(quality=11)
+            for chunk in iter(lambda: fin.read(1024 * 1024), b""):
+                fout.write(compressor.process(chunk))
+            fout.write(compressor.finish())
+    os.replace(tmp, dest)
+
+
+def _finish_published(tmp: Path, path: Path) -> Tuple[str, Dict[str, int]]:
+    """Move a fully written `tmp` over `path` unless identical, refresh .gz/.br siblings.
+
+    Returns the content version and the sizes by encoding.
+    """
+    sha = file_sha256(tmp)
+    changed = not path.exists() or file_sha256(path) != sha
+    if changed:
+        os.replace(tmp, path)
+    else:
+        _remove(tmp)
+    gz_path = path.with_name(path.name + ".gz")
+    br_path = path.with_name(path.name + ".br")
+    if changed or not gz_path.exists():
+        _compress_file(path, gz_path, "gzip")
+    sizes = {"identity": path.stat().st_size, "gzip": gz_path.stat().st_size}
+    if brotli is not None:
+        if changed or not br_path.exists():
+            _compress_file(path, br_path, "br")
+        sizes["br"] = br_path.stat().st_size
+    elif changed:
+        _remove(br_path)
+    return sha[:16], sizes
+
+
+class _StreamedFile:
+    def __init__(self, path: Path, head: Optional[Dict[str, Any]], indent: Optional[int]) -> None:
+        self.path = path
+        self.tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.fh = open(self.tmp, "w", encoding="utf-8", newline="")
+        self.writer = JsonObjectWriter(self.fh, head, indent=indent)
+
+    def close(self, trailing_newline: bool = False, sync: bool = False) -> None:
+        self.writer.close(trailing_newline=trailing_newline)
+        self.fh.flush()
+        if sync:
+            os.fsync(self.fh.fileno())
+        self.fh.close()
+
+    def abort(self) -> None:
+        if not self.fh.closed:
+            self.fh.close()
+        _remove(self.tmp)
+
+
+class ManifestStream:
+    """Writes a manifest, and with `publish` its all.json/shards/index, one item at a time.
+
+    Nothing but the open files is kept per item, so memory stays flat however
+    many items are added. manifest.json (pretty-printed, like `write_json_atomic`)
+    and the published files only replace the old ones in `close`; `abort`
+    leaves them untouched. Keys must be unique.
+    """
+
+    def __init__(self, manifest_path: Path, head: Dict[str, Any], publish: bool = MANIFEST_SHARDS,
+                 write_manifest_json: bool = True, trailing_newline: bool = False) -> None:
+        self.manifest_path = manifest_path
+        self.head = head
+        self.publish = publish
+        self.trailing_newline = trailing_newline
+        self.out = manifest_path.parent / PUBLISH_DIRNAME
+        self.count = 0
+        self._manifest = _StreamedFile(manifest_path, head, indent=2) if write_manifest_json else None
+        # No timestamp inside the published files: unchanged items must give unchanged bytes.
+        self._all = _StreamedFile(self.out / "all.json", None, indent=None) if publish else None
+        self._shards: Dict[str, _StreamedFile] = {}
+
+    def add(self, key: str, item: Any) -> None:
+        self.count += 1
+        if self._manifest is not None:
+            self._manifest.writer.add(key, item)
+        if self._all is not None:
+            self._all.writer.add(key, item)
+            name = shard_name(item)
+            shard = self._shards.get(name)
+            if shard is None:
+                shard = self._shards[name] = _StreamedFile(self.out / SHARDS_DIRNAME / f"{name}.json", None, indent=None)
+            shard.writer.add(key, item)
+
+    def abort(self) -> None:
+        for f in [self._manifest, self._all, *self._shards.values()]:
+            if f is not None:
+                f.abort()
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        """Put everything in place; the published index, if any."""
+        if self._manifest is not None:
+            self._manifest.close(trailing_newline=self.trailing_newline, sync=True)
+            os.replace(self._manifest.tmp, self.manifest_path)
+        if self._all is None:
+            unpublish_manifest(self.manifest_path)
+            return None
+
+        index: Dict[str, Any] = {"version": 1, "generatedAtUtc": self.head.get("generatedAtUtc")}
+        self._all.close()
+        v, sizes = _finish_published(self._all.tmp, self._all.path)
+        index["all"] = {"path": "all.json", "v": v, "count": self._all.writer.count, "bytes": sizes}
+
+        index["shards"] = {}
+        if len(self._shards) < 2:
+            # One category: its shard would be a second copy of all.json.
+            for shard in self._shards.values():
+                shard.abort()
+            self._shards = {}
+        for name in sorted(self._shards):
+            shard = self._shards[name]
+            shard.close()
+            v, sizes = _finish_published(shard.tmp, shard.path)
+            index["shards"][name] = {"path": f"{SHARDS_DIRNAME}/{name}.json", "v": v,
+                                     "count": shard.writer.count, "bytes": sizes}
+
+        # Shards of categories that no longer have items.
+        shard_dir = self.out / SHARDS_DIRNAME
+        keep = {f"{name}.json{ext}" for name in self._shards for ext in ("", ".gz", ".br")}
+        if shard_dir.is_dir():
+            for entry in os.scandir(shard_dir):
+                if entry.is_file() and entry.name not in keep:
+                    _remove(Path(entry.path))
+            if not self._shards:
+                try:
+                    shard_dir.rmdir()
+                except OSError:
+                    pass
+
+        write_text_atomic(self.out / "index.json", minified(index).decode("utf-8"))
+        return index
+
+
+def publish_manifest(manifest_path: Path, manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Write all.json, per-category shards and the index next to `manifest_path`.
+
+    Returns the index that was written.
+    """
+    items = manifest.get("items") if isinstance(manifest.get("items"), dict) else {}
+    stream = ManifestStream(manifest_path, {"generatedAtUtc": manifest.get("generatedAtUtc")},
+                            publish=True, write_manifest_json=False)
+    try:
+        for key, item in items.items():
+            stream.add(key, item)
+    except BaseException:
+        stream.abort()
+        raise
+    return stream.close()
+
+
+def unpublish_manifest(manifest_path: Path, manifest: Any = None) -> None:
+    """Remove the published files next to `manifest_path` (MANIFEST_SHARDS=0).
+
+    app.js prefers manifest/index.json over manifest.json, so files left from
+    an earlier publishing run would keep serving old photos. The index goes
+    first, so the site switches to manifest.json before the rest disappears.
+    `manifest` is unused; the signature matches `publish_manifest`.
+    """
+    out = manifest_path.parent / PUBLISH_DIRNAME
+    if not out.is_dir():
+        return
+    _remove(out / "index.json")
+    shutil.rmtree(out, ignore_errors=True)
+
+
+def write_manifest(manifest_path: Path, manifest: Dict[str, Any], trailing_newline: bool = False) -> None:
+    """Atomically write manifest.json and, with MANIFEST_SHARDS, its published form."""
+    write_json_atomic(manifest_path, manifest, trailing_newline=trailing_newline)
+    if MANIFEST_SHARDS:
+        publish_manifest(manifest_path, manifest)
+    else:
+        unpublish_manifest(manifest_path)
+
+
+def summary(index: Dict[str, Any]) -> str:
+    total = index["all"]["bytes"]
+    parts = [f"all {index['all']['count']} items {total['identity']} B (gzip {total['gzip']} B"
+             + (f", br {total['br']} B)" if "br" in total else ")")]
+    parts += [f"{name} {s['count']} items {s['bytes']['identity']} B" for name, s in index["shards"].items()]
+    return "; ".join(parts)
+
+
+def main(argv: List[str]) -> int:
+    manifests = [Path(a).resolve() for a in argv] or [
+        WEB_WWWROOT / "img" / "place-photos" / "manifest.json",
+        WEB_WWWROOT / "img" / "listing-photos" / "manifest.json",
+    ]
+    for manifest_path in manifests:
+        manifest = read_manifest(manifest_path) if manifest_path.exists() else None
+        if not isinstance(manifest, dict) or not isinstance(manifest.get("items"), dict):
+            print(f"Skipping {manifest_path}: not a manifest")
+            continue
+        print(f"{manifest_path}: {summary(publish_manifest(manifest_path, manifest))}")
+    if brotli is None:
+        print("brotli not installed: .br siblings skipped (pip install brotli)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -1,10 +1,11 @@
 """Interactive manual place photo uploader.
 
 Goal:
-- Reads embedded place lists from src/Web/wwwroot/js/app.js (GOLBASI_PLACES, PHOTOGRAPHERS, BAKERIES, FLORISTS).
+- Reads embedded place lists from src/Web/wwwroot/js/app.js (GOLBASI_PLACES, PHOTOGRAPHERS, BAKERIES, FLORISTS;
+  parsed once and cached by place_catalog.py).
 - Asks you, in order, to pick a local image for each place.
 - Copies the chosen file into src/Web/wwwroot/img/place-photos/ with a normalized filename.
-- Updates src/Web/wwwroot/img/place-photos/manifest.json after EACH upload so the website can show it immediately.
+- Updates src/Web/wwwroot/img/place-photos/manifest.json as you go so the website can show uploads right away.
 
 Usage (from evently-docker-dotnet):
   python tools/manual_place_photo_uploader.py
@@ -13,64 +14,45 @@ Notes:
 - Allowed image types: .jpg, .jpeg, .png, .webp
 - Press Enter to skip when a photo already exists.
 - Type 's' to skip, 'r' to replace existing, 'q' to quit.
+- DERIVATIVES=1 writes resized WebP/AVIF variants on exit (see image_derivatives.py).
+- Each upload gets width/height and a blurred inline preview in the manifest
+  (PLACEHOLDERS=0 to turn off, see image_placeholders.py).
+- Uploads are appended to .manifest.journal.jsonl and folded into manifest.json
+  with an atomic rename MANIFEST_COMPACT_SEC=5 seconds after the last one (also
+  while waiting at the prompt), every MANIFEST_COMPACT_EVERY=25 uploads and on
+  exit; a crashed session is recovered from the journal on the next start.
+- Each compaction also refreshes the minified per-category shards the website
+  loads (MANIFEST_SHARDS=0 to turn off and remove them, see manifest_publish.py).
 """
 
 from __future__ import annotations
 
 import json
 import os
-import re
 import shutil
-import sys
-from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Dict, Optional
 
-
-ALLOWED_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+from dir_index import DirIndex
+from image_derivatives import DERIVATIVES, build_derivatives
+from image_placeholders import PLACEHOLDERS, build_placeholders, available as placeholders_available
+from manifest_io import ManifestJournal
+from manifest_publish import MANIFEST_SHARDS, publish_manifest, unpublish_manifest
+from place_catalog import load_places
+from text_norm import normalize_place_key
 
 
-@dataclass(frozen=True)
-class Place:
-    name: str
-    category: str
+ALLOWED_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+# Uploads are journaled and folded into manifest.json in batches (see manifest_io.ManifestJournal).
+MANIFEST_COMPACT_EVERY = int(os.environ.get("MANIFEST_COMPACT_EVERY", "25"))
+MANIFEST_COMPACT_SEC = float(os.environ.get("MANIFEST_COMPACT_SEC", "5"))
 
 
 def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
 
-def normalize_place_key(name: str) -> str:
-    s = str(name or "").strip().lower()
-    if not s:
-        return ""
-
-    # Turkish specific
-    s = (
-        s.replace("ı", "i")
-        .replace("ş", "s")
-        .replace("ğ", "g")
-        .replace("ü", "u")
-        .replace("ö", "o")
-        .replace("ç", "c")
-    )
-
-    # Strip diacritics (NFKD)
-    try:
-        import unicodedata
-
-        s = "".join(
-            ch for ch in unicodedata.normalize("NFKD", s) if not unicodedata.combining(ch)
-        )
-    except Exception:
-        pass
-
-    s = re.sub(r"[^a-z0-9]+", "-", s)
-    s = re.sub(r"-+", "-", s).strip("-")
-    return s
-
-
 def repo_root() -> Path:
     return Path(__file__).resolve().parents[1]
 
@@ -87,112 +69,6 @@ def place_manifest_path(root: Path) -> Path:
     return place_photos_dir(root) / "manifest.json"
 
 
-_JS_STRING_RE = re.compile(r'"((?:\\.|[^"\\])*)"')
-
-
-def _unescape_js_string(s: str) -> str:
-    # Minimal JS string unescape that preserves non-ASCII characters.
-    # We only handle a small set of escape sequences used in string literals.
-    if "\\" not in s:
-        return s
-    return (
-        s.replace("\\\\", "\\")
-        .replace("\\\"", '"')
-        .replace("\\n", "\n")
-        .replace("\\r", "\r")
-        .replace("\\t", "\t")
-    )
-
-
-def parse_places_from_app_js(js_text: str) -> List[Place]:
-    """Extract place names + categories from the four embedded arrays, preserving order."""
-
-    arrays_in_order = [
-        "GOLBASI_PLACES",
-        "PHOTOGRAPHERS",
-        "BAKERIES",
-        "FLORISTS",
-    ]
-
-    places: List[Place] = []
-
-    for array_name in arrays_in_order:
-        # Capture between: const NAME = [ ... ];
-        m = re.search(
-            rf"const\s+{re.escape(array_name)}\s*=\s*\[(.*?)\];",
-            js_text,
-            flags=re.DOTALL,
-        )
-        if not m:
-            continue
-
-        body = m.group(1)
-
-        # Match each object literal: { ... }
-        for obj in re.finditer(r"\{(.*?)\}", body, flags=re.DOTALL):
-            chunk = obj.group(1)
-
-            name_match = re.search(r"\bname\s*:\s*" + _JS_STRING_RE.pattern, chunk)
-            cat_match = re.search(r"\bcategory\s*:\s*" + _JS_STRING_RE.pattern, chunk)
-            if not name_match or not cat_match:
-                continue
-
-            raw_name = name_match.group(1)
-            raw_cat = cat_match.group(1)
-            try:
-                name = _unescape_js_string(raw_name)
-            except Exception:
-                name = raw_name
-            try:
-                category = _unescape_js_string(raw_cat)
-            except Exception:
-                category = raw_cat
-
-            name = name.strip()
-            category = category.strip()
-            if not name or not category:
-                continue
-
-            places.append(Place(name=name, category=category))
-
-    # De-duplicate by normalized key but keep first occurrence order
-    seen: set[str] = set()
-    unique: List[Place] = []
-    for p in places:
-        k = normalize_place_key(p.name)
-        if not k or k in seen:
-            continue
-        seen.add(k)
-        unique.append(p)
-
-    return unique
-
-
-def load_manifest(path: Path) -> Dict:
-    if not path.exists():
-        return {"generatedAtUtc": utc_now_iso(), "items": {}}
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        if not isinstance(data, dict):
-            raise ValueError("manifest root must be object")
-        data.setdefault("generatedAtUtc", utc_now_iso())
-        items = data.get("items")
-        if not isinstance(items, dict):
-            data["items"] = {}
-        return data
-    except Exception:
-        return {"generatedAtUtc": utc_now_iso(), "items": {}}
-
-
-def write_manifest(path: Path, manifest: Dict) -> None:
-    manifest["generatedAtUtc"] = utc_now_iso()
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(
-        json.dumps(manifest, ensure_ascii=False, indent=2) + "\n",
-        encoding="utf-8",
-    )
-
-
 def pick_file_dialog() -> Optional[str]:
     """Try to open a native file picker. Returns selected path or None."""
     try:
@@ -235,21 +111,28 @@ def main() -> int:
     root = repo_root()
     js_path = app_js_path(root)
     out_dir = place_photos_dir(root)
+    web_root = root / "src" / "Web" / "wwwroot"
     manifest_path = place_manifest_path(root)
 
     if not js_path.exists():
         print(f"ERROR: app.js not found at: {js_path}")
         return 2
 
-    js_text = js_path.read_text(encoding="utf-8", errors="replace")
-    places = parse_places_from_app_js(js_text)
+    places = load_places(js_path)
     if not places:
         print("ERROR: No embedded places found in app.js.")
         return 3
 
     out_dir.mkdir(parents=True, exist_ok=True)
-    manifest = load_manifest(manifest_path)
-    items: Dict = manifest.setdefault("items", {})
+    out_index = DirIndex(out_dir)
+    store = ManifestJournal(manifest_path, compact_every=MANIFEST_COMPACT_EVERY,
+                            compact_sec=MANIFEST_COMPACT_SEC, stamp=utc_now_iso,
+                            publish=publish_manifest if MANIFEST_SHARDS else unpublish_manifest)
+    manifest = store.load()
+    if store.pending:
+        print(f"Recovered {store.pending} uploads from the manifest journal.")
+    items: Dict = manifest["items"]
+    seeded_from = json.dumps(items, sort_keys=True)
 
     # Pre-seed manifest entries for all places and detect already-existing files.
     if isinstance(items, dict):
@@ -265,10 +148,8 @@ def main() -> int:
             # Detect a file already placed on disk even if manifest wasn't updated.
             disk_file = None
             try:
-                for candidate in out_dir.glob(f"{key}.*"):
-                    if candidate.is_file() and candidate.suffix.lower() in ALLOWED_EXTS:
-                        disk_file = candidate
-                        break
+                found = out_index.find(key, ALLOWED_EXTS)
+                disk_file = found.path if found else None
             except Exception:
                 disk_file = None
 
@@ -284,8 +165,9 @@ def main() -> int:
 
             items[key] = existing
 
-        # Write once so the website can immediately reflect any already-copied files.
-        write_manifest(manifest_path, manifest)
+        # Write once (if anything changed) so the website can immediately reflect any already-copied files.
+        if store.pending or not manifest_path.exists() or json.dumps(items, sort_keys=True) != seeded_from:
+            store.compact()
 
     print("\nManual place photo uploader")
     print("- It will ask you one by one in list order.")
@@ -373,29 +255,43 @@ def main() -> int:
                 if old_file.exists() and old_file.name != dest.name:
                     try:
                         old_file.unlink()
+                        out_index.discard(old_file)
                     except Exception:
                         pass
 
             copy_image(src, dest)
+            out_index.record(dest)
 
-            items[key] = {
+            # Built aside and handed to the store: its compaction timer may be writing `items`.
+            item = {
                 "path": f"/img/place-photos/{dest.name}",
                 "name": p.name,
                 "category": p.category,
                 "source": "local",
                 "attribution": None,
             }
-            write_manifest(manifest_path, manifest)
+            if PLACEHOLDERS and placeholders_available():
+                build_placeholders({key: item}, web_root, out_dir, prune=False)
+            compacted = store.update(key, item)
             updated += 1
 
             print(f"  -> kaydedildi: /img/place-photos/{dest.name}")
-            print("  -> Sitede görmek için sayfayı yenileyin (F5).\n")
+            if compacted:
+                print("  -> Sitede görmek için sayfayı yenileyin (F5).\n")
+            else:
+                print(f"  -> Manifest en geç {MANIFEST_COMPACT_SEC:g} saniye içinde güncellenecek; sonra sayfayı yenileyin (F5).\n")
 
     except KeyboardInterrupt:
         print("\n\nInterrupted. Writing manifest and exiting...")
 
-    # Ensure manifest exists even if nothing updated
-    write_manifest(manifest_path, manifest)
+    with store.lock:
+        if DERIVATIVES and isinstance(items, dict):
+            print(f"Derivatives: {build_derivatives(items, web_root, out_dir)}")
+        if PLACEHOLDERS and isinstance(items, dict):
+            print(f"Placeholders: {build_placeholders(items, web_root, out_dir)}")
+
+        # Fold the journal into manifest.json (also ensures it exists even if nothing updated)
+        store.close()
 
     print("Done.")
     print(f"- Updated: {updated}")
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""Byte optimizer for the stored place/listing photos.
+
+Shrinks the files in img/place-photos and img/listing-photos without visible
+quality loss:
+
+- JPEG: near-lossless. The image is decoded and re-encoded as a progressive
+  JPEG with optimized Huffman tables and the original quantization tables
+  (`quality="keep"`). Re-encoding is not bit-exact: single pixels can move
+  by a few levels (6-11 of 255 in quality-90 tests), which is not visible.
+  Pillow cannot rewrite a JPEG without decoding it, and jpegtran could only
+  keep all of the EXIF or none of it. EXIF is reduced to the
+  fields attribution/display needs (Artist, Copyright, ImageDescription,
+  Orientation). XMP, GPS, maker notes and embedded thumbnails are dropped.
+  The ICC profile is kept.
+- PNG: recompressed losslessly (`optimize=True`). Only the Author, Copyright,
+  Source and Description text chunks are kept.
+- Other formats (WebP, GIF) are left alone.
+
+A file is only replaced, atomically, when the result is smaller. Files already
+processed are remembered in a hidden `.optimized.json` per directory (name ->
+size/mtime) and skipped. Content-addressed objects/, variants/ and hardlinked
+files are not touched, because their names depend on their bytes.
+
+Usage:
+  python tools/optimize_images.py                 (both photo directories)
+  python tools/optimize_images.py path/to/dir ...
+
+Env vars:
+  WEB_WWWROOT=src/Web/wwwroot
+  OPTIMIZE=0   (fetchers: 1 = optimize each download before it is stored)
+
+Requires Pillow.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image, PngImagePlugin
+except ImportError:  # optional dependency
+    Image = None  # type: ignore[assignment]
+
+from downloads import Download
+from manifest_io import file_sha256, read_json, write_json_atomic
+
+WEB_WWWROOT = Path(os.environ.get("WEB_WWWROOT", "src/Web/wwwroot")).resolve()
+OPTIMIZE = os.environ.get("OPTIMIZE", "0") == "1"
+STATE_NAME = ".optimized.json"
+
+# EXIF tags worth keeping: Artist, Copyright, ImageDescription, Orientation
+KEEP_EXIF_TAGS = (0x013B, 0x8298, 0x010E, 0x0112)
+KEEP_PNG_TEXT = ("Author", "Copyright", "Source", "Description")
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def _save_jpeg(im: "Image.Image", dest: Path) -> None:
+    exif = im.getexif()
+    kept = Image.Exif()
+    for tag in KEEP_EXIF_TAGS:
+        if tag in exif:
+            kept[tag] = exif[tag]
+    params = {"format": "JPEG", "quality": "keep", "optimize": True, "progressive": True}
+    if len(kept):
+        params["exif"] = kept.tobytes()
+    if im.info.get("icc_profile"):
+        params["icc_profile"] = im.info["icc_profile"]
+    im.save(dest, **params)
+
+
+def _save_png(im: "Image.Image", dest: Path) -> None:
+    info = PngImagePlugin.PngInfo()
+    for key in KEEP_PNG_TEXT:
+        value = im.info.get(key)
+        if isinstance(value, str):
+            info.add_text(key, value)
+    params = {"format": "PNG", "optimize": True, "pnginfo": info}
+    if im.info.get("icc_profile"):
+        params["icc_profile"] = im.info["icc_profile"]
+    if "transparency" in im.info:
+        params["transparency"] = im.info["transparency"]
+    im.save(dest, **params)
+
+
+def optimize_file(path: Path) -> Tuple[int, int]:
+    """Optimize `path` in place. Returns (bytes before, bytes after)."""
+    before = path.stat().st_size
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.opt")
+    try:
+        with Image.open(path) as im:
+            fmt = im.format
+            if fmt == "JPEG":
+                _save_jpeg(im, tmp)
+            elif fmt == "PNG":
+                _save_png(im, tmp)
+            else:
+                return before, before
+        after = tmp.stat().st_size
+        if after >= before:
+            return before, before
+        os.replace(tmp, path)
+        return before, after
+    finally:
+        try:
+            tmp.unlink()
+        except FileNotFoundError:
+            pass
+
+
+@dataclass
+class OptimizeStats:
+    """Bytes saved by `optimize_download` over a fetcher run (shared by its workers)."""
+    files: int = 0
+    shrunk: int = 0
+    before: int = 0
+    after: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, before: int, after: int) -> None:
+        with self._lock:
+            self.files += 1
+            self.shrunk += after < before
+            self.before += before
+            self.after += after
+
+    def summary(self) -> str:
+        saved = self.before - self.after
+        pct = 100 * saved / self.before if self.before else 0.0
+        return f"{self.shrunk}/{self.files} downloads shrunk, {self.before} -> {self.after} bytes, saved {saved} bytes ({pct:.1f}%)"
+
+
+def optimize_download(dl: Download, stats: Optional[OptimizeStats] = None) -> Tuple[int, int]:
+    """Optimize a finished download before it is stored; keeps its size/sha256 in sync.
+
+    Files Pillow cannot read are left as downloaded.
+    """
+    before = after = dl.size
+    if available():
+        try:
+            before, after = optimize_file(dl.temp_path)
+        except Exception:
+            before = after = dl.size
+        if after != before:
+            dl.size = after
+            dl.sha256 = file_sha256(dl.temp_path)
+    if stats is not None:
+        stats.record(before, after)
+    return before, after
+
+
+def _worker(path: str) -> Tuple[str, int, int, Optional[str]]:
+    try:
+        before, after = optimize_file(Path(path))
+        return path, before, after, None
+    except Exception as ex:
+        return path, 0, 0, str(ex)
+
+
+def _candidates(directory: Path, state: Dict[str, List[float]]) -> List[Path]:
+    out: List[Path] = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            if Path(entry.name).suffix.lower() not in (".jpg", ".jpeg", ".png"):
+                continue
+            st = entry.stat()
+            if st.st_nlink > 1:
+                continue
+            if state.get(entry.name) == [st.st_size, st.st_mtime]:
+                continue
+            out.append(Path(entry.path))
+    return sorted(out)
+
+
+def optimize_directory(directory: Path, workers: Optional[int] = None) -> Tuple[int, int]:
+    state_path = directory / STATE_NAME
+    state = read_json(state_path)
+    if not isinstance(state, dict):
+        state = {}
+
+    files = _candidates(directory, state)
+    total_before = total_after = 0
+    if files:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            for path_s, before, after, error in pool.map(_worker, [str(p) for p in files], chunksize=8):
+                path = Path(path_s)
+                if error:
+                    print(f"  {path.name}: failed: {error}")
+                    continue
+                total_before += before
+                total_after += after
+                if after < before:
+                    print(f"  {path.name}: {before} -> {after} bytes (-{before - after}, {100 * (before - after) / before:.1f}%)")
+                st = path.stat()
+                state[path.name] = [st.st_size, st.st_mtime]
+
+    write_json_atomic(state_path, state, indent=None)
+    return total_before, total_after
+
+
+def main(argv: List[str]) -> int:
+    if not available():
+        print("Pillow is not installed (pip install Pillow).")
+        return 2
+
+    dirs = [Path(a).resolve() for a in argv] or [
+        WEB_WWWROOT / "img" / "place-photos",
+        WEB_WWWROOT / "img" / "listing-photos",
+    ]
+    grand_before = grand_after = 0
+    for d in dirs:
+        if not d.is_dir():
+            continue
+        print(f"{d}:")
+        before, after = optimize_directory(d)
+        grand_before += before
+        grand_after += after
+    saved = grand_before - grand_after
+    pct = 100 * saved / grand_before if grand_before else 0.0
+    print(f"Total: {grand_before} -> {grand_after} bytes, saved {saved} bytes ({pct:.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,189 @@
+"""Perceptual-hash index used to keep one stock photo from being assigned to many places.
+
+Every stored photo gets a 64-bit difference hash (dHash): the image is reduced
+to 9x8 grayscale and each bit says whether a pixel is brighter than its right
+neighbour. Re-encodes, resizes and light crops of the same photo land within a
+few bits of each other, so "near-duplicate" is a Hamming distance check.
+
+Lookups use a multi-index: the hash is split into 8 bands of 8 bits, each with
+its own exact-match table. Two hashes within distance 7 must agree on at least
+one band (pigeonhole), so only the few keys sharing a band are compared instead
+of the whole index.
+
+The index is persisted next to the photos as `.phash_index.json`
+(key -> hash, size, mtime) and refreshed incrementally: only files that are new
+or changed since the last run are decoded again.
+
+Env vars:
+  PHASH_DEDUP=1           (0 = accept near-duplicate photos)
+  PHASH_MAX_DISTANCE=6    (Hamming distance treated as the same photo; max 7)
+  PHASH_MAX_CANDIDATES=5  (downloads tried per place before giving up on duplicates)
+
+Requires Pillow; without it nothing is hashed and every candidate is accepted.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # optional dependency
+    Image = None  # type: ignore[assignment]
+
+from dir_index import DirIndex
+from manifest_io import read_json, write_json_atomic
+
+PHASH_DEDUP = os.environ.get("PHASH_DEDUP", "1") == "1"
+PHASH_MAX_DISTANCE = min(7, int(os.environ.get("PHASH_MAX_DISTANCE", "6")))
+PHASH_MAX_CANDIDATES = int(os.environ.get("PHASH_MAX_CANDIDATES", "5"))
+INDEX_NAME = ".phash_index.json"
+
+BANDS = 8
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+HASHABLE_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def dhash(path: Path) -> Optional[int]:
+    """64-bit dHash of an image file, or None if it cannot be decoded."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as im:
+            im.draft("L", (64, 64))
+            small = im.convert("L").resize((9, 8), Image.LANCZOS)
+    except Exception:
+        return None
+    px = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    # bin().count rather than int.bit_count (3.10+): the tools also run on older Pythons.
+    return bin(a ^ b).count("1")
+
+
+def _bands(value: int) -> List[int]:
+    return [(value >> (i * BAND_BITS)) & BAND_MASK for i in range(BANDS)]
+
+
+class PerceptualIndex:
+    def __init__(self, root: Path, max_distance: int = PHASH_MAX_DISTANCE) -> None:
+        self.path = root / INDEX_NAME
+        self.max_distance = max_distance
+        # key -> {"hash": "<16 hex>", "size": int, "mtime": float}
+        self._entries: Dict[str, Dict[str, object]] = {}
+        self._hashes: Dict[str, int] = {}
+        self._tables: List[Dict[int, Set[str]]] = [{} for _ in range(BANDS)]
+        self._lock = threading.Lock()
+
+    def _insert(self, key: str, value: int) -> None:
+        self._remove(key)
+        self._hashes[key] = value
+        for table, band in zip(self._tables, _bands(value)):
+            table.setdefault(band, set()).add(key)
+
+    def _remove(self, key: str) -> None:
+        old = self._hashes.pop(key, None)
+        if old is None:
+            return
+        for table, band in zip(self._tables, _bands(old)):
+            keys = table.get(band)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del table[band]
+
+    def _nearest(self, value: int, exclude: str) -> Optional[Tuple[str, int]]:
+        seen: Set[str] = set()
+        best: Optional[Tuple[str, int]] = None
+        for table, band in zip(self._tables, _bands(value)):
+            for other in table.get(band, ()):
+                if other == exclude or other in seen:
+                    continue
+                seen.add(other)
+                dist = hamming(value, self._hashes[other])
+                if dist <= self.max_distance and (best is None or dist < best[1]):
+                    best = (other, dist)
+        return best
+
+    def load(self, files: DirIndex) -> Dict[str, int]:
+        """Load the saved index and bring it in line with the files on disk."""
+        saved = read_json(self.path)
+        saved = saved if isinstance(saved, dict) else {}
+        stats = {"reused": 0, "hashed": 0, "dropped": 0}
+        live: Set[str] = set()
+        for key in sorted(files.keys()):
+            f = files.find(key, HASHABLE_EXTS)
+            if f is None:
+                continue
+            live.add(key)
+            entry = saved.get(key)
+            if isinstance(entry, dict) and entry.get("size") == f.size and entry.get("mtime") == f.mtime:
+                try:
+                    self._insert(key, int(str(entry["hash"]), 16))
+                    self._entries[key] = entry
+                    stats["reused"] += 1
+                    continue
+                except (KeyError, ValueError):
+                    pass
+            self.record(key, f.path)
+            stats["hashed"] += 1
+        stats["dropped"] = len(set(saved) - live)
+        return stats
+
+    def record(self, key: str, path: Path, value: Optional[int] = None) -> Optional[int]:
+        """(Re)hash the file stored for `key`."""
+        if value is None:
+            value = dhash(path)
+        with self._lock:
+            if value is None:
+                self._remove(key)
+                self._entries.pop(key, None)
+                return None
+            st = path.stat()
+            self._insert(key, value)
+            self._entries[key] = {"hash": f"{value:016x}", "size": st.st_size, "mtime": st.st_mtime}
+        return value
+
+    def claim(self, key: str, value: int) -> Optional[Tuple[str, int]]:
+        """Check `value` against every other key and reserve it for `key` if it is new.
+
+        Returns (other key, distance) when it is a near-duplicate. Check and insert
+        happen under one lock, so two workers cannot both claim the same photo.
+        """
+        with self._lock:
+            hit = self._nearest(value, exclude=key)
+            if hit is None:
+                self._insert(key, value)
+            return hit
+
+    def release(self, key: str) -> None:
+        """Undo a `claim` whose photo was not stored: back to the hash of the file on disk, if any."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._remove(key)
+            else:
+                self._insert(key, int(str(entry["hash"]), 16))
+
+    def save(self) -> None:
+        with self._lock:
+            entries = {k: self._entries[k] for k in sorted(self._entries)}
+        write_json_atomic(self.path, entries, indent=None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._hashes)
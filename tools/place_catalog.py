@@ -0,0 +1,267 @@
+"""The place catalog embedded in app.js, parsed once and shared by the tools.
+
+app.js declares the catalog as plain object literals:
+
+  const GOLBASI_PLACES = [
+    { name: "Kronos Gölbaşı Düğün Salonu", address: "...", lat: 39.77, lng: 32.80, category: "wedding" },
+    ...
+  ];
+
+One regex scan finds the `const <ARRAY> = [` declarations. A small tokenizer
+then reads each array literal once (strings with JS escapes, numbers,
+true/false/null, nested arrays/objects, comments, trailing commas). Every
+field of every entry is kept in `Place.fields`, and the common ones are also
+attributes. Anything that is not a literal (a function call, a spread) raises
+CatalogError with its line number instead of dropping the entry.
+
+The parsed catalog is written to CATALOG_CACHE_PATH, keyed by the SHA-256 of
+app.js. Later runs whose app.js has the same hash read the list from there.
+Entries are de-duplicated by `normalize_place_key`, first one wins, so the
+fetcher, the uploader and the checks all see exactly the same places in the
+same order.
+
+Usage:
+  python tools/place_catalog.py          (print the catalog summary)
+
+Env vars:
+  APP_JS=src/Web/wwwroot/js/app.js
+  CATALOG_CACHE=1                                   (0 = always parse app.js)
+  CATALOG_CACHE_PATH=tools/.cache/place_catalog.json
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sys
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from manifest_io import read_json, write_json_atomic
+from text_norm import normalize_place_key
+
+APP_JS = Path(os.environ.get("APP_JS", "src/Web/wwwroot/js/app.js")).resolve()
+DEFAULT_PATH = Path(__file__).resolve().parent / ".cache" / "place_catalog.json"
+CATALOG_CACHE_PATH = Path(os.environ.get("CATALOG_CACHE_PATH", str(DEFAULT_PATH))).resolve()
+CATALOG_CACHE = os.environ.get("CATALOG_CACHE", "1") == "1"
+
+# The const arrays that make up the catalog, in catalog order.
+CATALOG_ARRAYS = ("GOLBASI_PLACES", "PHOTOGRAPHERS", "BAKERIES", "FLORISTS")
+# Bump when parsing changes so stale cache files are ignored.
+CACHE_VERSION = 1
+
+
+class CatalogError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Place:
+    name: str
+    category: str
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    address: str = ""
+    # Source array, e.g. "BAKERIES".
+    group: str = ""
+    # Every field of the object literal, as parsed.
+    fields: Dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+
+
+_ARRAY_START_RE = re.compile(r"\bconst\s+(" + "|".join(CATALOG_ARRAYS) + r")\s*=\s*\[")
+_TOKEN_RE = re.compile(
+    r"""
+      (?P<skip>\s+|//[^\n]*|/\*.*?\*/)
+    | (?P<str>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    | (?P<num>-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<ident>[A-Za-z_$][\w$]*)
+    | (?P<punct>[{}\[\],:])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_ESCAPE_RE = re.compile(r"\\(u\{[0-9a-fA-F]+\}|u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|\r\n|.)", re.DOTALL)
+_SIMPLE_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "b": "\b", "f": "\f", "v": "\v", "0": "\0",
+                   "\n": "", "\r": "", "\r\n": "", "\u2028": "", "\u2029": ""}
+_IDENT_VALUES = {"true": True, "false": False, "null": None, "undefined": None}
+
+
+def _unescape_char(m: "re.Match[str]") -> str:
+    esc = m.group(1)
+    if esc[0] in "ux" and len(esc) > 1:
+        return chr(int(esc[1:].strip("{}"), 16))
+    return _SIMPLE_ESCAPES.get(esc, esc)
+
+
+def unescape_js_string(body: str) -> str:
+    if "\\" not in body:
+        return body
+    s = _ESCAPE_RE.sub(_unescape_char, body)
+    if any("\ud800" <= ch <= "\udfff" for ch in s):
+        # \uD83C\uDF89-style pairs: join the surrogates into one code point.
+        s = s.encode("utf-16", "surrogatepass").decode("utf-16", errors="replace")
+    return s
+
+
+class _Reader:
+    """Recursive-descent reader over the tokens of one literal."""
+
+    def __init__(self, text: str, pos: int) -> None:
+        self.text = text
+        self.pos = pos
+
+    def error(self, message: str, pos: Optional[int] = None) -> CatalogError:
+        line = self.text.count("\n", 0, self.pos if pos is None else pos) + 1
+        return CatalogError(f"app.js line {line}: {message}")
+
+    def next(self) -> Tuple[str, str, int]:
+        while True:
+            m = _TOKEN_RE.match(self.text, self.pos)
+            if m is None:
+                if self.pos >= len(self.text):
+                    raise self.error("unexpected end of file")
+                raise self.error(f"unsupported syntax {self.text[self.pos:self.pos + 20]!r}")
+            self.pos = m.end()
+            if m.lastgroup != "skip":
+                return m.lastgroup, m.group(), m.start()
+
+    def value(self, token: Optional[Tuple[str, str, int]] = None) -> Any:
+        kind, tok, start = token or self.next()
+        if kind == "str":
+            return unescape_js_string(tok[1:-1])
+        if kind == "num":
+            return float(tok) if any(c in tok for c in ".eE") else int(tok)
+        if kind == "ident" and tok in _IDENT_VALUES:
+            return _IDENT_VALUES[tok]
+        if tok == "{":
+            return self.object()
+        if tok == "[":
+            return self.array()
+        raise self.error(f"expected a literal, got {tok!r}", start)
+
+    def array(self) -> List[Any]:
+        out: List[Any] = []
+        while True:
+            token = self.next()
+            if token[1] == "]":
+                return out
+            out.append(self.value(token))
+            kind, tok, start = self.next()
+            if tok == "]":
+                return out
+            if tok != ",":
+                raise self.error(f"expected ',' or ']', got {tok!r}", start)
+
+    def object(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        while True:
+            kind, tok, start = self.next()
+            if tok == "}":
+                return out
+            if kind == "str":
+                key = unescape_js_string(tok[1:-1])
+            elif kind in ("ident", "num"):
+                key = tok
+            else:
+                raise self.error(f"expected a property name, got {tok!r}", start)
+            kind, tok, start = self.next()
+            if tok != ":":
+                raise self.error(f"expected ':' after {key!r}, got {tok!r}", start)
+            out[key] = self.value()
+            kind, tok, start = self.next()
+            if tok == "}":
+                return out
+            if tok != ",":
+                raise self.error(f"expected ',' or '}}', got {tok!r}", start)
+
+
+def _as_float(v: Any) -> Optional[float]:
+    if isinstance(v, bool) or not isinstance(v, (int, float)):
+        return None
+    return float(v)
+
+
+def place_from_fields(group: str, fields: Dict[str, Any]) -> Optional[Place]:
+    name = str(fields.get("name") or "").strip()
+    category = str(fields.get("category") or "").strip()
+    if not name or not category:
+        return None
+    return Place(name=name, category=category, lat=_as_float(fields.get("lat")), lng=_as_float(fields.get("lng")),
+                 address=str(fields.get("address") or "").strip(), group=group, fields=fields)
+
+
+def parse_catalog(text: str) -> List[Place]:
+    """Every entry with a name and a category, in CATALOG_ARRAYS order (not de-duplicated)."""
+    arrays: Dict[str, List[Any]] = {}
+    for m in _ARRAY_START_RE.finditer(text):
+        if m.group(1) not in arrays:
+            arrays[m.group(1)] = _Reader(text, m.end()).array()
+    places: List[Place] = []
+    for group in CATALOG_ARRAYS:
+        for entry in arrays.get(group, ()):
+            p = place_from_fields(group, entry) if isinstance(entry, dict) else None
+            if p is not None:
+                places.append(p)
+    return places
+
+
+def unique_places(places: List[Place]) -> List[Place]:
+    """De-duplicate by normalized key, keeping the first occurrence."""
+    seen: set[str] = set()
+    out: List[Place] = []
+    for p in places:
+        k = normalize_place_key(p.name)
+        if k and k not in seen:
+            seen.add(k)
+            out.append(p)
+    return out
+
+
+def load_places(app_js: Path = APP_JS, cache_path: Path = CATALOG_CACHE_PATH,
+                use_cache: bool = CATALOG_CACHE) -> List[Place]:
+    """The de-duplicated catalog of `app_js`, from the compiled cache when it is current."""
+    raw = app_js.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    if use_cache:
+        cached = read_json(cache_path)
+        if (isinstance(cached, dict) and cached.get("version") == CACHE_VERSION
+                and cached.get("appJsSha256") == digest and cached.get("arrays") == list(CATALOG_ARRAYS)):
+            try:
+                places = [place_from_fields(r["group"], r["fields"]) for r in cached["places"]]
+                return [p for p in places if p is not None]
+            except (KeyError, TypeError, AttributeError):
+                pass
+
+    places = unique_places(parse_catalog(raw.decode("utf-8", errors="replace")))
+    if use_cache:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            write_json_atomic(cache_path, {
+                "version": CACHE_VERSION,
+                "appJsSha256": digest,
+                "arrays": list(CATALOG_ARRAYS),
+                "places": [{"group": p.group, "fields": p.fields} for p in places],
+            })
+        except OSError as ex:
+            print(f"Catalog cache not written ({cache_path}): {ex}")
+    return places
+
+
+def main(argv: List[str]) -> int:
+    app_js = Path(argv[0]).resolve() if argv else APP_JS
+    if not app_js.exists():
+        print(f"app.js not found: {app_js}")
+        return 2
+    places = load_places(app_js)
+    counts = Counter(p.group for p in places)
+    print(f"{len(places)} places: " + ", ".join(f"{g}={counts[g]}" for g in CATALOG_ARRAYS))
+    missing = [p.name for p in places if p.lat is None or p.lng is None]
+    if missing:
+        print(f"{len(missing)} without coordinates: {', '.join(missing)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,122 @@
+"""Adaptive ordering of search query templates, learned across runs.
+
+`build_queries` produces the same handful of query shapes for every place
+(`intitle:<name>`, `"<name>"`, `<name> Gölbaşı Ankara`, ...), and most places
+resolve on one or two of them. The planner keeps, per provider + category +
+template id:
+
+  sent    searches sent with this template
+  hits    searches that returned at least one result
+  chosen  searches whose result ended up as the stored photo
+
+and orders each place's templates by smoothed chosen rate,
+(chosen + 1) / (sent + 2). Templates never tried sit at 0.5 and keep their
+`build_queries` order, so a fresh stats file behaves exactly like the fixed
+order; a template that has been sent PLANNER_MIN_TRIALS times without ever
+being chosen drops to the end, where the per-place request budget usually
+cuts it off.
+
+Ordering is computed from a snapshot taken when the run starts, so every
+place of a run sees the same plan no matter how the workers interleave; the
+counts gathered during the run are saved at the end for the next one.
+
+Env vars:
+  QUERY_STATS_PATH=tools/.cache/query_stats.json
+  PLACE_QUERY_BUDGET=6      (search requests per place and provider; 0 = unlimited)
+  PLANNER_MIN_TRIALS=20     (sends before a never-chosen template is demoted)
+  PLANNER=1                 (0 = fixed build_queries order, stats still recorded)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from manifest_io import read_json, write_json_atomic
+
+DEFAULT_PATH = Path(__file__).resolve().parent / ".cache" / "query_stats.json"
+QUERY_STATS_PATH = Path(os.environ.get("QUERY_STATS_PATH", str(DEFAULT_PATH))).resolve()
+PLACE_QUERY_BUDGET = int(os.environ.get("PLACE_QUERY_BUDGET", "6"))
+PLANNER_MIN_TRIALS = int(os.environ.get("PLANNER_MIN_TRIALS", "20"))
+PLANNER = os.environ.get("PLANNER", "1") == "1"
+
+# (template id, query text)
+PlannedQuery = Tuple[str, str]
+FIELDS = ("sent", "hits", "chosen")
+
+
+def stats_key(provider: str, category: str, template: str) -> str:
+    return f"{provider}|{category}|{template}"
+
+
+class QueryBudget:
+    """Search requests one place may still send to one provider."""
+
+    def __init__(self, limit: int = PLACE_QUERY_BUDGET) -> None:
+        self.limit = limit
+        self.used = 0
+        self.refused = 0
+
+    def take(self) -> bool:
+        if self.limit > 0 and self.used >= self.limit:
+            self.refused += 1
+            return False
+        self.used += 1
+        return True
+
+
+class QueryPlanner:
+    def __init__(self, path: Path = QUERY_STATS_PATH, enabled: bool = PLANNER,
+                 min_trials: int = PLANNER_MIN_TRIALS) -> None:
+        self.path = path
+        self.enabled = enabled
+        self.min_trials = min_trials
+        data = read_json(path)
+        stats = data.get("stats") if isinstance(data, dict) else None
+        self._stats: Dict[str, Dict[str, int]] = {
+            k: {f: int(v.get(f, 0)) for f in FIELDS}
+            for k, v in (stats or {}).items() if isinstance(v, dict)
+        }
+        # Frozen copy the plans of this run are computed from.
+        self._snapshot = {k: dict(v) for k, v in self._stats.items()}
+        self._lock = threading.Lock()
+
+    def _priority(self, provider: str, category: str, template: str) -> float:
+        s = self._snapshot.get(stats_key(provider, category, template))
+        if not s:
+            return 0.5
+        if s["sent"] >= self.min_trials and not s["chosen"]:
+            return -1.0
+        return (s["chosen"] + 1) / (s["sent"] + 2)
+
+    def plan(self, provider: str, category: str, queries: Sequence[PlannedQuery]) -> List[PlannedQuery]:
+        """`queries` in the order to try them (stable: ties keep the given order)."""
+        if not self.enabled:
+            return list(queries)
+        return sorted(queries, key=lambda tq: -self._priority(provider, category, tq[0]))
+
+    def _bump(self, provider: str, category: str, template: str, **fields: int) -> None:
+        with self._lock:
+            s = self._stats.setdefault(stats_key(provider, category, template), {f: 0 for f in FIELDS})
+            for f, n in fields.items():
+                s[f] += n
+
+    def record_sent(self, provider: str, category: str, template: str, hit: bool) -> None:
+        self._bump(provider, category, template, sent=1, hits=int(hit))
+
+    def record_chosen(self, provider: str, category: str, template: str) -> None:
+        if template:
+            self._bump(provider, category, template, chosen=1)
+
+    def save(self) -> None:
+        with self._lock:
+            stats = {k: dict(v) for k, v in sorted(self._stats.items())}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(self.path, {"version": 1, "stats": stats})
+
+    def summary(self) -> str:
+        with self._lock:
+            sent = sum(s["sent"] - self._snapshot.get(k, {}).get("sent", 0) for k, s in self._stats.items())
+        return f"{sent} searches this run, {len(self._stats)} template stats"
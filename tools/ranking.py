@@ -0,0 +1,158 @@
+"""BM25 ranking of pooled image search results.
+
+The fetchers used to stop at the first query that returned anything and pick
+within that one response by Jaccard overlap of the title words. With
+RANKING=bm25 they instead run a small fixed set of queries, pool every result,
+and rank the pool against the place/listing name with BM25F:
+
+  tf~(t, d) = sum over fields f of  w_f * tf_f(t, d) / (1 - b + b * len_f(d) / avglen_f)
+  score(d)  = sum over query terms t of  qw_t * idf(t) * tf~ / (k1 + tf~)
+
+Fields are the result title and its description (Commons ImageDescription /
+categories / search snippet, Openverse tags). IDF is computed over the pool,
+so words every result shares ("wedding", the district name) count for little.
+Generic business/location words in the name (`text_norm.STOP_TOKENS`) are
+kept as query terms but with a lower weight; names made only of such words
+("Life Park Düğün Salonu") still rank.
+
+Queries are sent in order and pooling stops as soon as the pool is good
+enough (`pool_is_enough`): it holds RANK_POOL_SIZE results, or one title names
+every distinctive word of the query. A query with hits therefore usually ends
+the search; the rest of the set only runs when the earlier ones came back thin.
+
+Env vars:
+  RANKING=bm25              (first = old behaviour: first query with any hit wins)
+  RANK_TITLE_WEIGHT=2.0
+  RANK_DESCRIPTION_WEIGHT=1.0
+  RANK_STOP_TOKEN_WEIGHT=0.25
+  RANK_MIN_SCORE=0          (results scoring below this are dropped)
+  RANK_POOL_SIZE=10         (results requested per query; a pool this big stops further queries)
+  RANK_K1=1.2 / RANK_B=0.75
+  RANK_TRIGRAM_WEIGHT=1.0   (weight of the title's trigram similarity, see trigram_index.py)
+  RANK_GEO_WEIGHT=1.5       (weight of the result's proximity to the place, see geo_search.py)
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from text_norm import STOP_TOKENS, normalize_text_for_match
+
+RANKING = os.environ.get("RANKING", "bm25").strip().lower()
+RANK_POOL_SIZE = int(os.environ.get("RANK_POOL_SIZE", "10"))
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class RankSettings:
+    field_weights: Dict[str, float] = field(default_factory=lambda: {"title": 2.0, "description": 1.0})
+    stop_token_weight: float = 0.25
+    min_score: float = 0.0
+    k1: float = 1.2
+    b: float = 0.75
+    trigram_weight: float = 1.0
+    geo_weight: float = 1.5
+
+
+def settings_from_env() -> RankSettings:
+    return RankSettings(
+        field_weights={
+            "title": float(os.environ.get("RANK_TITLE_WEIGHT", "2.0")),
+            "description": float(os.environ.get("RANK_DESCRIPTION_WEIGHT", "1.0")),
+        },
+        stop_token_weight=float(os.environ.get("RANK_STOP_TOKEN_WEIGHT", "0.25")),
+        min_score=float(os.environ.get("RANK_MIN_SCORE", "0")),
+        k1=float(os.environ.get("RANK_K1", "1.2")),
+        b=float(os.environ.get("RANK_B", "0.75")),
+        trigram_weight=float(os.environ.get("RANK_TRIGRAM_WEIGHT", "1.0")),
+        geo_weight=float(os.environ.get("RANK_GEO_WEIGHT", "1.5")),
+    )
+
+
+RANK_SETTINGS = settings_from_env()
+
+
+def terms(text: str) -> List[str]:
+    return [t for t in normalize_text_for_match(text).split(" ") if len(t) > 1]
+
+
+def query_weights(query: str, settings: RankSettings = RANK_SETTINGS) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for t in terms(query):
+        out[t] = settings.stop_token_weight if t in STOP_TOKENS else 1.0
+    return out
+
+
+def covers_query(query: str, text: str) -> bool:
+    """True when `text` contains every distinctive word of `query` (all words if none is distinctive)."""
+    words = list(dict.fromkeys(terms(query)))
+    wanted = [t for t in words if t not in STOP_TOKENS] or words
+    have = set(terms(text))
+    return bool(wanted) and all(t in have for t in wanted)
+
+
+def pool_is_enough(query: str, titles: Sequence[str], pool_size: int = RANK_POOL_SIZE) -> bool:
+    """Whether a pool with these titles is worth ranking without sending more queries."""
+    return len(titles) >= pool_size or any(covers_query(query, t) for t in titles)
+
+
+@dataclass
+class RankedItem(Generic[T]):
+    score: float
+    item: T
+
+
+def rank(query: str, docs: Sequence[Tuple[T, Dict[str, str]]],
+         settings: RankSettings = RANK_SETTINGS, fuzzy: Optional[Dict[str, float]] = None,
+         proximity: Optional[Dict[str, float]] = None) -> List[RankedItem[T]]:
+    """Rank `docs` ((item, {field: text})) for `query`, best first.
+
+    `fuzzy` maps titles to a trigram similarity with `query` (see trigram_index.py);
+    it is added to the BM25 score with `settings.trigram_weight`. `proximity`
+    maps titles to 0..1 closeness to the place (see geo_search.py), added with
+    `settings.geo_weight`.
+    Equal scores keep the input order (pool order = query order, then API order).
+    Items scoring below `settings.min_score` are dropped.
+    """
+    if not docs:
+        return []
+    weights = settings.field_weights
+    qw = query_weights(query, settings)
+
+    tokenized: List[Dict[str, List[str]]] = [
+        {f: terms(text) for f, text in fields.items() if f in weights} for _, fields in docs
+    ]
+    n = len(docs)
+    avglen = {f: (sum(len(d.get(f, ())) for d in tokenized) / n) or 1.0 for f in weights}
+    df = {t: sum(1 for d in tokenized if any(t in toks for toks in d.values())) for t in qw}
+    idf = {t: math.log(1.0 + (n - df[t] + 0.5) / (df[t] + 0.5)) for t in qw}
+
+    ranked: List[RankedItem[T]] = []
+    for (item, fields), doc in zip(docs, tokenized):
+        score = 0.0
+        for t, w_t in qw.items():
+            if not df[t]:
+                continue
+            tf = 0.0
+            for f, toks in doc.items():
+                if not toks:
+                    continue
+                count = toks.count(t)
+                if count:
+                    norm = 1.0 - settings.b + settings.b * len(toks) / avglen[f]
+                    tf += weights[f] * count / norm
+            if tf:
+                score += w_t * idf[t] * tf / (settings.k1 + tf)
+        if fuzzy:
+            score += settings.trigram_weight * fuzzy.get(fields.get("title", ""), 0.0)
+        if proximity:
+            score += settings.geo_weight * proximity.get(fields.get("title", ""), 0.0)
+        if score >= settings.min_score:
+            ranked.append(RankedItem(score=score, item=item))
+
+    ranked.sort(key=lambda r: -r.score)
+    return ranked
@@ -0,0 +1,100 @@
+"""Per-host token-bucket rate limiting for the tools/ fetchers.
+
+The fetchers talk to a handful of public services (Wikimedia Commons API,
+Openverse API, and the image CDNs behind them). Instead of sleeping a fixed
+amount after every place, every outgoing request takes a token from the bucket
+of its host. Workers running in parallel therefore share one politeness budget
+per host, and idle hosts do not slow the others down.
+
+Env vars:
+  HOST_RATES=commons.wikimedia.org=2:4,api.openverse.engineering=1:2
+             (host=requests_per_second[:burst], comma separated)
+  DEFAULT_HOST_RATE=2   (requests/second for hosts not listed)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+# requests/second, burst
+DEFAULT_RATES: Dict[str, Tuple[float, float]] = {
+    "commons.wikimedia.org": (2.0, 4.0),
+    "api.openverse.engineering": (1.0, 2.0),
+    "upload.wikimedia.org": (2.0, 4.0),
+}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = max(rate, 0.001)
+        self.capacity = max(burst, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until it is available. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+def parse_host_rates(spec: str) -> Dict[str, Tuple[float, float]]:
+    out: Dict[str, Tuple[float, float]] = {}
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part or "=" not in part:
+            continue
+        host, _, value = part.partition("=")
+        rate_s, _, burst_s = value.partition(":")
+        try:
+            rate = float(rate_s)
+            burst = float(burst_s) if burst_s else max(1.0, rate)
+        except ValueError:
+            continue
+        out[host.strip().lower()] = (rate, burst)
+    return out
+
+
+class HostRateLimiter:
+    def __init__(self, rates: Optional[Dict[str, Tuple[float, float]]] = None, default_rate: float = 2.0) -> None:
+        self._rates = dict(DEFAULT_RATES)
+        if rates:
+            self._rates.update(rates)
+        self._default = (default_rate, max(1.0, default_rate * 2))
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket_for(self, host: str) -> TokenBucket:
+        host = (host or "").lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self._rates.get(host, self._default)
+                bucket = TokenBucket(rate, burst)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str) -> float:
+        return self.bucket_for(urlsplit(url).hostname or "").acquire()
+
+
+def limiter_from_env() -> HostRateLimiter:
+    return HostRateLimiter(
+        rates=parse_host_rates(os.environ.get("HOST_RATES", "")),
+        default_rate=float(os.environ.get("DEFAULT_HOST_RATE", "2")),
+    )
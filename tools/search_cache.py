@@ -0,0 +1,162 @@
+"""Persistent cache for image search API responses (Commons, Openverse).
+
+The fetchers send the same search queries on every run, including for places
+that found nothing last time. Responses are stored in a small SQLite database
+under tools/.cache so that a rerun only talks to the APIs for new or expired
+queries.
+
+- Key: provider + normalized query + fingerprint of the other request params
+- Separate (shorter) TTL for empty results, so misses are retried sooner
+- Size-bounded: least recently used entries are evicted past the byte limit
+
+Env vars:
+  SEARCH_CACHE=1                      (0 disables the cache)
+  SEARCH_CACHE_PATH=tools/.cache/search_cache.sqlite3
+  SEARCH_CACHE_TTL_SEC=2592000        (30 days)
+  SEARCH_CACHE_EMPTY_TTL_SEC=86400    (1 day)
+  SEARCH_CACHE_MAX_MB=256
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_PATH = Path(__file__).resolve().parent / ".cache" / "search_cache.sqlite3"
+
+
+def normalize_query(query: str) -> str:
+    s = unicodedata.normalize("NFC", query or "").casefold()
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def params_fingerprint(params: Dict[str, str], query_param: Optional[str] = None) -> str:
+    rest = sorted((k, str(v)) for k, v in params.items() if k != query_param)
+    return hashlib.sha1(json.dumps(rest, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+class SearchCache:
+    def __init__(self, path: Path = DEFAULT_PATH, ttl_sec: float = 30 * 86400, empty_ttl_sec: float = 86400,
+                 max_bytes: int = 256 * 1024 * 1024, enabled: bool = True) -> None:
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.empty_ttl_sec = empty_ttl_sec
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        if enabled:
+            self._open()
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " provider TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " empty INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)")
+        self._total_bytes = db.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM entries").fetchone()[0]
+        self._db = db
+
+    @staticmethod
+    def make_key(provider: str, query: str, params: Dict[str, str], query_param: Optional[str] = None) -> str:
+        return "\x1f".join([provider, normalize_query(query), params_fingerprint(params, query_param)])
+
+    def get(self, key: str) -> Optional[Any]:
+        if self._db is None:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, empty, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, empty, stored_at = row
+            ttl = self.empty_ttl_sec if empty else self.ttl_sec
+            if now - stored_at > ttl:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total_bytes -= len(value)
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(value)
+
+    def put(self, key: str, provider: str, data: Any, empty: bool) -> None:
+        if self._db is None:
+            return
+        value = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT LENGTH(value) FROM entries WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._total_bytes -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, provider, value, empty, stored_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, value, 1 if empty else 0, now, now),
+            )
+            self._total_bytes += len(value)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Drop least recently used rows until we are 10% under the limit.
+        assert self._db is not None
+        target = int(self.max_bytes * 0.9)
+        rows = self._db.execute("SELECT key, LENGTH(value) FROM entries ORDER BY accessed_at ASC").fetchall()
+        doomed = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((key,))
+            self._total_bytes -= size
+        self._db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def get_or_fetch(self, provider: str, query: str, params: Dict[str, str], fetch: Callable[[], Any],
+                     is_empty: Callable[[Any], bool], query_param: Optional[str] = None) -> Any:
+        key = self.make_key(provider, query, params, query_param)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        data = fetch()
+        self.put(key, provider, data, empty=is_empty(data))
+        return data
+
+    def summary(self) -> str:
+        return f"hits={self.hits} misses={self.misses}"
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def search_cache_from_env() -> SearchCache:
+    return SearchCache(
+        path=Path(os.environ.get("SEARCH_CACHE_PATH", str(DEFAULT_PATH))).resolve(),
+        ttl_sec=float(os.environ.get("SEARCH_CACHE_TTL_SEC", str(30 * 86400))),
+        empty_ttl_sec=float(os.environ.get("SEARCH_CACHE_EMPTY_TTL_SEC", "86400")),
+        max_bytes=int(float(os.environ.get("SEARCH_CACHE_MAX_MB", "256")) * 1024 * 1024),
+        enabled=os.environ.get("SEARCH_CACHE", "1") == "1",
+    )
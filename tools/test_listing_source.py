@@ -0,0 +1,190 @@
+"""Tests: `listing_source.ListingPages` and `ListingSyncState` against a stub /api/listings.
+
+The stub follows Program.cs: newest first (ties by id), pageSize clamped to
+1..500, X-Total-Count and X-Snapshot on paged requests, `asOf` hiding
+listings created after the snapshot, and Take(200) without `page`.
+
+Usage:
+  python -m pytest tools/test_listing_source.py
+  python -m unittest discover -s tools -p "test_*.py"
+"""
+
+from __future__ import annotations
+
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from http_client import HttpClient
+from listing_source import LISTING_PAGE_SIZE_MAX, UNPAGED_LISTING_CAP, ListingPages, ListingSyncState
+
+
+class StubApi:
+    def __init__(self, count: int, paged: bool = True) -> None:
+        self.paged = paged
+        self.clock = count
+        self.listings: List[Dict[str, Any]] = [{"id": f"id{i:05d}", "title": f"Listing {i}", "created": i}
+                                               for i in range(1, count + 1)]
+        self.lock = threading.Lock()
+        # Called with the page number before that page is served.
+        self.before_page: Optional[Callable[[int], None]] = None
+
+    def create(self, n: int = 1) -> None:
+        for _ in range(n):
+            self.clock += 1
+            self.listings.append({"id": f"new{self.clock:05d}", "title": "New", "created": self.clock})
+
+    def close(self, listing_id: str) -> None:
+        self.listings = [l for l in self.listings if l["id"] != listing_id]
+
+    def newest_first(self) -> List[Dict[str, Any]]:
+        return sorted(self.listings, key=lambda l: (-l["created"], l["id"]))
+
+    def answer(self, query: Dict[str, List[str]]) -> tuple:
+        if not self.paged or "page" not in query:
+            return self.newest_first()[:UNPAGED_LISTING_CAP], {}
+        page = max(int(query["page"][0]), 1)
+        if self.before_page is not None:
+            self.before_page(page)
+        with self.lock:
+            as_of = int(query["asOf"][0]) if "asOf" in query else self.clock
+            rows = [l for l in self.newest_first() if l["created"] <= as_of]
+        size = min(max(int(query.get("pageSize", ["100"])[0]), 1), 500)
+        headers = {"X-Total-Count": str(len(rows)), "X-Snapshot": str(as_of)}
+        return rows[(page - 1) * size:page * size], headers
+
+    def __enter__(self) -> str:
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                body, headers = api.answer(parse_qs(urlsplit(self.path).query))
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __exit__(self, *exc: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ListingPagesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.http = HttpClient("listing-source-test")
+
+    def tearDown(self) -> None:
+        self.http.close()
+
+    def read(self, api: StubApi, **kwargs: Any) -> ListingPages:
+        with api as base:
+            source = ListingPages(self.http, base, **kwargs)
+            self.ids = [l["id"] for l in source]
+        return source
+
+    def test_every_page_in_order(self) -> None:
+        api = StubApi(1234)
+        source = self.read(api, page_size=100, workers=4)
+        self.assertEqual(self.ids, [l["id"] for l in api.newest_first()])
+        self.assertTrue(source.complete)
+
+    def test_page_size_above_the_api_cap(self) -> None:
+        api = StubApi(1200)
+        source = self.read(api, page_size=1000)
+        self.assertEqual(source.page_size, LISTING_PAGE_SIZE_MAX)
+        self.assertEqual(len(set(self.ids)), 1200)
+        self.assertTrue(source.complete)
+
+    def test_api_with_a_lower_cap_than_the_client(self) -> None:
+        api = StubApi(700)
+        original = api.answer
+        # An Api capping at 50: short first page, later pages asked with its size.
+        api.answer = lambda q: original({**q, "pageSize": [str(min(int(q["pageSize"][0]), 50))]})
+        source = self.read(api, page_size=200)
+        self.assertEqual(len(set(self.ids)), 700)
+        self.assertTrue(source.complete)
+
+    def test_limit_is_not_complete(self) -> None:
+        source = self.read(StubApi(500), page_size=100, limit=250)
+        self.assertEqual(len(self.ids), 250)
+        self.assertFalse(source.complete)
+
+    def test_limit_above_the_catalog_is_complete(self) -> None:
+        source = self.read(StubApi(120), page_size=50, limit=200)
+        self.assertEqual(len(self.ids), 120)
+        self.assertTrue(source.complete)
+
+    def test_unpaged_api_at_its_cap_is_not_complete(self) -> None:
+        source = self.read(StubApi(1200, paged=False), page_size=100)
+        self.assertEqual(len(self.ids), UNPAGED_LISTING_CAP)
+        self.assertFalse(source.complete)
+        source = self.read(StubApi(1200), page_size=0)
+        self.assertEqual(len(self.ids), UNPAGED_LISTING_CAP)
+        self.assertFalse(source.complete)
+
+    def test_unpaged_api_below_its_cap_is_complete(self) -> None:
+        source = self.read(StubApi(150), page_size=0)
+        self.assertEqual(len(self.ids), 150)
+        self.assertTrue(source.complete)
+
+    def test_listings_created_mid_run_do_not_shift_pages(self) -> None:
+        api = StubApi(1000)
+        before = [l["id"] for l in api.newest_first()]
+
+        def create(page: int) -> None:
+            if page > 1:
+                with api.lock:
+                    api.create(3)
+
+        api.before_page = create
+        source = self.read(api, page_size=100, workers=4)
+        self.assertEqual(self.ids, before)
+        self.assertTrue(source.complete)
+
+    def test_listing_closed_mid_run_is_not_complete(self) -> None:
+        api = StubApi(1000)
+
+        def close(page: int) -> None:
+            if page == 5:
+                with api.lock:
+                    api.close(api.newest_first()[0]["id"])
+
+        api.before_page = close
+        before = [l["id"] for l in api.newest_first()]
+        source = self.read(api, page_size=100, workers=1)
+        # Everything after the closed (already sent) listing moved up a row, so the
+        # first row of page 5 slid onto page 4 and was never sent.
+        self.assertEqual(sorted(set(before) - set(self.ids)), [before[400]])
+        self.assertFalse(source.complete)
+
+
+class ListingSyncStateTest(unittest.TestCase):
+    def test_removals_only_after_a_complete_run(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            state = ListingSyncState.load(Path(tmp))
+            state.update({"a": "1", "b": "2", "c": "3"}, {}, "t0", complete=True)
+            self.assertEqual(state.update({"a": "1"}, {}, "t1", complete=False), [])
+            self.assertEqual(state.removed, {})
+            self.assertEqual(set(state.listings), {"a", "b", "c"})
+            self.assertEqual(state.update({"a": "1"}, {"b": {"path": "/b.jpg"}}, "t2", complete=True), ["b", "c"])
+            self.assertEqual(state.removed["b"], {"path": "/b.jpg", "removedAtUtc": "t2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
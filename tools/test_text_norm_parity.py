@@ -0,0 +1,51 @@
+"""Tests: `text_norm.normalize_place_key` against `normalizePlaceKey` in app.js.
+
+The comparison itself is check_text_norm_parity.py; it needs node and is
+skipped when node is not on PATH.
+
+Usage:
+  python -m pytest tools/test_text_norm_parity.py
+  python -m unittest discover -s tools -p "test_*.py"
+
+Env vars:
+  APP_JS=src/Web/wwwroot/js/app.js   (default resolved from the repo root, not the cwd)
+  NODE=node
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import unittest
+from pathlib import Path
+
+import check_text_norm_parity as parity
+from text_norm import normalize_place_key
+
+APP_JS = Path(os.environ.get("APP_JS", Path(__file__).resolve().parent.parent / "src" / "Web" / "wwwroot" / "js" / "app.js"))
+
+
+class NormalizePlaceKeyTest(unittest.TestCase):
+    def test_known_keys(self) -> None:
+        cases = {
+            "Kronos Gölbaşı Düğün Salonu": "kronos-golbasi-dugun-salonu",
+            "ŞEKER PASTANESİ": "seker-pastanesi",
+            "Çiçekçi -- Orkide!!": "cicekci-orkide",
+            "  -Lead-and-trail-  ": "lead-and-trail",
+            "": "",
+        }
+        for name, key in cases.items():
+            with self.subTest(name=name):
+                self.assertEqual(normalize_place_key(name), key)
+
+
+@unittest.skipIf(shutil.which(parity.NODE) is None, f"node not found ({parity.NODE})")
+class AppJsParityTest(unittest.TestCase):
+    def test_matches_app_js(self) -> None:
+        total, mismatches = parity.find_mismatches(APP_JS)
+        self.assertGreater(total, len(parity.EDGE_CASES))
+        self.assertEqual(mismatches[:20], [], f"{len(mismatches)} of {total} keys differ from app.js")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""Text normalization shared by the image tools (and mirrored by `normalizePlaceKey` in app.js).
+
+- `normalize_place_key("Kronos Gölbaşı Düğün Salonu")` -> "kronos-golbasi-dugun-salonu":
+  the manifest key; must stay identical to the JS side, which is what the site
+  looks photos up by.
+- `normalize_text_for_match(...)` -> "kronos golbasi dugun salonu": same folding,
+  space separated, for comparing place names with search result titles.
+- `tokenize_for_match(...)` / `token_overlap_score(...)`: tokens without the
+  generic business/location words, and their Jaccard overlap.
+
+Folding follows the JS implementation exactly: lower-case, dotless ı -> i,
+NFKD, drop U+0300-U+036F (the other Turkish letters decompose into a base
+letter plus one of those marks), then every run of non [a-z0-9] is one
+separator. It is done with two precompiled patterns and no per-character
+Python loop; ASCII input skips the Unicode steps entirely. (`str.translate`
+tables were measured too: on non-ASCII text CPython maps them one character
+at a time, about 2x slower than the pattern for the marks and 30x slower
+than `str.replace` for ı.) Results are memoized because the same names and
+titles come up across queries and runs.
+
+`tools/check_text_norm_parity.py` compares this module with app.js under node
+(also run as a test by `tools/test_text_norm_parity.py`);
+`tools/bench_text_norm.py` times it against the old chained-replace version.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import FrozenSet, Tuple
+
+# JS: .replace(/ı/g, 'i') before NFKD, .replace(/[\u0300-\u036f]/g, '') after it.
+_COMBINING_MARKS_RE = re.compile("[\u0300-\u036f]+")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+STOP_TOKENS: FrozenSet[str] = frozenset({
+    # generic business words
+    "dugun", "dugunu", "dugun-salonu", "salon", "salonu", "salonlari", "balo", "kir", "bahcesi",
+    "wedding", "hall", "event", "events", "plaza", "park", "life", "elite", "lux", "luxe",
+    "cafe", "pastane", "pastanesi", "firin", "pasta", "ekler", "ekleristan",
+    "cicek", "cicekcilik", "cicekci", "orkide",
+    "foto", "fotograf", "fotografcilik", "studyo", "stüdyo", "studio", "medya", "film",
+    # location words
+    "golbasi", "ankara",
+})
+
+
+def fold(s: str) -> str:
+    """Lower-case and strip Turkish letters/diacritics down to ASCII where possible."""
+    s = s.strip().lower()
+    if s.isascii():
+        return s
+    return _COMBINING_MARKS_RE.sub("", unicodedata.normalize("NFKD", s.replace("ı", "i")))
+
+
+@lru_cache(maxsize=16384)
+def normalize_place_key(name: str) -> str:
+    # Must match normalizePlaceKey() in src/Web/wwwroot/js/app.js
+    return _NON_ALNUM_RE.sub("-", fold(str(name or ""))).strip("-")
+
+
+@lru_cache(maxsize=16384)
+def normalize_text_for_match(s: str) -> str:
+    return _NON_ALNUM_RE.sub(" ", fold(s or "")).strip()
+
+
+@lru_cache(maxsize=16384)
+def tokenize_for_match(s: str) -> Tuple[str, ...]:
+    return tuple(t for t in normalize_text_for_match(s).split(" ") if len(t) > 1 and t not in STOP_TOKENS)
+
+
+@lru_cache(maxsize=16384)
+def token_set(s: str) -> FrozenSet[str]:
+    return frozenset(tokenize_for_match(s))
+
+
+def token_overlap_score(query_name: str, candidate_title: str) -> float:
+    q = token_set(query_name)
+    c = token_set(candidate_title)
+    if not q or not c:
+        return 0.0
+    return len(q & c) / len(q | c)
+
+
+def strip_html(s: str) -> str:
+    return _HTML_TAG_RE.sub("", s or "").strip()
+
+
+def collapse_whitespace(s: str) -> str:
+    return _WHITESPACE_RE.sub(" ", (s or "").strip())
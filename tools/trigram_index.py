@@ -0,0 +1,97 @@
+"""Character-trigram index for fuzzy matching of venue names against result titles.
+
+Word tokens miss glued or split spellings: "Pembe Köşk Balo Salonları" and
+"pembe köşk balosalonları" share no token beyond "pembe" and "kosk". Trigrams
+of the normalized text with the spaces removed ("pembekoskbalosalonlari")
+do match.
+
+Every candidate title seen during a run is added to one index (trigram ->
+posting list of titles). Similarities for a name are read from the postings of
+the name's own trigrams, so only titles sharing at least one trigram are
+touched, not the whole index.
+
+Similarity is the share of the name's trigrams found in the title, so extra
+words in a title ("File:", the year, the extension) do not count against it.
+Generic business/location words are removed from the name first when
+something else is left, so "... Düğün Salonu" alone does not make every
+wedding hall match.
+
+Env vars:
+  TRIGRAMS=1                     (0 = word tokens only)
+  TRIGRAM_MIN_SIMILARITY=0.6     (lower similarities count as 0)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List
+
+from text_norm import normalize_text_for_match, tokenize_for_match
+
+TRIGRAMS = os.environ.get("TRIGRAMS", "1") == "1"
+TRIGRAM_MIN_SIMILARITY = float(os.environ.get("TRIGRAM_MIN_SIMILARITY", "0.6"))
+
+
+@lru_cache(maxsize=16384)
+def trigrams(text: str) -> FrozenSet[str]:
+    s = normalize_text_for_match(text).replace(" ", "")
+    return frozenset(s[i:i + 3] for i in range(len(s) - 2))
+
+
+@lru_cache(maxsize=4096)
+def name_trigrams(name: str) -> FrozenSet[str]:
+    distinctive = " ".join(tokenize_for_match(name))
+    return trigrams(distinctive) or trigrams(name)
+
+
+class TrigramIndex:
+    def __init__(self, min_similarity: float = TRIGRAM_MIN_SIMILARITY) -> None:
+        self.min_similarity = min_similarity
+        self._titles: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, titles: Iterable[str]) -> None:
+        with self._lock:
+            for title in titles:
+                if not title or title in self._ids:
+                    continue
+                doc = len(self._titles)
+                self._ids[title] = doc
+                self._titles.append(title)
+                for gram in trigrams(title):
+                    self._postings.setdefault(gram, []).append(doc)
+
+    def clear(self) -> None:
+        """Forget every title, e.g. between batches that share none."""
+        with self._lock:
+            # New containers: a similarities() call in progress keeps reading the old titles.
+            self._titles = []
+            self._ids = {}
+            self._postings = {}
+
+    def similarities(self, name: str) -> Dict[str, float]:
+        """title -> similarity for every indexed title at or above the threshold."""
+        q = name_trigrams(name)
+        if not q:
+            return {}
+        hits: Counter = Counter()
+        with self._lock:
+            for gram in q:
+                hits.update(self._postings.get(gram, ()))
+            titles = self._titles
+        need = len(q)
+        out: Dict[str, float] = {}
+        for doc, count in hits.items():
+            sim = count / need
+            if sim >= self.min_similarity:
+                out[titles[doc]] = sim
+        return out
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._titles)